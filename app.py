@@ -1,11 +1,44 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from src.models.database_manager import DatabaseManager
+from src.utils.helpers import leer_registros, generar_csv
+from src.utils.money import Money
 from datetime import datetime
+import io
 import os
 
+class ProveedorJSON(DefaultJSONProvider):
+    """Serializa los importes (Money) como texto decimal exacto en pesos ("19.99")
+
+    Un número JSON lo leen los clientes como float binario y vuelve la deriva
+    de centavos; el texto se convierte sin pérdida (Decimal, Money.desde).
+    """
+    @staticmethod
+    def default(o):
+        if isinstance(o, Money):
+            return f'{o:.2f}'
+        return DefaultJSONProvider.default(o)
+
 app = Flask(__name__)
+app.json = ProveedorJSON(app)
 db = DatabaseManager()
 
+LIMITE_PAGINA_MAXIMO = 500
+
+def parametros_paginacion():
+    """Lee ?cursor=&limit= de la petición; None si no se pidió paginación"""
+    if 'cursor' not in request.args and 'limit' not in request.args:
+        return None
+    limite = int(request.args.get('limit', 50))
+    return request.args.get('cursor') or None, max(1, min(limite, LIMITE_PAGINA_MAXIMO))
+
+def respuesta_paginada(items, siguiente):
+    """Devuelve la lista de la página con el cursor siguiente en X-Next-Cursor"""
+    respuesta = jsonify(items)
+    if siguiente:
+        respuesta.headers['X-Next-Cursor'] = siguiente
+    return respuesta
+
 @app.route('/')
 def index():
     """Página principal"""
@@ -14,20 +47,33 @@ def index():
 # ===== RUTAS DE PRODUCTOS =====
 @app.route('/api/productos', methods=['GET'])
 def get_productos():
-    """Obtiene todos los productos"""
-    productos = db.obtener_productos()
-    productos_list = []
-    for p in productos:
-        productos_list.append({
-            'id': p[0],
-            'nombre': p[1],
-            'descripcion': p[2],
-            'precio': p[3],
-            'cantidad': p[4],
-            'categoria': p[5],
-            'fecha_agregado': p[6]
-        })
-    return jsonify(productos_list)
+    """Obtiene los productos (todos, o por páginas con ?cursor=&limit=)"""
+    try:
+        paginacion = parametros_paginacion()
+        siguiente = None
+        if paginacion:
+            productos, siguiente = db.obtener_productos_pagina(*paginacion)
+        else:
+            productos = db.obtener_productos()
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return respuesta_paginada([p.a_json() for p in productos], siguiente)
+
+@app.route('/api/productos/buscar', methods=['GET'])
+def buscar_productos():
+    """Busca productos por texto (?q=termino&limit=50)"""
+    termino = request.args.get('q', '').strip()
+    if not termino:
+        return jsonify({'success': False, 'message': 'El parámetro q es obligatorio'}), 400
+    
+    try:
+        limite = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'El parámetro limit debe ser un entero'}), 400
+    
+    productos = db.buscar_productos(termino, limite=max(1, min(limite, 500)))
+    return jsonify([p.a_json() for p in productos])
 
 @app.route('/api/productos', methods=['POST'])
 def agregar_producto():
@@ -38,10 +84,10 @@ def agregar_producto():
         resultado = db.agregar_producto(
             nombre=data['nombre'],
             descripcion=data.get('descripcion', ''),
-            precio=float(data['precio']),
+            precio=Money.desde(data['precio']),
             cantidad=int(data['cantidad']),
             categoria=data.get('categoria', 'General'),
-            costo_compra=float(data.get('costo_compra', data['precio']))
+            costo_compra=Money.desde(data.get('costo_compra', data['precio']))
         )
         
         if resultado[0]:
@@ -61,7 +107,7 @@ def actualizar_producto(producto_id):
             producto_id=producto_id,
             nombre=data['nombre'],
             descripcion=data.get('descripcion', ''),
-            precio=float(data['precio']),
+            precio=Money.desde(data['precio']),
             cantidad=int(data['cantidad']),
             categoria=data.get('categoria', 'General')
         )
@@ -78,36 +124,25 @@ def eliminar_producto(producto_id):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
+# ===== RUTAS DE CATEGORÍAS =====
+@app.route('/api/categorias', methods=['GET'])
+def get_categorias():
+    """Categorías con cantidad de productos, unidades en stock y valor del inventario"""
+    return jsonify([c.a_json() for c in db.obtener_categorias_con_totales()])
+
 # ===== RUTAS DE COMPRAS =====
 @app.route('/api/compras', methods=['GET'])
 def get_compras():
-    """Obtiene el historial de compras"""
+    """Obtiene el historial de compras (por páginas con ?cursor=&limit=)"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, producto_nombre, cantidad, costo_unitario, total, proveedor, fecha
-            FROM compras
-            ORDER BY fecha DESC
-            LIMIT 100
-        ''')
-        
-        compras = cursor.fetchall()
-        conn.close()
+        siguiente = None
+        paginacion = parametros_paginacion()
+        if paginacion:
+            compras, siguiente = db.obtener_compras_pagina(*paginacion)
+        else:
+            compras = db.obtener_compras(limite=100)
         
-        compras_list = []
-        for c in compras:
-            compras_list.append({
-                'id': c[0],
-                'producto_nombre': c[1],
-                'cantidad': c[2],
-                'costo_unitario': c[3],
-                'total': c[4],
-                'proveedor': c[5],
-                'fecha': c[6]
-            })
-        return jsonify(compras_list)
+        return respuesta_paginada([c.a_json() for c in compras], siguiente)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
@@ -119,9 +154,9 @@ def registrar_compra():
     try:
         nombre_producto = data.get('nombre_producto', '').strip()
         categoria_id = data.get('categoria_id')
-        precio_venta = float(data.get('precio_venta', 0))
+        precio_venta = Money.desde(data.get('precio_venta', 0))
         cantidad = int(data.get('cantidad', 0))
-        costo_unitario = float(data.get('costo_unitario', 0))
+        costo_unitario = Money.desde(data.get('costo_unitario', 0))
         proveedor = data.get('proveedor', 'Proveedor General').strip()
         
         # Validaciones
@@ -137,67 +172,21 @@ def registrar_compra():
         if precio_venta <= 0:
             return jsonify({'success': False, 'message': 'El precio de venta debe ser mayor a 0'}), 400
         
-        total = cantidad * costo_unitario
-        
-        # Verificar presupuesto disponible
-        capital, _ = db.obtener_presupuesto()
-        if capital < total:
-            return jsonify({
-                'success': False, 
-                'message': f'Presupuesto insuficiente. Disponible: ${capital:.2f}, Necesario: ${total:.2f}'
-            }), 400
-        
-        # Obtener conexión para transacción
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Verificar si el producto ya existe
-        cursor.execute('SELECT id, cantidad FROM productos WHERE LOWER(nombre) = LOWER(?)', (nombre_producto,))
-        producto_existente = cursor.fetchone()
-        
-        if producto_existente:
-            # Actualizar producto existente
-            producto_id = producto_existente[0]
-            
-            cursor.execute('''
-                UPDATE productos 
-                SET cantidad = cantidad + ?, precio = ?, categoria_id = ?
-                WHERE id = ?
-            ''', (cantidad, precio_venta, categoria_id, producto_id))
-            
-            accion = "actualizado"
-        else:
-            # Crear nuevo producto
-            cursor.execute('''
-                INSERT INTO productos (nombre, descripcion, precio, cantidad, categoria_id, fecha_agregado)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (nombre_producto, f"Producto agregado por compra", precio_venta, cantidad, categoria_id, fecha))
-            
-            producto_id = cursor.lastrowid
-            accion = "creado"
-        
-        # Registrar la compra en el historial
-        cursor.execute('''
-            INSERT INTO compras (producto_id, producto_nombre, cantidad, costo_unitario, total, proveedor, fecha)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (producto_id, nombre_producto, cantidad, costo_unitario, total, proveedor, fecha))
-        
-        compra_id = cursor.lastrowid
-        
-        # Descontar del presupuesto
-        cursor.execute('''
-            UPDATE presupuesto 
-            SET capital = capital - ?, ultima_actualizacion = ?
-            WHERE id = 1
-        ''', (total, fecha))
+        compra_id, mensaje, producto_id, accion = db.registrar_compra(
+            nombre_producto=nombre_producto,
+            categoria_id=categoria_id,
+            precio_venta=precio_venta,
+            cantidad=cantidad,
+            costo_unitario=costo_unitario,
+            proveedor=proveedor
+        )
         
-        conn.commit()
-        conn.close()
+        if not compra_id:
+            return jsonify({'success': False, 'message': mensaje}), 400
         
         return jsonify({
             'success': True, 
-            'message': f'Producto {accion}: {cantidad} unidades de {nombre_producto}',
+            'message': mensaje,
             'id': compra_id,
             'producto_id': producto_id,
             'accion': accion
@@ -212,41 +201,13 @@ def registrar_compra():
 def get_estadisticas_compras():
     """Obtiene estadísticas de compras"""
     try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        
-        # Total invertido en compras
-        cursor.execute('SELECT IFNULL(SUM(total), 0) FROM compras')
-        total_invertido = cursor.fetchone()[0]
-        
-        # Número total de compras
-        cursor.execute('SELECT COUNT(*) FROM compras')
-        total_compras = cursor.fetchone()[0]
-        
-        # Compra más grande
-        cursor.execute('''
-            SELECT producto_nombre, total, fecha 
-            FROM compras 
-            ORDER BY total DESC 
-            LIMIT 1
-        ''')
-        compra_mayor = cursor.fetchone()
-        
-        # Proveedor más frecuente
-        cursor.execute('''
-            SELECT proveedor, COUNT(*) as cantidad
-            FROM compras
-            GROUP BY proveedor
-            ORDER BY cantidad DESC
-            LIMIT 1
-        ''')
-        proveedor_top = cursor.fetchone()
-        
-        conn.close()
+        stats = db.obtener_estadisticas_compras()
+        compra_mayor = stats['compra_mayor']
+        proveedor_top = stats['proveedor_frecuente']
         
         return jsonify({
-            'total_invertido': total_invertido,
-            'total_compras': total_compras,
+            'total_invertido': stats['total_invertido'],
+            'total_compras': stats['total_compras'],
             'compra_mayor': {
                 'producto': compra_mayor[0] if compra_mayor else 'N/A',
                 'total': compra_mayor[1] if compra_mayor else 0,
@@ -261,23 +222,50 @@ def get_estadisticas_compras():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
+# ===== IMPORTACIÓN MASIVA =====
+@app.route('/api/import', methods=['POST'])
+def importar_productos():
+    """Importa productos/compras desde un archivo CSV o JSONL (campo 'archivo')"""
+    archivo = request.files.get('archivo')
+    if not archivo:
+        return jsonify({'success': False, 'message': 'Adjunta el archivo en el campo "archivo"'}), 400
+    
+    formato = request.form.get('formato') or os.path.splitext(archivo.filename or '')[1].lstrip('.') or 'csv'
+    registrar_compras = request.form.get('registrar_compras', 'true').lower() not in ('0', 'false', 'no')
+    
+    try:
+        tamanio_lote = int(request.form.get('lote', 5000))
+        # Se lee el archivo como flujo de texto, sin cargarlo completo en memoria
+        texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+        resultado = db.importar_productos(
+            leer_registros(texto, formato),
+            tamanio_lote=max(1, tamanio_lote),
+            registrar_compras=registrar_compras
+        )
+    except ValueError as ve:
+        return jsonify({'success': False, 'message': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Error al importar: {str(e)}'}), 400
+    
+    if resultado['detenido']:
+        return jsonify({'success': False, 'message': resultado['detenido'], **resultado}), 400
+    return jsonify({'success': True, 'message': f"{resultado['filas']} filas importadas", **resultado})
+
 # ===== RUTAS DE VENTAS =====
 @app.route('/api/ventas', methods=['GET'])
 def get_ventas():
-    """Obtiene el historial de ventas"""
-    ventas = db.obtener_ventas(limite=100)
-    ventas_list = []
-    for v in ventas:
-        ventas_list.append({
-            'id': v[0],
-            'producto_id': v[1],
-            'producto_nombre': v[2],
-            'cantidad': v[3],
-            'precio_unitario': v[4],
-            'total': v[5],
-            'fecha': v[6]
-        })
-    return jsonify(ventas_list)
+    """Obtiene el historial de ventas (por páginas con ?cursor=&limit=)"""
+    try:
+        siguiente = None
+        paginacion = parametros_paginacion()
+        if paginacion:
+            ventas, siguiente = db.obtener_ventas_pagina(*paginacion)
+        else:
+            ventas = db.obtener_ventas(limite=100)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return respuesta_paginada([v.a_json() for v in ventas], siguiente)
 
 @app.route('/api/ventas', methods=['POST'])
 def registrar_venta():
@@ -297,6 +285,44 @@ def registrar_venta():
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
 
+@app.route('/api/ventas/export.csv', methods=['GET'])
+def exportar_ventas_csv():
+    """Exporta el historial de ventas como CSV en streaming (?desde=&hasta=&producto_id=)"""
+    try:
+        desde = request.args.get('desde') or None
+        hasta = request.args.get('hasta') or None
+        producto_id = request.args.get('producto_id')
+        producto_id = int(producto_id) if producto_id else None
+        # iterar_ventas valida las fechas al llamarla, antes de empezar la respuesta
+        filas = db.iterar_ventas(desde=desde, hasta=hasta, producto_id=producto_id)
+    except ValueError as ve:
+        return jsonify({'success': False, 'message': f'Parámetros inválidos: {str(ve)}'}), 400
+    
+    contenido = generar_csv(filas, ['ID', 'Producto', 'Cantidad', 'Precio', 'Total', 'Fecha'])
+    return Response(
+        stream_with_context(contenido),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=ventas.csv'}
+    )
+
+@app.route('/api/ventas/lote', methods=['POST'])
+def registrar_venta_lote():
+    """Registra un carrito completo: {"lineas": [{"producto_id": 1, "cantidad": 2}, ...]}"""
+    data = request.json or {}
+    
+    try:
+        lineas = [(int(l['producto_id']), int(l['cantidad'])) for l in data.get('lineas', [])]
+        venta_ids, mensaje = db.registrar_venta_lote(lineas)
+        
+        if venta_ids:
+            return jsonify({'success': True, 'message': mensaje, 'ids': venta_ids})
+        else:
+            return jsonify({'success': False, 'message': mensaje}), 400
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'Líneas de venta inválidas: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
 # ===== ESTADÍSTICAS =====
 @app.route('/api/estadisticas', methods=['GET'])
 def get_estadisticas():
@@ -304,6 +330,46 @@ def get_estadisticas():
     stats = db.obtener_estadisticas()
     return jsonify(stats)
 
+@app.route('/api/estadisticas/cache', methods=['GET'])
+def get_estadisticas_cache():
+    """Obtiene los contadores de la caché de consultas"""
+    return jsonify(db.estadisticas_cache())
+
+# ===== REPORTES (mes actual + meses archivados) =====
+@app.route('/api/reportes/anual', methods=['GET'])
+def reporte_anual():
+    """Totales por mes de un año (?anio=2025&tipo=ventas|compras)"""
+    try:
+        anio = request.args.get('anio', type=int) or datetime.now().year
+        tipo = request.args.get('tipo', 'ventas')
+        meses = db.reporte_anual(anio, tipo)
+        return jsonify({
+            'success': True,
+            'anio': anio,
+            'tipo': tipo,
+            'meses': meses,
+            'total': sum((m['total'] for m in meses), Money())
+        })
+    except ValueError as ve:
+        return jsonify({'success': False, 'message': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@app.route('/api/reportes/productos', methods=['GET'])
+def reporte_productos():
+    """Productos más vendidos en un período (?desde=&hasta=&limit=10)"""
+    try:
+        productos = db.reporte_productos(
+            desde=request.args.get('desde') or None,
+            hasta=request.args.get('hasta') or None,
+            limite=max(1, min(request.args.get('limit', 10, type=int), LIMITE_PAGINA_MAXIMO))
+        )
+        return jsonify({'success': True, 'productos': productos})
+    except ValueError as ve:
+        return jsonify({'success': False, 'message': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 # ===== PRESUPUESTO =====
 @app.route('/api/presupuesto', methods=['GET'])
 def get_presupuesto():
@@ -311,12 +377,25 @@ def get_presupuesto():
     presupuesto = db.obtener_presupuesto()
     return jsonify(presupuesto)
 
+@app.route('/api/presupuesto/movimientos', methods=['GET'])
+def get_movimientos_capital():
+    """Historial de movimientos de capital (?limit=100)"""
+    limite = max(1, min(request.args.get('limit', 100, type=int), LIMITE_PAGINA_MAXIMO))
+    movimientos = db.obtener_movimientos_capital(limite)
+    return jsonify([{
+        'id': m[0],
+        'fecha': m[1],
+        'monto': m[2],
+        'concepto': m[3],
+        'referencia': m[4]
+    } for m in movimientos])
+
 @app.route('/api/presupuesto', methods=['PUT'])
 def actualizar_presupuesto():
     """Actualiza el presupuesto manualmente"""
     data = request.json
     try:
-        db.actualizar_presupuesto(float(data['capital']))
+        db.actualizar_presupuesto(Money.desde(data['capital']))
         return jsonify({'success': True, 'message': 'Presupuesto actualizado'})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 400
@@ -324,17 +403,17 @@ def actualizar_presupuesto():
 # ===== GESTIÓN DE ARCHIVOS MENSUALES =====
 @app.route('/api/guardar-mes', methods=['POST'])
 def guardar_mes_actual():
-    """Guarda el archivo de la base de datos actual como backup"""
+    """Guarda un snapshot de la base de datos actual como backup"""
     data = request.json if request.json else {}
     nombre_archivo = data.get('nombre_archivo', None)
     
     try:
-        exito, mensaje, ruta_archivo = db.guardar_mes_actual(nombre_archivo)
+        exito, mensaje, nombre_backup = db.guardar_mes_actual(nombre_archivo)
         if exito:
             return jsonify({
                 'success': True, 
                 'message': mensaje,
-                'archivo': ruta_archivo
+                'archivo': nombre_backup
             })
         else:
             return jsonify({'success': False, 'message': mensaje}), 400
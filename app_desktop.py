@@ -15,18 +15,279 @@ import random
 
 # Importar módulos del proyecto
 from src.models.database_manager import DatabaseManager
+from src.utils.background_worker import BackgroundWorker
 from src.utils.helpers import formatear_moneda, formatear_fecha, validar_numero_positivo, validar_entero_no_negativo, exportar_a_csv
-from config.settings import COLORS, ICONOS_DISPONIBLES, COLORES_DISPONIBLES, OPCIONES_ORDENAMIENTO, APP_NAME
+from config.settings import (COLORS, ICONOS_DISPONIBLES, COLORES_DISPONIBLES, OPCIONES_ORDENAMIENTO, APP_NAME,
+                             REVISION_CAMBIOS_MS)
 
 # Configuración de tema
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
+# Canales del BackgroundWorker que carga cada pantalla
+CANALES_POR_FRAME = {
+    'dashboard': ('dashboard',),
+    'productos': ('productos',),
+    'categorias': ('categorias',),
+    'compras': ('compras', 'combo_compra'),
+    'ventas': ('combo_venta', 'ventas_recientes'),
+    'historial': ('historial',),
+    'estadisticas': ('estadisticas',),
+}
+
+
+class Tabla:
+    """Treeview de create_table que se actualiza por diferencias
+
+    Recuerda qué ítem muestra cada fila (por clave) y con qué valores, así
+    una recarga solo inserta, modifica, mueve o borra las filas que cambiaron.
+    """
+
+    def __init__(self, tree, scroll):
+        self.tree = tree
+        self.scroll = scroll
+        self.items = {}      # clave -> iid del Treeview
+        self.valores = {}    # clave -> valores mostrados
+        self.orden = []      # claves en el orden en que se muestran
+
+    def sincronizar(self, filas, a_valores, clave=lambda fila: fila[0]):
+        """Deja el Treeview mostrando `filas` en ese orden"""
+        nuevas = {clave(fila): tuple(a_valores(fila)) for fila in filas}
+
+        for k in self.orden:
+            if k not in nuevas:
+                self.tree.delete(self.items.pop(k))
+                del self.valores[k]
+        actuales = [k for k in self.orden if k in nuevas]
+
+        for indice, (k, valores) in enumerate(nuevas.items()):
+            if k not in self.items:
+                self.items[k] = self.tree.insert('', indice, values=valores)
+                actuales.insert(indice, k)
+            else:
+                if self.valores[k] != valores:
+                    self.tree.item(self.items[k], values=valores)
+                if actuales[indice] != k:
+                    self.tree.move(self.items[k], '', indice)
+                    actuales.remove(k)
+                    actuales.insert(indice, k)
+            self.valores[k] = valores
+        self.orden = actuales
+
+
+class TablaVirtual:
+    """Tabla que solo crea los ítems de las filas visibles
+
+    El Treeview tiene tantos ítems como filas entran en pantalla; al desplazarse
+    se les cambian los valores en lugar de insertar y borrar. Con `cargar_pagina`
+    (cursor, limite) -> (filas, cursor_siguiente) las filas se piden a la base
+    por páginas a medida que el scroll se acerca al final de lo cargado; cada
+    página se pide en el `worker` (canal `canal`) y hay una sola en camino.
+    """
+
+    FILAS_POR_PAGINA = 200
+
+    def __init__(self, tree, scroll, a_valores, cargar_pagina=None, clave=lambda fila: fila[0],
+                 worker=None, canal=None):
+        self.tree = tree
+        self.scroll = scroll
+        self.a_valores = a_valores
+        self.cargar_pagina = cargar_pagina
+        self.clave = clave
+        self.worker = worker
+        self.canal = canal
+        self.filas = []
+        self.siguiente = None      # cursor de la próxima página
+        self.completa = True       # no quedan páginas por pedir
+        self.pidiendo = False      # hay una página en camino
+        self.primera = 0           # índice de la fila que muestra el primer ítem
+        self.primera_pedida = 0    # posición pedida; se retoma al llegar la página
+        self.seleccion = None      # clave de la fila seleccionada
+        self.visibles = 10
+        self.dibujados = []        # valores que muestra cada ítem, por posición
+        self.alto_fila = int(ttk.Style().lookup(str(tree.cget('style')), 'rowheight') or 20)
+
+        # El scrollbar recorre self.filas, no los ítems del Treeview
+        tree.configure(yscrollcommand='')
+        scroll.configure(command=self.yview)
+        tree.bind('<Configure>', self._al_redimensionar, add='+')
+        tree.bind('<<TreeviewSelect>>', self._al_seleccionar, add='+')
+        for evento in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            tree.bind(evento, self._al_girar_rueda)
+        tree.bind('<Up>', lambda e: self._mover_seleccion(-1))
+        tree.bind('<Down>', lambda e: self._mover_seleccion(1))
+        tree.bind('<Prior>', lambda e: self._mover_seleccion(-self.visibles))
+        tree.bind('<Next>', lambda e: self._mover_seleccion(self.visibles))
+
+    # ===== DATOS =====
+
+    def mostrar(self, filas, al_inicio=False):
+        """Reemplaza las filas (ya cargadas en memoria) conservando el scroll"""
+        self._descartar_pedido()
+        self.filas = list(filas)
+        self.siguiente, self.completa = None, True
+        self.ir_a(0 if al_inicio else self.primera)
+
+    def filas_a_pedir(self):
+        """Filas que hay que pedir de entrada para volver a mostrar la posición actual"""
+        return max(self.FILAS_POR_PAGINA, self.primera + 2 * self.visibles)
+
+    def mostrar_paginas(self, filas, siguiente, al_inicio=False, cargar_pagina=None):
+        """Reemplaza las filas por las primeras páginas, ya pedidas (p. ej. en segundo plano)
+
+        Args:
+            siguiente: Cursor de la página que sigue a `filas`; None si no hay más
+            cargar_pagina: Reemplaza la función de páginas (p. ej. si cambió el orden)
+        """
+        self._descartar_pedido()
+        if cargar_pagina is not None:
+            self.cargar_pagina = cargar_pagina
+        self.filas = list(filas)
+        self.siguiente, self.completa = siguiente, siguiente is None
+        self.ir_a(0 if al_inicio else self.primera)
+
+    def fila_seleccionada(self):
+        for fila in self._ventana():
+            if self.clave(fila) == self.seleccion:
+                return fila
+        return None
+
+    def _cargar_hasta(self, cantidad):
+        """Pide en segundo plano la página siguiente si faltan filas (una a la vez)"""
+        if self.pidiendo or self.completa or len(self.filas) >= cantidad:
+            return
+        self.pidiendo = True
+        cursor = self.siguiente
+        self.worker.submit(self.canal, lambda: self.cargar_pagina(cursor, self.FILAS_POR_PAGINA),
+                           self._recibir_pagina, self._fallo_pagina)
+
+    def _recibir_pagina(self, pagina):
+        filas, self.siguiente = pagina
+        self.filas.extend(filas)
+        self.completa = self.siguiente is None
+        self.pidiendo = False
+        # Si hacen falta más filas para la posición pedida, esto pide la siguiente
+        self.ir_a(self.primera_pedida)
+
+    def _fallo_pagina(self, error):
+        # Se deja de paginar hasta la próxima recarga, para no repetir el error en cada scroll
+        self.pidiendo = False
+        self.completa = True
+        self._dibujar()
+        messagebox.showerror("Error", f"No se pudieron cargar más filas: {error}\n\nUsa 🔄 para reintentar.")
+
+    def _descartar_pedido(self):
+        """Las filas se reemplazan: la página en camino ya no corresponde"""
+        if self.pidiendo:
+            self.worker.cancel(self.canal)
+            self.pidiendo = False
+
+    # ===== DESPLAZAMIENTO =====
+
+    def ir_a(self, primera):
+        """Muestra la ventana que empieza en la fila `primera`"""
+        if self.cargar_pagina:
+            self.primera_pedida = max(0, primera)
+            # Una ventana de margen para que el scrollbar no llegue al final de golpe
+            self._cargar_hasta(primera + 2 * self.visibles)
+        self.primera = max(0, min(primera, len(self.filas) - self.visibles))
+        self._dibujar()
+
+    def yview(self, accion, cantidad, unidad=None):
+        """Recibe los comandos del scrollbar ('moveto' o 'scroll')"""
+        if accion == 'moveto':
+            self.ir_a(int(float(cantidad) * self._total()))
+        elif accion == 'scroll':
+            paso = self.visibles if unidad == 'pages' else 1
+            self.ir_a(self.primera + int(cantidad) * paso)
+
+    def _total(self):
+        # Mientras queden páginas se reserva una ventana más para seguir bajando
+        return len(self.filas) + (0 if self.completa else self.visibles)
+
+    def _ventana(self):
+        return self.filas[self.primera:self.primera + self.visibles]
+
+    def _dibujar(self):
+        ventana = self._ventana()
+        items = self.tree.get_children()
+        if len(items) > len(ventana):
+            self.tree.delete(*items[len(ventana):])
+            del self.dibujados[len(ventana):]
+        for i in range(len(items), len(ventana)):
+            self.tree.insert('', 'end', iid=f'v{i}')
+            self.dibujados.append(None)
+
+        seleccionado = None
+        for i, fila in enumerate(ventana):
+            valores = tuple(self.a_valores(fila))
+            if self.dibujados[i] != valores:
+                self.tree.item(f'v{i}', values=valores)
+                self.dibujados[i] = valores
+            if self.seleccion is not None and self.clave(fila) == self.seleccion:
+                seleccionado = f'v{i}'
+        if seleccionado:
+            self.tree.selection_set(seleccionado)
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        total = self._total()
+        if total:
+            self.scroll.set(self.primera / total, (self.primera + len(ventana)) / total)
+        else:
+            self.scroll.set(0, 1)
+
+    # ===== EVENTOS =====
+
+    def _al_redimensionar(self, event):
+        items = self.tree.get_children()
+        caja = self.tree.bbox(items[0]) if items else None
+        encabezado = caja[1] if caja else self.alto_fila
+        visibles = max(1, (event.height - encabezado) // self.alto_fila)
+        if visibles != self.visibles:
+            self.visibles = visibles
+            self.ir_a(self.primera)
+
+    def _al_seleccionar(self, event):
+        seleccion = self.tree.selection()
+        if seleccion:
+            indice = self.primera + int(seleccion[0][1:])
+            if indice < len(self.filas):
+                self.seleccion = self.clave(self.filas[indice])
+
+    def _al_girar_rueda(self, event):
+        arriba = event.num == 4 or getattr(event, 'delta', 0) > 0
+        self.ir_a(self.primera + (-3 if arriba else 3))
+        return 'break'
+
+    def _mover_seleccion(self, paso):
+        if not self.filas:
+            return 'break'
+        actual = next((self.primera + i for i, fila in enumerate(self._ventana())
+                       if self.clave(fila) == self.seleccion), None)
+        if actual is None:
+            actual = self.primera if paso > 0 else self.primera + self.visibles
+        destino = actual + paso
+        if self.cargar_pagina:
+            self._cargar_hasta(destino + 1)
+        destino = max(0, min(destino, len(self.filas) - 1))
+        self.seleccion = self.clave(self.filas[destino])
+        if destino < self.primera:
+            self.ir_a(destino)
+        elif destino >= self.primera + self.visibles:
+            self.ir_a(destino - self.visibles + 1)
+        else:
+            self._dibujar()
+        return 'break'
+
+
 class WareIncApp:
     def __init__(self):
         self.db = DatabaseManager()
         self.root = ctk.CTk()
         self.root.title(APP_NAME)
+        # Las consultas corren en otro hilo; los resultados vuelven con root.after
+        self.worker = BackgroundWorker(self.root, al_cambiar_ocupado=self.mostrar_cargando)
         
         # Pantalla completa
         self.root.state('zoomed')  # Maximizar en Windows
@@ -34,12 +295,16 @@ class WareIncApp:
         self.root.minsize(1400, 800)
         
         # Variables
-        self.productos = []
         self.categorias = []
         self.producto_editando = None
+        self.carrito = []  # Líneas pendientes de cobro: (producto_id, nombre, precio, cantidad)
+        self.opciones_venta = {}  # Texto del combo de ventas -> Producto (cargado en el worker)
+        self.opciones_categoria_compra = {}  # Texto del combo de compras -> categoria_id
         self.categoria_filtro = None
         self.orden_actual = 'orden_visualizacion'
         self.musica_activa = True
+        self.versiones_vistas = {}  # vista -> versión de la base con la que se dibujó
+        self.frame_actual = None
         
         # Variables de animación (deshabilitadas para mejor rendimiento)
         self.animaciones_activas = False
@@ -50,6 +315,7 @@ class WareIncApp:
         # Construir interfaz
         self.build_ui()
         self.cargar_datos_iniciales()
+        self.root.after(REVISION_CAMBIOS_MS, self.revisar_cambios)
         
     def build_ui(self):
         """Construye la interfaz principal"""
@@ -96,6 +362,9 @@ class WareIncApp:
         ctk.CTkLabel(self.sidebar, text="", height=20).pack(expand=True)
         info = ctk.CTkFrame(self.sidebar, fg_color=COLORS['bg_card'], corner_radius=8)
         info.pack(pady=10, padx=15, fill="x")
+        self.indicador_carga = ctk.CTkLabel(info, text="", font=ctk.CTkFont(size=11),
+                                            text_color=COLORS['warning'])
+        self.indicador_carga.pack(pady=(4, 0))
         ctk.CTkLabel(info, text=f"© {datetime.now().year}", font=ctk.CTkFont(size=9),
                     text_color=COLORS['text_secondary']).pack(pady=4)
         
@@ -128,7 +397,17 @@ class WareIncApp:
         self.nav_buttons.append((btn, frame_name))
         return btn
         
+    def mostrar_cargando(self, ocupado):
+        """Indicador de consultas en curso (lo llama el BackgroundWorker)"""
+        if hasattr(self, 'indicador_carga'):
+            self.indicador_carga.configure(text="⏳ Cargando..." if ocupado else "")
+    
     def show_frame(self, frame_name):
+        # Las cargas pendientes de la pantalla que se deja ya no se van a ver
+        self.worker.cancel(*(canal for nombre, canales in CANALES_POR_FRAME.items()
+                             if nombre != frame_name for canal in canales
+                             if canal not in CANALES_POR_FRAME.get(frame_name, ())))
+        
         for frame in self.frames.values():
             frame.pack_forget()
         if frame_name in self.frames:
@@ -140,6 +419,11 @@ class WareIncApp:
             else:
                 btn.configure(fg_color="transparent", text_color=COLORS['text_secondary'])
         
+        self.frame_actual = frame_name
+        self.cargar_frame(frame_name)
+    
+    def cargar_frame(self, frame_name):
+        """Carga los datos de una pantalla; las que siguen al día no consultan nada"""
         if frame_name == "dashboard":
             self.actualizar_dashboard()
         elif frame_name == "productos":
@@ -149,6 +433,9 @@ class WareIncApp:
         elif frame_name == "compras":
             self.cargar_combo_categorias_compra()
             self.cargar_compras_recientes()
+        elif frame_name == "ventas":
+            self.cargar_combo_productos_venta()
+            self.cargar_ventas_recientes()
         elif frame_name == "historial":
             self.cargar_historial()
         elif frame_name == "estadisticas":
@@ -277,10 +564,13 @@ class WareIncApp:
         self.orden_combo.pack(side="left", padx=5)
         
         ctk.CTkButton(filters, text="🔄", width=35, height=35, corner_radius=10,
-                     fg_color=COLORS['primary'], command=self.cargar_productos).pack(side="left")
+                     fg_color=COLORS['primary'], command=lambda: self.cargar_productos(forzar=True)).pack(side="left")
         
-        self.productos_tree = self.create_table(right, ["ID", "Producto", "Categoría", "Precio", "Stock", "Acciones"], 
-                                               [50, 300, 150, 100, 80, 120])
+        self.productos_tree = self.create_virtual_table(
+            right, ["ID", "Producto", "Categoría", "Precio", "Stock", "Acciones"], [50, 300, 150, 100, 80, 120],
+            lambda p: (p.id, p.nombre[:40], (p.categoria_nombre or "Sin categoría")[:20],
+                       formatear_moneda(p.precio), p.cantidad, "✏️ 🗑️"),
+            cargar_pagina=self._paginas_productos(self.orden_actual), canal='productos_pagina')
         self.productos_tree.tree.bind('<Double-1>', lambda e: self.editar_producto_desde_tabla())
         self.productos_tree.tree.bind('<Button-1>', lambda e: self.click_en_tabla(e, 'productos'))
     
@@ -355,8 +645,8 @@ class WareIncApp:
         ctk.CTkLabel(right, text="Categorías Creadas", font=ctk.CTkFont(size=18, weight="bold"),
                     text_color=COLORS['text_primary']).pack(anchor="w", padx=20, pady=15)
         
-        self.categorias_tree = self.create_table(right, ["ID", "Icono", "Nombre", "Productos", "Acciones"],
-                                                [50, 80, 250, 100, 120])
+        self.categorias_tree = self.create_table(right, ["ID", "Icono", "Nombre", "Productos", "Stock", "Valor", "Acciones"],
+                                                [50, 80, 250, 100, 80, 120, 120])
         self.categorias_tree.tree.bind('<Button-1>', lambda e: self.click_en_tabla(e, 'categorias'))
     
     def create_compras_frame(self):
@@ -505,6 +795,24 @@ class WareIncApp:
             lbl.pack(side="right")
             self.venta_info[key] = lbl
         
+        # Carrito: varias líneas que se cobran juntas en una sola transacción
+        carrito_panel = ctk.CTkFrame(left, fg_color=COLORS['bg_dark'], corner_radius=10)
+        carrito_panel.pack(fill="x", padx=20, pady=10)
+        ctk.CTkLabel(carrito_panel, text="🛒 Carrito", font=ctk.CTkFont(size=12, weight="bold"),
+                    text_color=COLORS['text_secondary']).pack(anchor="w", padx=15, pady=(8, 0))
+        self.carrito_label = ctk.CTkLabel(carrito_panel, text="Vacío", font=ctk.CTkFont(size=12),
+                                         text_color=COLORS['text_primary'], justify="left")
+        self.carrito_label.pack(anchor="w", padx=15, pady=(0, 8))
+        
+        carrito_btns = ctk.CTkFrame(left, fg_color="transparent")
+        carrito_btns.pack(fill="x", padx=20)
+        ctk.CTkButton(carrito_btns, text="➕ Agregar al carrito", font=ctk.CTkFont(size=13, weight="bold"),
+                     height=40, corner_radius=10, fg_color=COLORS['secondary'],
+                     command=self.agregar_al_carrito).pack(side="left", fill="x", expand=True, padx=(0, 5))
+        ctk.CTkButton(carrito_btns, text="🗑️ Vaciar", font=ctk.CTkFont(size=13, weight="bold"),
+                     height=40, corner_radius=10, fg_color=COLORS['danger'],
+                     command=self.vaciar_carrito).pack(side="right", fill="x", expand=True, padx=(5, 0))
+        
         ctk.CTkButton(left, text="✓ PROCESAR VENTA", font=ctk.CTkFont(size=16, weight="bold"),
                      height=55, corner_radius=12, fg_color=COLORS['accent'],
                      command=self.procesar_venta).pack(fill="x", padx=20, pady=20)
@@ -541,10 +849,14 @@ class WareIncApp:
         ctk.CTkButton(btns, text="📥 Exportar", width=120, height=35, corner_radius=10,
                      fg_color=COLORS['secondary'], command=self.exportar_historial).pack(side="left", padx=5)
         ctk.CTkButton(btns, text="🔄", width=35, height=35, corner_radius=10,
-                     fg_color=COLORS['primary'], command=self.cargar_historial).pack(side="left")
-        
-        self.historial_tree = self.create_table(content, ["ID", "Producto", "Cant.", "P.Unit", "Total", "Fecha"],
-                                               [50, 250, 80, 100, 100, 180])
+                     fg_color=COLORS['primary'], command=lambda: self.cargar_historial(forzar=True)).pack(side="left")
+        
+        self.historial_tree = self.create_virtual_table(
+            content, ["ID", "Producto", "Cant.", "P.Unit", "Total", "Fecha"], [50, 250, 80, 100, 100, 180],
+            lambda v: (v.id, v.producto_nombre, v.cantidad, formatear_moneda(v.precio_unitario),
+                       formatear_moneda(v.total), v.fecha),
+            cargar_pagina=lambda cursor, limite: self.db.obtener_ventas_pagina(cursor, limite),
+            canal='historial_pagina')
     
     def create_estadisticas_frame(self):
         frame = ctk.CTkFrame(self.main_container, fg_color="transparent")
@@ -649,10 +961,13 @@ class WareIncApp:
         
         tree.pack(fill="both", expand=True, padx=2, pady=2)
         
-        class Wrapper:
-            def __init__(self, t):
-                self.tree = t
-        return Wrapper(tree)
+        return Tabla(tree, scroll)
+    
+    def create_virtual_table(self, parent, columns, widths, a_valores, cargar_pagina=None, canal=None):
+        """Tabla de create_table que solo dibuja las filas visibles (ver TablaVirtual)"""
+        tabla = self.create_table(parent, columns, widths)
+        return TablaVirtual(tabla.tree, tabla.scroll, a_valores, cargar_pagina,
+                            worker=self.worker, canal=canal)
     
     # ========== LÓGICA DE DATOS ==========
     
@@ -665,112 +980,199 @@ class WareIncApp:
         self.cargar_ventas_recientes()
         self.cargar_compras_recientes()
     
-    def actualizar_dashboard(self):
-        try:
-            capital, _ = self.db.obtener_presupuesto()
-            stats = self.db.obtener_estadisticas()
-            
+    def revisar_cambios(self):
+        """Recarga la pantalla visible si la base cambió, también desde otro proceso (p. ej. la versión web)
+        
+        La consulta a la base (PRAGMA data_version) corre en el worker; en el
+        hilo de Tk solo se comparan las versiones en memoria.
+        """
+        self.worker.submit('revision', self.db.revisar_cambios_externos,
+                           lambda _: self.cargar_frame(self.frame_actual),
+                           lambda e: print(f"Error al revisar cambios: {e}"), silencioso=True)
+        self.root.after(REVISION_CAMBIOS_MS, self.revisar_cambios)
+    
+    def escribir(self, canal, funcion, al_terminar, error):
+        """Ejecuta una escritura en el worker; `al_terminar(resultado)` corre en el hilo de Tk
+        
+        Mientras la anterior del mismo canal siga en curso se ignoran los
+        clics repetidos: una escritura no se reemplaza como una carga.
+        """
+        if canal in self.worker.pendientes():
+            return
+        self.worker.submit(canal, funcion, al_terminar,
+                           lambda e: messagebox.showerror("Error", f"{error}: {e}"))
+    
+    def _version_nueva(self, vista, *tablas, forzar=False):
+        """Versión de las tablas si cambiaron desde que se dibujó la vista; None si sigue al día
+        
+        Lee contadores en memoria (no consulta la base): los cambios de otros
+        procesos los incorpora revisar_cambios desde el worker.
+        """
+        version = self.db.version(*tablas)
+        if not forzar and self.versiones_vistas.get(vista) == version:
+            return None
+        return version
+    
+    def actualizar_dashboard(self, forzar=False):
+        version = self._version_nueva('dashboard', 'productos', 'ventas', 'compras', 'presupuesto', forzar=forzar)
+        if version is None:
+            return
+        
+        def consultar():
+            return (self.db.obtener_presupuesto()[0], self.db.obtener_estadisticas(),
+                    self.db.obtener_productos_bajo_stock())
+        
+        def mostrar(datos):
+            capital, stats, bajo_stock = datos
             self.stat_cards['capital'].value_label.configure(text=formatear_moneda(capital))
             self.stat_cards['productos'].value_label.configure(text=str(stats['total_productos']))
             self.stat_cards['ventas_hoy'].value_label.configure(text=formatear_moneda(stats['ventas_dia']))
             self.stat_cards['ganancia'].value_label.configure(text=formatear_moneda(stats['ganancia_total']))
             
-            bajo_stock = self.db.obtener_productos_bajo_stock()
-            tree = self.bajo_stock_tree.tree
-            for item in tree.get_children():
-                tree.delete(item)
-            for p in bajo_stock:
-                tree.insert('', 'end', values=(p[0], p[1], p[4], formatear_moneda(p[3])))
-        except Exception as e:
-            messagebox.showerror("Error", f"Error en dashboard: {e}")
+            self.bajo_stock_tree.sincronizar(
+                bajo_stock, lambda p: (p.id, p.nombre, p.cantidad, formatear_moneda(p.precio)))
+            self.versiones_vistas['dashboard'] = version
+        
+        self.worker.submit('dashboard', consultar, mostrar,
+                           lambda e: messagebox.showerror("Error", f"Error en dashboard: {e}"))
     
-    def cargar_productos(self):
-        try:
-            self.productos = self.db.obtener_productos(self.orden_actual)
-            tree = self.productos_tree.tree
-            for item in tree.get_children():
-                tree.delete(item)
-            for p in self.productos:
-                # p tiene: id, nombre, desc, precio, cantidad, categoria_id, instrucciones, uso, notas, orden, fecha, cat_nombre, color, icono
-                cat_nombre = p[11] if len(p) > 11 and p[11] else "Sin categoría"
-                tree.insert('', 'end', values=(p[0], p[1][:40], cat_nombre[:20], formatear_moneda(p[3]), p[4], "✏️ 🗑️"))
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al cargar productos: {e}")
+    def _paginas_productos(self, orden):
+        """Función de páginas del inventario en un orden (el cursor depende del orden)"""
+        return lambda cursor, limite: self.db.obtener_productos_pagina(cursor, limite, orden)
+    
+    def cargar_productos(self, al_inicio=False, forzar=False):
+        version = self._version_nueva('productos', 'productos', 'categorias', forzar=forzar or al_inicio)
+        if version is None:
+            return
+        orden = self.orden_actual
+        # Como en el historial: las filas que cubren la posición actual y el resto al desplazarse
+        cantidad = TablaVirtual.FILAS_POR_PAGINA if al_inicio else self.productos_tree.filas_a_pedir()
+        cargar_pagina = self._paginas_productos(orden)
+        
+        def mostrar(pagina):
+            self.productos_tree.mostrar_paginas(*pagina, al_inicio, cargar_pagina)
+            self.versiones_vistas['productos'] = version
+        
+        self.worker.submit('productos', lambda: cargar_pagina(None, cantidad), mostrar,
+                           lambda e: messagebox.showerror("Error", f"Error al cargar productos: {e}"))
     
     def cargar_categorias(self):
-        try:
-            self.categorias = self.db.obtener_categorias()
-            tree = self.categorias_tree.tree
-            for item in tree.get_children():
-                tree.delete(item)
-            for c in self.categorias:
-                # c tiene: id, nombre, descripcion, color, icono, fecha
-                prods = self.db.obtener_productos_por_categoria(c[0])
-                icono = c[4] if len(c) > 4 else "📦"
-                tree.insert('', 'end', values=(c[0], icono, c[1], len(prods), "✏️ 🗑️"))
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al cargar categorías: {e}")
+        version = self._version_nueva('categorias', 'categorias', 'productos')
+        if version is None:
+            return
+        
+        def mostrar(categorias):
+            self.categorias = categorias
+            self.categorias_tree.sincronizar(categorias, lambda c: (
+                c.id, c.icono or "📦", c.nombre, c.productos, c.unidades,
+                formatear_moneda(c.valor_inventario), "✏️ 🗑️"))
+            self.versiones_vistas['categorias'] = version
+        
+        self.worker.submit('categorias', self.db.obtener_categorias_con_totales, mostrar,
+                           lambda e: messagebox.showerror("Error", f"Error al cargar categorías: {e}"))
     
     def cargar_combo_categorias(self):
-        categorias = self.db.obtener_categorias()
-        nombres = [f"{c[4]} {c[1]}" for c in categorias]
-        if nombres:
-            self.producto_entries["categoria"].configure(values=nombres)
-            self.producto_entries["categoria"].set(nombres[0])
-        else:
-            self.producto_entries["categoria"].configure(values=["Sin categorías"])
-            self.producto_entries["categoria"].set("Sin categorías")
+        version = self._version_nueva('combo_categorias', 'categorias')
+        if version is None:
+            return
+        combo = self.producto_entries["categoria"]
+        
+        def mostrar(categorias):
+            nombres = [f"{c.icono} {c.nombre}" for c in categorias]
+            if nombres:
+                # Se conserva la categoría elegida (p. ej. al editar un producto)
+                anterior = combo.get()
+                combo.configure(values=nombres)
+                combo.set(anterior if anterior in nombres else nombres[0])
+            else:
+                combo.configure(values=["Sin categorías"])
+                combo.set("Sin categorías")
+            self.versiones_vistas['combo_categorias'] = version
+        
+        self.worker.submit('combo_categorias', self.db.obtener_categorias, mostrar,
+                           lambda e: print(f"Error al cargar combo categorías: {e}"))
     
     def cargar_combo_productos_venta(self):
-        try:
-            productos = self.db.obtener_productos()
-            nombres = [f"{p[1]} (Stock: {p[4]})" for p in productos if p[4] > 0]
+        version = self._version_nueva('combo_venta', 'productos')
+        if version is None:
+            return
+        
+        def mostrar(productos):
+            anterior = self.producto_seleccionado_venta()
+            self.opciones_venta = {f"{p.nombre} (Stock: {p.cantidad})": p
+                                   for p in productos if p.cantidad > 0}
+            nombres = list(self.opciones_venta)
             if nombres:
                 self.venta_producto.configure(values=nombres)
-                if len(nombres) > 0:
-                    self.venta_producto.set(nombres[0])
-                    self.actualizar_info_venta()
+                # Se conserva el producto elegido aunque cambie su stock en el texto
+                self.venta_producto.set(next((texto for texto, p in self.opciones_venta.items()
+                                              if anterior and p.id == anterior.id), nombres[0]))
+                self.actualizar_info_venta()
             else:
                 self.venta_producto.configure(values=["Sin productos"])
                 self.venta_producto.set("Sin productos")
-        except Exception as e:
-            print(f"Error al cargar combo ventas: {e}")
+            self.versiones_vistas['combo_venta'] = version
+        
+        self.worker.submit('combo_venta', self.db.obtener_productos, mostrar,
+                           lambda e: print(f"Error al cargar combo ventas: {e}"))
     
     def cargar_ventas_recientes(self):
-        ventas = self.db.obtener_ventas(10)
-        tree = self.ventas_recientes_tree.tree
-        for item in tree.get_children():
-            tree.delete(item)
-        for v in ventas:
-            fecha = datetime.strptime(v[6], '%Y-%m-%d %H:%M:%S')
-            tree.insert('', 'end', values=(v[2], v[3], formatear_moneda(v[5]), fecha.strftime('%H:%M:%S')))
+        version = self._version_nueva('ventas_recientes', 'ventas')
+        if version is None:
+            return
+        
+        def mostrar(ventas):
+            # Tras una venta solo se insertan las nuevas arriba y se quitan las que salen
+            self.ventas_recientes_tree.sincronizar(
+                ventas,
+                lambda v: (v.producto_nombre, v.cantidad, formatear_moneda(v.total),
+                           datetime.strptime(v.fecha, '%Y-%m-%d %H:%M:%S').strftime('%H:%M:%S')))
+            self.versiones_vistas['ventas_recientes'] = version
+        
+        self.worker.submit('ventas_recientes', lambda: self.db.obtener_ventas(10), mostrar)
     
-    def cargar_historial(self):
-        ventas = self.db.obtener_ventas(1000)
-        tree = self.historial_tree.tree
-        for item in tree.get_children():
-            tree.delete(item)
-        for v in ventas:
-            tree.insert('', 'end', values=(v[0], v[2], v[3], formatear_moneda(v[4]), formatear_moneda(v[5]), v[6]))
+    def cargar_historial(self, forzar=False):
+        version = self._version_nueva('historial', 'ventas', forzar=forzar)
+        if version is None:
+            return
+        # Se piden de una vez las filas que cubren la posición actual; las
+        # páginas siguientes se piden al desplazarse
+        cantidad = self.historial_tree.filas_a_pedir()
+        
+        def mostrar(pagina):
+            self.historial_tree.mostrar_paginas(*pagina)
+            self.versiones_vistas['historial'] = version
+        
+        self.worker.submit('historial', lambda: self.db.obtener_ventas_pagina(None, cantidad), mostrar,
+                           lambda e: messagebox.showerror("Error", f"Error al cargar historial: {e}"))
     
     def actualizar_estadisticas(self):
-        stats = self.db.obtener_estadisticas()
-        capital, _ = self.db.obtener_presupuesto()
+        version = self._version_nueva('estadisticas', 'productos', 'ventas', 'compras', 'presupuesto')
+        if version is None:
+            return
         
-        self.stat_labels['ganancias'].main_label.configure(text=formatear_moneda(stats['ganancia_total']))
-        self.stat_labels['ventas'].main_label.configure(text=str(stats['total_ventas']))
+        def consultar():
+            return (self.db.obtener_estadisticas(), self.db.obtener_presupuesto()[0],
+                    self.db.obtener_producto_mas_vendido())
         
-        prod, cant = self.db.obtener_producto_mas_vendido()
-        self.stat_labels['producto'].main_label.configure(text=prod)
-        self.stat_labels['producto'].sub_label.configure(text=f"{cant} unidades")
+        def mostrar(datos):
+            stats, capital, (prod, cant) = datos
+            self.stat_labels['ganancias'].main_label.configure(text=formatear_moneda(stats['ganancia_total']))
+            self.stat_labels['ventas'].main_label.configure(text=str(stats['total_ventas']))
+            
+            self.stat_labels['producto'].main_label.configure(text=prod)
+            self.stat_labels['producto'].sub_label.configure(text=f"{cant} unidades")
+            
+            self.stat_labels['capital'].main_label.configure(text=formatear_moneda(capital))
+            self.versiones_vistas['estadisticas'] = version
         
-        self.stat_labels['capital'].main_label.configure(text=formatear_moneda(capital))
+        self.worker.submit('estadisticas', consultar, mostrar)
     
     def cambiar_orden(self, seleccion):
         for key, val in OPCIONES_ORDENAMIENTO.items():
             if val == seleccion:
                 self.orden_actual = key
-                self.cargar_productos()
+                self.cargar_productos(al_inicio=True)
                 break
     
     def click_en_tabla(self, event, tipo):
@@ -869,25 +1271,32 @@ class WareIncApp:
             cat_id = None
             if cat_sel and cat_sel != "Cargando..." and cat_sel != "Sin categorías":
                 for c in self.categorias:
-                    if f"{c[4]} {c[1]}" == cat_sel:
-                        cat_id = c[0]
+                    if f"{c.icono} {c.nombre}" == cat_sel:
+                        cat_id = c.id
                         break
             
-            if self.producto_editando:
-                self.db.actualizar_producto(self.producto_editando, nombre, desc, precio, cant, cat_id, inst, uso, notas)
-                messagebox.showinfo("✅ Éxito", "Producto actualizado correctamente")
-            else:
+            editando = self.producto_editando
+            
+            def guardar():
+                if editando:
+                    return self.db.actualizar_producto(editando, nombre, desc, precio, cant, cat_id, inst, uso, notas)
                 # Parámetros: nombre, descripcion, precio, cantidad, categoria_id, costo_compra, instrucciones, uso, notas
-                resultado = self.db.agregar_producto(nombre, desc, precio, cant, cat_id, costo, inst, uso, notas)
-                if resultado[0] is not None:
+                return self.db.agregar_producto(nombre, desc, precio, cant, cat_id, costo, inst, uso, notas)
+            
+            def terminar(resultado):
+                if editando:
+                    messagebox.showinfo("✅ Éxito", "Producto actualizado correctamente")
+                elif resultado[0] is not None:
                     messagebox.showinfo("✅ Éxito", f"Producto '{nombre}' agregado correctamente con ID: {resultado[0]}")
                 else:
                     messagebox.showerror("❌ Error", resultado[1])
+                
+                self.limpiar_form_producto()
+                self.cargar_productos()
+                self.cargar_combo_productos_venta()
+                self.actualizar_dashboard()
             
-            self.limpiar_form_producto()
-            self.cargar_productos()
-            self.cargar_combo_productos_venta()
-            self.actualizar_dashboard()
+            self.escribir('guardar_producto', guardar, terminar, "Error al guardar producto")
         except Exception as e:
             messagebox.showerror("Error", f"Error al guardar producto: {str(e)}")
     
@@ -913,39 +1322,39 @@ class WareIncApp:
         self.editar_producto(prod_id)
     
     def editar_producto(self, producto_id):
-        """Carga los datos del producto en el formulario"""
-        for p in self.productos:
-            if p[0] == producto_id:
+        """Carga los datos del producto en el formulario (se edita desde la tabla: ya está cargado)"""
+        for p in self.productos_tree.filas:
+            if p.id == producto_id:
                 self.producto_entries['nombre'].delete(0, 'end')
-                self.producto_entries['nombre'].insert(0, p[1])
+                self.producto_entries['nombre'].insert(0, p.nombre)
                 
                 self.producto_entries['descripcion'].delete("1.0", "end")
-                self.producto_entries['descripcion'].insert("1.0", p[2] if p[2] else "")
+                self.producto_entries['descripcion'].insert("1.0", p.descripcion or "")
                 
                 # Seleccionar categoría correcta
-                if p[5]:  # categoria_id
+                if p.categoria_id:
                     for c in self.categorias:
-                        if c[0] == p[5]:
-                            self.producto_entries['categoria'].set(f"{c[4]} {c[1]}")
+                        if c.id == p.categoria_id:
+                            self.producto_entries['categoria'].set(f"{c.icono} {c.nombre}")
                             break
                 
                 self.producto_entries['precio'].delete(0, 'end')
-                self.producto_entries['precio'].insert(0, str(p[3]))
+                self.producto_entries['precio'].insert(0, str(p.precio))
                 
                 self.producto_entries['costo'].delete(0, 'end')
-                self.producto_entries['costo'].insert(0, str(p[3]))
+                self.producto_entries['costo'].insert(0, str(p.precio))
                 
                 self.producto_entries['cantidad'].delete(0, 'end')
-                self.producto_entries['cantidad'].insert(0, str(p[4]))
+                self.producto_entries['cantidad'].insert(0, str(p.cantidad))
                 
                 self.producto_entries['instrucciones'].delete("1.0", "end")
-                self.producto_entries['instrucciones'].insert("1.0", p[6] if p[6] else "")
+                self.producto_entries['instrucciones'].insert("1.0", p.instrucciones_manejo or "")
                 
                 self.producto_entries['uso'].delete("1.0", "end")
-                self.producto_entries['uso'].insert("1.0", p[7] if p[7] else "")
+                self.producto_entries['uso'].insert("1.0", p.uso_especifico or "")
                 
                 self.producto_entries['notas'].delete("1.0", "end")
-                self.producto_entries['notas'].insert("1.0", p[8] if p[8] else "")
+                self.producto_entries['notas'].insert("1.0", p.notas_adicionales or "")
                 
                 self.producto_editando = producto_id
                 self.btn_guardar.configure(text="✏️ Actualizar Producto")
@@ -956,30 +1365,30 @@ class WareIncApp:
         """Elimina un producto"""
         respuesta = messagebox.askyesno("Confirmar", "¿Eliminar este producto?")
         if respuesta:
-            try:
-                self.db.eliminar_producto(producto_id)
+            def terminar(_):
                 messagebox.showinfo("Éxito", "Producto eliminado")
                 self.cargar_productos()
                 self.cargar_combo_productos_venta()
                 self.actualizar_dashboard()
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo eliminar: {e}")
+            
+            self.escribir('eliminar_producto', lambda: self.db.eliminar_producto(producto_id), terminar,
+                          "No se pudo eliminar")
     
     def editar_categoria(self, categoria_id):
         """Edita una categoría"""
         for c in self.categorias:
-            if c[0] == categoria_id:
+            if c.id == categoria_id:
                 self.cat_entries['nombre'].delete(0, 'end')
-                self.cat_entries['nombre'].insert(0, c[1])
+                self.cat_entries['nombre'].insert(0, c.nombre)
                 
                 self.cat_entries['descripcion'].delete("1.0", "end")
-                self.cat_entries['descripcion'].insert("1.0", c[2] if c[2] else "")
+                self.cat_entries['descripcion'].insert("1.0", c.descripcion or "")
                 
-                self.cat_entries['icono'].set(c[4])
+                self.cat_entries['icono'].set(c.icono)
                 
                 # Buscar color por nombre
                 for hex_val, nombre_color in COLORES_DISPONIBLES:
-                    if hex_val == c[3]:
+                    if hex_val == c.color:
                         self.cat_entries['color'].set(nombre_color)
                         break
                 
@@ -991,16 +1400,16 @@ class WareIncApp:
         """Elimina una categoría"""
         respuesta = messagebox.askyesno("Confirmar", "¿Eliminar esta categoría?")
         if respuesta:
-            try:
-                resultado = self.db.eliminar_categoria(categoria_id)
+            def terminar(resultado):
                 if resultado[0]:
                     messagebox.showinfo("Éxito", "Categoría eliminada")
                     self.cargar_categorias()
                     self.cargar_combo_categorias()
                 else:
                     messagebox.showwarning("Advertencia", resultado[1])
-            except Exception as e:
-                messagebox.showerror("Error", f"No se pudo eliminar: {e}")
+            
+            self.escribir('eliminar_categoria', lambda: self.db.eliminar_categoria(categoria_id), terminar,
+                          "No se pudo eliminar")
     
     def guardar_categoria(self):
         try:
@@ -1024,78 +1433,134 @@ class WareIncApp:
                     color_hex = hex_val
                     break
             
-            # Crear la categoría
-            resultado = self.db.crear_categoria(nombre, desc_text, color_hex, icono)
+            def terminar(resultado):
+                if resultado[0]:
+                    messagebox.showinfo("✅ Éxito", f"Categoría '{nombre}' creada correctamente")
+                    
+                    # Limpiar formulario
+                    self.cat_entries['nombre'].delete(0, 'end')
+                    self.cat_entries['descripcion'].delete("1.0", "end")
+                    
+                    # Recargar datos
+                    self.cargar_categorias()
+                    self.cargar_combo_categorias()
+                    self.cargar_combo_categorias_compra()
+                else:
+                    messagebox.showerror("❌ Error", resultado[1])
             
-            if resultado[0]:
-                messagebox.showinfo("✅ Éxito", f"Categoría '{nombre}' creada correctamente")
-                
-                # Limpiar formulario
-                self.cat_entries['nombre'].delete(0, 'end')
-                self.cat_entries['descripcion'].delete("1.0", "end")
-                
-                # Recargar datos
-                self.cargar_categorias()
-                self.cargar_combo_categorias()
-                self.cargar_combo_categorias_compra()
-            else:
-                messagebox.showerror("❌ Error", resultado[1])
+            # Crear la categoría
+            self.escribir('guardar_categoria', lambda: self.db.crear_categoria(nombre, desc_text, color_hex, icono),
+                          terminar, "Error al guardar categoría")
                 
         except Exception as e:
             messagebox.showerror("Error", f"Error al guardar categoría: {str(e)}")
     
     def actualizar_info_venta(self, *args):
         try:
-            sel = self.venta_producto.get()
-            if "Sin productos" in sel:
+            p = self.producto_seleccionado_venta()
+            if not p:
                 return
-            nombre = sel.split(" (Stock:")[0]
-            for p in self.productos:
-                if p[1] == nombre:
-                    try:
-                        cant = int(self.venta_cantidad.get() or 0)
-                    except:
-                        cant = 0
-                    total = p[3] * cant
-                    self.venta_info['producto'].configure(text=p[1])
-                    self.venta_info['precio'].configure(text=formatear_moneda(p[3]))
-                    self.venta_info['stock'].configure(text=str(p[4]))
-                    self.venta_info['total'].configure(text=formatear_moneda(total))
-                    break
+            try:
+                cant = int(self.venta_cantidad.get() or 0)
+            except:
+                cant = 0
+            total = p.precio * cant
+            self.venta_info['producto'].configure(text=p.nombre)
+            self.venta_info['precio'].configure(text=formatear_moneda(p.precio))
+            self.venta_info['stock'].configure(text=str(p.cantidad))
+            self.venta_info['total'].configure(text=formatear_moneda(total))
         except:
             pass
     
-    def procesar_venta(self):
+    def producto_seleccionado_venta(self):
+        """Devuelve el producto elegido en el combo de ventas o None
+        
+        Sale de las filas que cargó el worker para el combo (sin consultar la
+        base): tras cada escritura el combo se recarga, y registrar_venta_lote
+        vuelve a validar el stock al cobrar.
+        """
+        return self.opciones_venta.get(self.venta_producto.get())
+    
+    def agregar_al_carrito(self):
         try:
-            sel = self.venta_producto.get()
-            if "Sin productos" in sel:
+            p = self.producto_seleccionado_venta()
+            if not p:
                 messagebox.showwarning("Advertencia", "Selecciona un producto")
                 return
-            nombre = sel.split(" (Stock:")[0]
             cant = int(self.venta_cantidad.get())
             
             if cant <= 0:
                 messagebox.showwarning("Advertencia", "Cantidad inválida")
                 return
             
-            for p in self.productos:
-                if p[1] == nombre:
-                    if cant > p[4]:
-                        messagebox.showwarning("Advertencia", "Stock insuficiente")
-                        return
-                    resultado = self.db.registrar_venta(p[0], cant)
-                    if resultado[0]:
-                        messagebox.showinfo("Éxito", "¡Venta procesada!")
-                        self.venta_cantidad.delete(0, 'end')
-                        self.venta_cantidad.insert(0, "1")
-                        self.cargar_productos()
-                        self.cargar_combo_productos_venta()
-                        self.cargar_ventas_recientes()
-                        self.actualizar_dashboard()
-                        self.actualizar_info_venta()
-                    else:
-                        messagebox.showerror("Error", resultado[1])
-                    break
+            en_carrito = sum(linea[3] for linea in self.carrito if linea[0] == p.id)
+            if cant + en_carrito > p.cantidad:
+                messagebox.showwarning("Advertencia", "Stock insuficiente")
+                return
+            
+            self.carrito.append((p.id, p.nombre, p.precio, cant))
+            self.venta_cantidad.delete(0, 'end')
+            self.venta_cantidad.insert(0, "1")
+            self.actualizar_carrito()
+        except ValueError:
+            messagebox.showerror("Error", "Cantidad inválida")
+    
+    def vaciar_carrito(self):
+        self.carrito = []
+        self.actualizar_carrito()
+    
+    def actualizar_carrito(self):
+        if not self.carrito:
+            self.carrito_label.configure(text="Vacío")
+            return
+        lineas = [f"{cant} x {nombre[:25]}  {formatear_moneda(precio * cant)}"
+                  for _, nombre, precio, cant in self.carrito]
+        total = sum(precio * cant for _, _, precio, cant in self.carrito)
+        lineas.append(f"TOTAL: {formatear_moneda(total)}")
+        self.carrito_label.configure(text="\n".join(lineas))
+    
+    def procesar_venta(self):
+        try:
+            if self.carrito:
+                lineas = [(producto_id, cant) for producto_id, _, _, cant in self.carrito]
+            else:
+                # Sin carrito se cobra directamente el producto seleccionado
+                p = self.producto_seleccionado_venta()
+                if not p:
+                    messagebox.showwarning("Advertencia", "Selecciona un producto")
+                    return
+                cant = int(self.venta_cantidad.get())
+                
+                if cant <= 0:
+                    messagebox.showwarning("Advertencia", "Cantidad inválida")
+                    return
+                
+                if cant > p.cantidad:
+                    messagebox.showwarning("Advertencia", "Stock insuficiente")
+                    return
+                lineas = [(p.id, cant)]
+            
+            carrito, cobradas = self.carrito, len(self.carrito)
+            
+            def terminar(resultado):
+                if resultado[0]:
+                    messagebox.showinfo("Éxito", "¡Venta procesada!")
+                    self.venta_cantidad.delete(0, 'end')
+                    self.venta_cantidad.insert(0, "1")
+                    # Solo se quitan las líneas cobradas (se pudieron agregar otras mientras tanto)
+                    if self.carrito is carrito:
+                        del carrito[:cobradas]
+                    self.actualizar_carrito()
+                    self.cargar_productos()
+                    self.cargar_combo_productos_venta()
+                    self.cargar_ventas_recientes()
+                    self.actualizar_dashboard()
+                    self.actualizar_info_venta()
+                else:
+                    messagebox.showerror("Error", resultado[1])
+            
+            self.escribir('venta', lambda: self.db.registrar_venta_lote(lineas), terminar,
+                          "No se pudo procesar la venta")
         except ValueError:
             messagebox.showerror("Error", "Cantidad inválida")
         except Exception as e:
@@ -1105,11 +1570,19 @@ class WareIncApp:
         archivo = filedialog.asksaveasfilename(defaultextension=".csv", 
                                               filetypes=[("CSV", "*.csv"), ("Todos", "*.*")])
         if archivo:
-            ventas = self.db.obtener_ventas(10000)
-            if exportar_a_csv(ventas, ['ID', 'Producto', 'Cantidad', 'Precio', 'Total', 'Fecha'], archivo):
-                messagebox.showinfo("Éxito", "Historial exportado")
-            else:
-                messagebox.showerror("Error", "No se pudo exportar")
+            # Se escribe fila por fila desde el cursor, sin límite ni lista en memoria
+            def exportar():
+                return exportar_a_csv(self.db.iterar_ventas(),
+                                      ['ID', 'Producto', 'Cantidad', 'Precio', 'Total', 'Fecha'], archivo)
+            
+            def avisar(exportado):
+                if exportado:
+                    messagebox.showinfo("Éxito", "Historial exportado")
+                else:
+                    messagebox.showerror("Error", "No se pudo exportar")
+            
+            self.worker.submit(f'exportar:{archivo}', exportar, avisar,
+                               lambda e: messagebox.showerror("Error", f"No se pudo exportar: {e}"))
     
     def modal_presupuesto(self):
         modal = ctk.CTkToplevel(self.root)
@@ -1125,21 +1598,30 @@ class WareIncApp:
         ctk.CTkLabel(content, text="💰 Gestionar Capital", font=ctk.CTkFont(size=24, weight="bold"),
                     text_color=COLORS['text_primary']).pack(pady=20)
         
-        capital, _ = self.db.obtener_presupuesto()
-        
         info = ctk.CTkFrame(content, fg_color=COLORS['bg_dark'], corner_radius=10)
         info.pack(fill="x", padx=20, pady=10)
         ctk.CTkLabel(info, text="Capital Actual:", font=ctk.CTkFont(size=14),
                     text_color=COLORS['text_secondary']).pack(pady=(15, 5))
-        ctk.CTkLabel(info, text=formatear_moneda(capital), font=ctk.CTkFont(size=28, weight="bold"),
-                    text_color=COLORS['accent']).pack(pady=(0, 15))
+        capital_label = ctk.CTkLabel(info, text="Cargando...", font=ctk.CTkFont(size=28, weight="bold"),
+                                     text_color=COLORS['accent'])
+        capital_label.pack(pady=(0, 15))
         
         ctk.CTkLabel(content, text="Nuevo Capital:", font=ctk.CTkFont(size=12),
                     text_color=COLORS['text_secondary']).pack(anchor="w", padx=20, pady=(20, 5))
         entry = ctk.CTkEntry(content, height=45, corner_radius=10, border_width=0, fg_color=COLORS['bg_dark'],
                             font=ctk.CTkFont(size=16))
         entry.pack(fill="x", padx=20, pady=(0, 20))
-        entry.insert(0, str(capital))
+        
+        def mostrar_capital(presupuesto):
+            if not modal.winfo_exists():
+                return
+            capital = presupuesto[0]
+            capital_label.configure(text=formatear_moneda(capital))
+            if not entry.get():
+                entry.insert(0, str(capital))
+        
+        self.worker.submit('modal_presupuesto', self.db.obtener_presupuesto, mostrar_capital,
+                           lambda e: messagebox.showerror("Error", f"Error al leer el capital: {e}"))
         
         def actualizar():
             try:
@@ -1147,14 +1629,20 @@ class WareIncApp:
                 if nuevo < 0:
                     messagebox.showwarning("Advertencia", "No puede ser negativo")
                     return
-                self.db.actualizar_presupuesto(nuevo)
+            except ValueError:
+                messagebox.showerror("Error", "Valor inválido")
+                return
+            
+            def terminar(_):
                 messagebox.showinfo("Éxito", "Capital actualizado")
-                modal.destroy()
+                if modal.winfo_exists():
+                    modal.destroy()
                 self.actualizar_dashboard()
                 self.actualizar_estadisticas()
-            except ValueError:
-                messagebox.showerror("Error", "Valor inválido")
-        
+            
+            self.escribir('presupuesto', lambda: self.db.actualizar_presupuesto(nuevo), terminar,
+                          "No se pudo actualizar el capital")
+
         btns = ctk.CTkFrame(content, fg_color="transparent")
         btns.pack(fill="x", padx=20, pady=10)
         ctk.CTkButton(btns, text="✓ Actualizar", font=ctk.CTkFont(size=14, weight="bold"), height=45,
@@ -1164,17 +1652,25 @@ class WareIncApp:
     
     def cargar_combo_categorias_compra(self):
         """Carga las categorías en el combo de compras"""
-        try:
-            categorias = self.db.obtener_categorias()
-            nombres = [f"{c[4]} {c[1]}" if len(c) > 4 else c[1] for c in categorias]
+        version = self._version_nueva('combo_compra', 'categorias')
+        if version is None:
+            return
+        
+        def mostrar(categorias):
+            anterior = self.opciones_categoria_compra.get(self.compra_categoria.get())
+            self.opciones_categoria_compra = {f"{c.icono} {c.nombre}": c.id for c in categorias}
+            nombres = list(self.opciones_categoria_compra)
             if nombres:
                 self.compra_categoria.configure(values=nombres)
-                self.compra_categoria.set(nombres[0])
+                self.compra_categoria.set(next((texto for texto, categoria_id in self.opciones_categoria_compra.items()
+                                                if categoria_id == anterior), nombres[0]))
             else:
                 self.compra_categoria.configure(values=["Sin categorías"])
                 self.compra_categoria.set("Sin categorías")
-        except Exception as e:
-            print(f"Error al cargar combo categorías compras: {e}")
+            self.versiones_vistas['combo_compra'] = version
+        
+        self.worker.submit('combo_compra', self.db.obtener_categorias, mostrar,
+                           lambda e: print(f"Error al cargar combo categorías compras: {e}"))
     
     def actualizar_total_compra(self, event=None):
         """Actualiza el total de la compra"""
@@ -1237,89 +1733,42 @@ class WareIncApp:
                 messagebox.showwarning("Advertencia", "El costo debe ser mayor a 0")
                 return
             
-            total = cantidad * costo_unitario
-            
-            # Verificar presupuesto
-            capital, _ = self.db.obtener_presupuesto()
-            if capital < total:
-                messagebox.showerror("Error", f"Presupuesto insuficiente. Disponible: {formatear_moneda(capital)}, Necesario: {formatear_moneda(total)}")
-                return
-            
-            # Obtener ID de categoría
-            categoria_id = None
-            for c in self.categorias:
-                nombre_cat = f"{c[4]} {c[1]}" if len(c) > 4 else c[1]
-                if nombre_cat == categoria_sel:
-                    categoria_id = c[0]
-                    break
-            
+            categoria_id = self.opciones_categoria_compra.get(categoria_sel)
             if not categoria_id:
                 messagebox.showerror("Error", "Categoría no encontrada")
                 return
             
-            # Verificar si el producto ya existe
-            productos = self.db.obtener_productos()
-            producto_existente = None
-            for p in productos:
-                if p[1].lower() == nombre_producto.lower():
-                    producto_existente = p
-                    break
-            
-            fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
+            def comprar():
+                # Si ya existe (aunque difiera en mayúsculas o espacios) se repone ese producto
+                existente = self.db.producto_por_nombre(nombre_producto)
+                return self.db.registrar_compra(
+                    existente.nombre if existente else nombre_producto, categoria_id, precio_venta,
+                    cantidad, costo_unitario, proveedor
+                )
             
-            if producto_existente:
-                # Actualizar producto existente
-                producto_id = producto_existente[0]
+            def terminar(resultado):
+                compra_id, mensaje, _, _ = resultado
+                if not compra_id:
+                    messagebox.showerror("Error", mensaje)
+                    return
                 
-                # Actualizar stock y precio
-                cursor.execute('''
-                    UPDATE productos 
-                    SET cantidad = cantidad + ?, precio = ?, categoria_id = ?
-                    WHERE id = ?
-                ''', (cantidad, precio_venta, categoria_id, producto_id))
-            else:
-                # Crear nuevo producto
-                cursor.execute('''
-                    INSERT INTO productos (nombre, descripcion, precio, cantidad, categoria_id, fecha_creacion)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (nombre_producto, f"Producto agregado por compra", precio_venta, cantidad, categoria_id, fecha))
+                messagebox.showinfo("Éxito", mensaje)
                 
-                producto_id = cursor.lastrowid
-            
-            # Registrar compra en historial
-            cursor.execute('''
-                INSERT INTO compras (producto_id, producto_nombre, cantidad, costo_unitario, total, proveedor, fecha)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (producto_id, nombre_producto, cantidad, costo_unitario, total, proveedor, fecha))
-            
-            # Descontar del presupuesto
-            cursor.execute('''
-                UPDATE presupuesto 
-                SET capital = capital - ?, ultima_actualizacion = ?
-                WHERE id = 1
-            ''', (total, fecha))
-            
-            conn.commit()
-            conn.close()
-            
-            accion = "actualizado" if producto_existente else "creado y agregado"
-            messagebox.showinfo("Éxito", f"Producto {accion}: {cantidad} unidades de {nombre_producto}")
-            
-            # Limpiar formulario
-            self.compra_nombre_producto.delete(0, 'end')
-            self.compra_precio_venta.delete(0, 'end')
-            self.compra_cantidad.delete(0, 'end')
-            self.compra_costo.delete(0, 'end')
-            self.compra_proveedor.delete(0, 'end')
-            self.compra_total_label.configure(text="$0.00")
+                # Limpiar formulario
+                self.compra_nombre_producto.delete(0, 'end')
+                self.compra_precio_venta.delete(0, 'end')
+                self.compra_cantidad.delete(0, 'end')
+                self.compra_costo.delete(0, 'end')
+                self.compra_proveedor.delete(0, 'end')
+                self.compra_total_label.configure(text="$0.00")
+                
+                # Actualizar datos
+                self.cargar_productos()
+                self.cargar_compras_recientes()
+                self.cargar_combo_productos_venta()
+                self.actualizar_dashboard()
             
-            # Actualizar datos
-            self.cargar_productos()
-            self.cargar_compras_recientes()
-            self.cargar_combo_productos_venta()
-            self.actualizar_dashboard()
+            self.escribir('compra', comprar, terminar, "Error al procesar compra")
             
         except ValueError as ve:
             messagebox.showerror("Error", f"Valores numéricos inválidos: {str(ve)}")
@@ -1328,37 +1777,24 @@ class WareIncApp:
     
     def cargar_compras_recientes(self):
         """Carga el historial de compras"""
-        try:
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT id, producto_nombre, cantidad, costo_unitario, total, proveedor, fecha
-                FROM compras
-                ORDER BY fecha DESC
-                LIMIT 100
-            ''')
-            
-            compras = cursor.fetchall()
-            conn.close()
-            
-            tree = self.compras_tree.tree
-            for item in tree.get_children():
-                tree.delete(item)
-            
-            for c in compras:
-                fecha_corta = c[6][:16] if len(c[6]) > 16 else c[6]
-                tree.insert('', 'end', values=(
-                    c[0],
-                    c[1][:30],
-                    c[2],
-                    formatear_moneda(c[3]),
-                    formatear_moneda(c[4]),
-                    c[5][:20],
-                    fecha_corta
-                ))
-        except Exception as e:
-            print(f"Error al cargar compras: {e}")
+        version = self._version_nueva('compras', 'compras')
+        if version is None:
+            return
+        
+        def mostrar(compras):
+            self.compras_tree.sincronizar(compras, lambda c: (
+                c.id,
+                c.producto_nombre[:30],
+                c.cantidad,
+                formatear_moneda(c.costo_unitario),
+                formatear_moneda(c.total),
+                (c.proveedor or '')[:20],
+                c.fecha[:16]
+            ))
+            self.versiones_vistas['compras'] = version
+        
+        self.worker.submit('compras', lambda: self.db.obtener_compras(limite=100), mostrar,
+                           lambda e: print(f"Error al cargar compras: {e}"))
     
     def iniciar_musica(self):
         """Inicializa y reproduce la música de fondo automáticamente"""
@@ -1396,7 +1832,11 @@ class WareIncApp:
             print(f"⚠️ Error al controlar música: {e}")
     
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.worker.shutdown()
+            self.db.cerrar()
 
 
 if __name__ == "__main__":
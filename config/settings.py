@@ -10,6 +10,85 @@ APP_DESCRIPTION = "Sistema Profesional de Gestión de Inventario y Ventas"
 # Configuración de la base de datos
 DATABASE_NAME = "inventario_ventas.db"
 
+# Pool de conexiones compartido por la app web y la de escritorio
+DATABASE_POOL = {
+    'tamanio': 5,       # Conexiones abiertas como máximo
+    'timeout': 10.0     # Segundos de espera por una conexión libre o un bloqueo
+}
+
+# Perfiles de PRAGMAs aplicados a cada conexión al abrirla
+DATABASE_PERFILES = {
+    # WAL: las lecturas no se bloquean mientras se registra una venta
+    'rendimiento': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,           # ms esperando un bloqueo antes de fallar
+        'mmap_size': 268435456,         # 256 MB mapeados en memoria
+        'cache_size': -20000,           # ~20 MB de caché de páginas por conexión
+        'temp_store': 'MEMORY',
+        'wal_autocheckpoint': 0         # El checkpoint lo hace el hilo en segundo plano
+    },
+    # WAL con sincronización completa en cada commit
+    'seguro': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+        'wal_autocheckpoint': 0
+    },
+    # Comportamiento por defecto de SQLite (rollback journal)
+    'compatibilidad': {
+        'journal_mode': 'DELETE',
+        'busy_timeout': 5000
+    }
+}
+DATABASE_PERFIL = 'rendimiento'
+
+# Checkpoint del WAL en segundo plano (fuera del camino de escritura)
+DATABASE_CHECKPOINT = {
+    'intervalo': 30.0,          # Segundos entre checkpoints
+    'max_paginas_wal': 4000     # Si el WAL sigue creciendo, se intenta TRUNCATE
+}
+
+# Caché de lecturas del dashboard; se invalida con cada escritura.
+# El TTL limita cuánto puede tardar en verse un cambio hecho por otro
+# proceso (p. ej. la app web y la de escritorio sobre el mismo archivo).
+DATABASE_CACHE = {
+    'activo': True,
+    'ttl': 30.0         # Segundos; None = sin vencimiento
+}
+
+# Cada cuánto la app de escritorio revisa si la base cambió (p. ej. una venta
+# desde la versión web) para recargar la pantalla visible
+REVISION_CAMBIOS_MS = 5000
+
+# Presupuesto: cada venta o compra agrega un movimiento de capital; el saldo
+# es el snapshot de la tabla presupuesto más los movimientos posteriores
+PRESUPUESTO = {
+    'movimientos_por_snapshot': 500    # Pendientes que disparan la compactación del snapshot
+}
+
+# Backup en caliente con la API de SQLite (guardar_mes_actual)
+DATABASE_BACKUP = {
+    'paginas_por_paso': 256,    # Páginas copiadas por paso (~1 MB con páginas de 4 KB)
+    'pausa': 0.005,             # Segundos entre pasos para dejar escribir a las ventas
+    'max_reinicios': 5          # Si el archivo cambia tantas veces, se termina en un paso
+}
+
+# Almacén de backups mensuales: bloques comprimidos y deduplicados
+BACKUPS = {
+    'directorio': 'backups_mensuales',
+    'paginas_por_bloque': 16,   # 64 KB por bloque con páginas de 4 KB
+    'nivel_compresion': 6       # zlib, 1 (rápido) a 9 (más chico)
+}
+
+# Exportación columnar para análisis (requiere pyarrow)
+EXPORTACION_PARQUET = {
+    'directorio': 'exportaciones',  # Raíz de las particiones <tabla>/mes=AAAA-MM/
+    'compresion': 'zstd',
+    'filas_por_bloque': 50000
+}
+
 # Paleta de colores moderna
 COLORS = {
     'primary': '#1E3A8A',      # Azul oscuro profesional
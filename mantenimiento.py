@@ -0,0 +1,148 @@
+"""
+Tareas de mantenimiento de la base de datos de WareInc
+
+Uso:
+    python mantenimiento.py reconstruir-resumenes [--db inventario_ventas.db]
+    python mantenimiento.py importar archivo.csv [--formato csv|jsonl] [--lote 5000] [--sin-compras]
+    python mantenimiento.py particiones [--cerrar] [--meses-abiertos 2] [--compactar]
+    python mantenimiento.py backups
+    python mantenimiento.py restaurar-backup nombre destino.db
+    python mantenimiento.py exportar-parquet [--destino exportaciones] [--tablas ventas compras]
+"""
+
+import argparse
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.models.database_manager import DatabaseManager
+from src.utils.helpers import leer_registros
+from src.utils.parquet_export import ParquetExporter, pyarrow_disponible
+from config.settings import DATABASE_NAME, EXPORTACION_PARQUET
+
+
+def reconstruir_resumenes(db: DatabaseManager, args) -> int:
+    """Recalcula las tablas de resumen a partir del historial"""
+    inicio = time.perf_counter()
+    db.reconstruir_resumenes()
+    print(f"✅ Resúmenes reconstruidos en {time.perf_counter() - inicio:.2f} s")
+    return 0
+
+
+def importar(db: DatabaseManager, args) -> int:
+    """Importa productos/compras desde un archivo CSV o JSONL"""
+    resultado = db.importar_productos(
+        leer_registros(args.archivo, args.formato),
+        tamanio_lote=args.lote,
+        registrar_compras=not args.sin_compras
+    )
+    print(f"✅ {resultado['filas']} filas importadas en {resultado['segundos']:.2f} s "
+          f"({resultado['filas_por_segundo']:.0f} filas/s)")
+    print(f"   Productos creados: {resultado['creados']} | Reposiciones: {resultado['actualizados']}")
+    if resultado['errores']:
+        print(f"⚠️ {resultado['errores']} filas con errores:")
+        for mensaje in resultado['mensajes_error']:
+            print(f"   - {mensaje}")
+    if resultado['detenido']:
+        print(f"❌ Importación detenida: {resultado['detenido']}")
+        return 1
+    return 0
+
+
+def particiones(db: DatabaseManager, args) -> int:
+    """Lista las particiones mensuales y opcionalmente cierra las viejas"""
+    if args.cerrar:
+        _, mensaje = db.cerrar_particiones(args.meses_abiertos, compactar=args.compactar)
+        print(f"✅ {mensaje}")
+    for particion in db.obtener_particiones():
+        estado = 'cerrada' if particion['solo_lectura'] else 'abierta'
+        print(f"{particion['tabla']:<8} {particion['mes']}  {particion['filas']:>10} filas  {estado}")
+    return 0
+
+
+def backups(db: DatabaseManager, args) -> int:
+    """Lista los backups guardados"""
+    lista = db.listar_backups()
+    if not lista:
+        print("No hay backups guardados")
+    for backup in lista:
+        print(f"{backup['fecha_modificacion']}  {backup['nombre']:<40} "
+              f"{backup['tamanio'] / 1024:>10.1f} KB  ({backup['bytes_escritos'] / 1024:.1f} KB en disco)")
+    return 0
+
+
+def restaurar_backup(db: DatabaseManager, args) -> int:
+    """Reconstruye un backup como archivo .db"""
+    exito, mensaje = db.restaurar_backup(args.nombre, args.destino)
+    print(f"✅ {mensaje}" if exito else f"❌ {mensaje}")
+    return 0 if exito else 1
+
+
+def exportar_parquet(db: DatabaseManager, args) -> int:
+    """Exporta las ventas y compras nuevas a Parquet particionado por mes"""
+    if not pyarrow_disponible():
+        print("❌ La exportación a Parquet requiere pyarrow: pip install pyarrow")
+        return 1
+    inicio = time.perf_counter()
+    exportador = ParquetExporter(db, args.destino, compresion=args.compresion,
+                                 filas_por_bloque=EXPORTACION_PARQUET['filas_por_bloque'])
+    try:
+        resultados = exportador.exportar(args.tablas)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    for tabla, resultado in resultados.items():
+        meses = ', '.join(resultado['meses']) or '-'
+        print(f"✅ {tabla}: {resultado['filas']} filas nuevas (meses: {meses})")
+    print(f"   Exportación en {time.perf_counter() - inicio:.2f} s -> {args.destino}")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mantenimiento de la base de datos de WareInc")
+    parser.add_argument('--db', default=DATABASE_NAME, help="Archivo de base de datos")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    sub = subparsers.add_parser('reconstruir-resumenes', help="Recalcula los resúmenes de ventas y compras")
+    sub.set_defaults(funcion=reconstruir_resumenes)
+
+    sub = subparsers.add_parser('importar', help="Importa productos y compras desde CSV o JSONL")
+    sub.add_argument('archivo', help="Archivo .csv o .jsonl")
+    sub.add_argument('--formato', choices=['csv', 'jsonl'], help="Formato (por defecto según la extensión)")
+    sub.add_argument('--lote', type=int, default=5000, help="Filas por transacción")
+    sub.add_argument('--sin-compras', action='store_true',
+                     help="Solo cargar el catálogo, sin registrar compras ni tocar el presupuesto")
+    sub.set_defaults(funcion=importar)
+
+    sub = subparsers.add_parser('particiones', help="Lista y cierra particiones mensuales de ventas y compras")
+    sub.add_argument('--cerrar', action='store_true', help="Dejar de solo lectura los meses anteriores")
+    sub.add_argument('--meses-abiertos', type=int, default=2, help="Meses recientes que siguen abiertos")
+    sub.add_argument('--compactar', action='store_true', help="Ejecutar VACUUM después de cerrar")
+    sub.set_defaults(funcion=particiones)
+
+    sub = subparsers.add_parser('backups', help="Lista los backups guardados")
+    sub.set_defaults(funcion=backups)
+
+    sub = subparsers.add_parser('restaurar-backup', help="Reconstruye un backup como archivo .db")
+    sub.add_argument('nombre', help="Nombre del backup (ver 'backups')")
+    sub.add_argument('destino', help="Archivo .db a crear")
+    sub.set_defaults(funcion=restaurar_backup)
+
+    sub = subparsers.add_parser('exportar-parquet', help="Exporta ventas y compras nuevas a Parquet por mes")
+    sub.add_argument('--destino', default=EXPORTACION_PARQUET['directorio'], help="Directorio de salida")
+    sub.add_argument('--tablas', nargs='+', choices=['ventas', 'compras'], default=['ventas', 'compras'])
+    sub.add_argument('--compresion', default=EXPORTACION_PARQUET['compresion'],
+                     choices=['zstd', 'snappy', 'gzip', 'none'])
+    sub.set_defaults(funcion=exportar_parquet)
+
+    args = parser.parse_args(argv)
+    db = DatabaseManager(args.db)
+    try:
+        return args.funcion(db, args)
+    finally:
+        db.cerrar()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
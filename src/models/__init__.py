@@ -1,4 +1,8 @@
 """Paquete de modelos del sistema"""
 from .database_manager import DatabaseManager
+from .connection_pool import ConnectionPool
+from .product_index import ProductIndex
+from .rows import Producto, Venta, Compra, Categoria, CategoriaResumen
 
-__all__ = ['DatabaseManager']
+__all__ = ['DatabaseManager', 'ConnectionPool', 'ProductIndex', 'Producto', 'Venta', 'Compra', 'Categoria',
+           'CategoriaResumen']
@@ -0,0 +1,188 @@
+"""
+Almacén de backups deduplicado - Sistema de Inventario y Ventas
+Guarda cada copia como una lista de bloques comprimidos direccionados por contenido
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class BackupStore:
+    """Snapshots de la base de datos que solo escriben los bloques que cambiaron
+
+    El archivo se corta en bloques de ``paginas_por_bloque`` páginas de SQLite.
+    Cada bloque se guarda comprimido en ``bloques/<hash[:2]>/<hash>`` con su
+    SHA-256 como nombre, así un bloque idéntico en dos snapshots ocupa disco una
+    sola vez. ``manifiesto.json`` lista los snapshots y los bloques de cada uno.
+    """
+
+    ARCHIVO_MANIFIESTO = 'manifiesto.json'
+
+    def __init__(self, directorio: str, paginas_por_bloque: int = 16, nivel_compresion: int = 6):
+        self.directorio = directorio
+        self.paginas_por_bloque = paginas_por_bloque
+        self.nivel_compresion = nivel_compresion
+        self._lock = threading.Lock()
+
+    # ===== MANIFIESTO =====
+
+    def _ruta_manifiesto(self) -> str:
+        return os.path.join(self.directorio, self.ARCHIVO_MANIFIESTO)
+
+    def _leer_manifiesto(self) -> Dict:
+        try:
+            with open(self._ruta_manifiesto(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': 1, 'snapshots': []}
+
+    def _escribir_manifiesto(self, manifiesto: Dict):
+        """Escribe el manifiesto de forma atómica (archivo temporal + rename)"""
+        temporal = self._ruta_manifiesto() + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, indent=1, ensure_ascii=False)
+        os.replace(temporal, self._ruta_manifiesto())
+
+    def _ruta_bloque(self, huella: str) -> str:
+        return os.path.join(self.directorio, 'bloques', huella[:2], huella)
+
+    # ===== SNAPSHOTS =====
+
+    def existe(self, nombre: str) -> bool:
+        """Indica si ya hay un snapshot con ese nombre"""
+        return self.obtener(nombre) is not None
+
+    def obtener(self, nombre: str) -> Optional[Dict]:
+        """Entrada del manifiesto de un snapshot, o None"""
+        for snapshot in self._leer_manifiesto()['snapshots']:
+            if snapshot['nombre'] == nombre:
+                return snapshot
+        return None
+
+    def listar(self) -> List[Dict]:
+        """Snapshots registrados, del más reciente al más antiguo"""
+        snapshots = self._leer_manifiesto()['snapshots']
+        # Se parte del orden inverso de creación para desempatar snapshots del mismo segundo
+        return sorted(reversed(snapshots), key=lambda s: s['fecha'], reverse=True)
+
+    def guardar(self, archivo_db: str, nombre: str) -> Dict:
+        """Agrega un snapshot a partir de una copia consistente de la base de datos
+
+        Args:
+            archivo_db: Copia cerrada y verificada (p. ej. de respaldar_en_caliente)
+            nombre: Nombre único del snapshot
+
+        Returns:
+            Entrada del manifiesto con los bloques nuevos y los bytes escritos
+        """
+        conn = sqlite3.connect(archivo_db)
+        try:
+            tamanio_pagina = conn.execute('PRAGMA page_size').fetchone()[0]
+        finally:
+            conn.close()
+        # Bloques alineados a páginas: una página modificada cambia un solo bloque
+        tamanio_bloque = tamanio_pagina * self.paginas_por_bloque
+
+        with self._lock:
+            if self.existe(nombre):
+                raise ValueError(f'Ya existe un backup llamado {nombre}')
+            snapshot = self._escribir_bloques(archivo_db, tamanio_bloque)
+            snapshot['nombre'] = nombre
+            # Los bloques se escriben antes que el manifiesto: un corte a mitad de
+            # camino deja bloques sueltos, nunca un snapshot incompleto
+            manifiesto = self._leer_manifiesto()
+            manifiesto['snapshots'].append(snapshot)
+            self._escribir_manifiesto(manifiesto)
+        return snapshot
+
+    def _escribir_bloques(self, archivo_db: str, tamanio_bloque: int) -> Dict:
+        """Guarda los bloques que todavía no están en el almacén"""
+        huellas = []
+        nuevos = 0
+        escritos = 0
+        total = hashlib.sha256()
+        with open(archivo_db, 'rb') as f:
+            while True:
+                datos = f.read(tamanio_bloque)
+                if not datos:
+                    break
+                total.update(datos)
+                huella = hashlib.sha256(datos).hexdigest()
+                huellas.append(huella)
+                ruta = self._ruta_bloque(huella)
+                if not os.path.exists(ruta):
+                    comprimido = zlib.compress(datos, self.nivel_compresion)
+                    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+                    with open(ruta + '.tmp', 'wb') as destino:
+                        destino.write(comprimido)
+                    os.replace(ruta + '.tmp', ruta)
+                    nuevos += 1
+                    escritos += len(comprimido)
+
+        return {
+            'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'tamanio': os.path.getsize(archivo_db),
+            'tamanio_bloque': tamanio_bloque,
+            'sha256': total.hexdigest(),
+            'bloques': huellas,
+            'bloques_nuevos': nuevos,
+            'bytes_escritos': escritos
+        }
+
+    def restaurar(self, nombre: str, destino: str) -> str:
+        """Reconstruye el archivo .db de un snapshot en `destino`
+
+        Raises:
+            ValueError: Si el snapshot no existe o su contenido no coincide con la huella
+        """
+        snapshot = self.obtener(nombre)
+        if snapshot is None:
+            raise ValueError(f'No existe el backup {nombre}')
+
+        temporal = f'{destino}.tmp'
+        total = hashlib.sha256()
+        try:
+            with open(temporal, 'wb') as f:
+                for huella in snapshot['bloques']:
+                    with open(self._ruta_bloque(huella), 'rb') as bloque:
+                        datos = zlib.decompress(bloque.read())
+                    total.update(datos)
+                    f.write(datos)
+            if total.hexdigest() != snapshot['sha256']:
+                raise ValueError(f'El backup {nombre} está dañado (la huella no coincide)')
+        except Exception:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+            raise
+        os.replace(temporal, destino)
+        return destino
+
+    def eliminar(self, nombre: str) -> int:
+        """Quita un snapshot y borra los bloques que ya nadie usa
+
+        Returns:
+            Número de bloques borrados
+        """
+        with self._lock:
+            manifiesto = self._leer_manifiesto()
+            restantes = [s for s in manifiesto['snapshots'] if s['nombre'] != nombre]
+            if len(restantes) == len(manifiesto['snapshots']):
+                raise ValueError(f'No existe el backup {nombre}')
+            manifiesto['snapshots'] = restantes
+            self._escribir_manifiesto(manifiesto)
+
+            en_uso = {huella for s in restantes for huella in s['bloques']}
+            borrados = 0
+            raiz = os.path.join(self.directorio, 'bloques')
+            for carpeta, _, archivos in os.walk(raiz):
+                for archivo in archivos:
+                    if archivo not in en_uso:
+                        os.remove(os.path.join(carpeta, archivo))
+                        borrados += 1
+            return borrados
@@ -0,0 +1,97 @@
+"""
+Cambios externos - Sistema de Inventario y Ventas
+Detecta con PRAGMA data_version las escrituras hechas por otras conexiones
+(p. ej. la versión web mientras corre la de escritorio)
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+
+class ChangeMonitor:
+    """Distingue los commits de este proceso de los de cualquier otra conexión
+
+    PRAGMA data_version cambia cuando otra conexión confirmó cambios en el
+    archivo, pero sus valores solo se comparan dentro de una misma conexión;
+    por eso el monitor tiene la suya. Los commits del pool pasan por
+    `confirmar`, que los toma como vistos, así una escritura propia no se
+    confunde con una ajena. Ante la duda (un commit que no pasó por
+    `confirmar`, una ajena confirmada al mismo tiempo) se informa cambio.
+    """
+
+    def __init__(self, db_name: str, timeout: float = 10.0):
+        self.db_name = db_name
+        self.timeout = timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._archivo: Optional[Tuple[int, int]] = None
+        self._pendiente = False
+        self._lock = threading.Lock()
+        with self._lock:
+            self._visto = self._leer()
+
+    def _identidad_archivo(self) -> Optional[Tuple[int, int]]:
+        try:
+            estado = os.stat(self.db_name)
+        except OSError:
+            return None
+        return estado.st_dev, estado.st_ino
+
+    def _leer(self) -> Optional[int]:
+        """data_version de la conexión del monitor; None si no se pudo leer"""
+        archivo = self._identidad_archivo()
+        if self._conn is not None and archivo != self._archivo:
+            # Otro archivo con el mismo nombre: los valores anteriores ya no se comparan
+            self._cerrar_conexion()
+            self._pendiente = True
+        try:
+            if self._conn is None:
+                self._conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False)
+                self._archivo = archivo
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+        except sqlite3.Error:
+            self._cerrar_conexion()
+            self._pendiente = True
+            return None
+
+    def _cerrar_conexion(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    def hubo_cambios(self) -> bool:
+        """True si otra conexión confirmó cambios desde la última consulta"""
+        with self._lock:
+            actual = self._leer()
+            cambio = self._pendiente or actual is None or actual != self._visto
+            self._visto = actual
+            self._pendiente = False
+            return cambio
+
+    def confirmar(self, conn: sqlite3.Connection):
+        """Hace commit en `conn` sin contarlo como cambio ajeno
+
+        Antes del commit (con el bloqueo de escritura tomado) se revisa si otra
+        conexión escribió; después, la propia `conn` dice si alguien más
+        confirmó entre su transacción y el nuevo punto de partida del monitor.
+        """
+        if not conn.in_transaction:
+            conn.commit()
+            return
+        with self._lock:
+            actual = self._leer()
+            ajeno = actual is None or actual != self._visto
+            antes = conn.execute('PRAGMA data_version').fetchone()[0]
+            conn.commit()
+            self._visto = self._leer()
+            despues = conn.execute('PRAGMA data_version').fetchone()[0]
+            if ajeno or despues != antes:
+                self._pendiente = True
+
+    def cerrar(self):
+        with self._lock:
+            self._cerrar_conexion()
@@ -0,0 +1,55 @@
+"""
+Checkpoint del WAL en segundo plano - Sistema de Inventario y Ventas
+Evita que el checkpoint automático de SQLite se ejecute dentro de un commit
+"""
+
+import sqlite3
+import threading
+from typing import Optional, Tuple
+
+from .connection_pool import ConnectionPool
+
+
+class WalCheckpointer:
+    """Hilo que ejecuta ``PRAGMA wal_checkpoint`` periódicamente"""
+
+    def __init__(self, pool: ConnectionPool, intervalo: float = 30.0, max_paginas_wal: int = 4000):
+        self.pool = pool
+        self.intervalo = intervalo
+        self.max_paginas_wal = max_paginas_wal
+        self._detener = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    def start(self):
+        """Inicia el hilo de checkpoint si no está corriendo"""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._ejecutar, name='wal-checkpointer', daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        """Detiene el hilo de checkpoint"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=self.intervalo)
+            self._hilo = None
+
+    def checkpoint(self, modo: str = 'PASSIVE') -> Tuple[int, int, int]:
+        """Ejecuta un checkpoint y devuelve (ocupado, paginas_wal, paginas_copiadas)"""
+        conn = self.pool.acquire()
+        try:
+            return tuple(conn.execute(f'PRAGMA wal_checkpoint({modo})').fetchone())
+        finally:
+            conn.close()
+
+    def _ejecutar(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                # PASSIVE nunca bloquea a lectores ni escritores
+                _, paginas_wal, _ = self.checkpoint('PASSIVE')
+                if paginas_wal > self.max_paginas_wal:
+                    # Reinicia el archivo WAL si no hay lectores que lo impidan
+                    self.checkpoint('TRUNCATE')
+            except sqlite3.Error as e:
+                print(f'Error en checkpoint del WAL: {e}')
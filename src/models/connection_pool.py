@@ -0,0 +1,229 @@
+"""
+Pool de Conexiones SQLite - Sistema de Inventario y Ventas
+Reutiliza conexiones abiertas en lugar de conectar y cerrar en cada operación
+"""
+
+import os
+import sqlite3
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+
+class PooledConnection:
+    """Envoltura de una conexión del pool.
+
+    Se comporta como una ``sqlite3.Connection`` normal, pero ``close()``
+    devuelve la conexión al pool en lugar de cerrarla. Los cambios que no se
+    hayan confirmado con ``commit()`` se descartan al devolverla, igual que
+    ocurría al cerrar una conexión.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', conn: sqlite3.Connection, generacion: int):
+        self._pool = pool
+        self._conn = conn
+        self._generacion = generacion
+
+    def __getattr__(self, nombre):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('La conexión ya fue devuelta al pool')
+        return getattr(self._conn, nombre)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._conn.__exit__(exc_type, exc_value, traceback)
+
+    def commit(self):
+        """Confirma la transacción; si el pool tiene `al_confirmar`, el commit pasa por ahí"""
+        if self._conn is None:
+            raise sqlite3.ProgrammingError('La conexión ya fue devuelta al pool')
+        if self._pool.al_confirmar is not None:
+            self._pool.al_confirmar(self._conn)
+        else:
+            self._conn.commit()
+
+    def close(self):
+        """Devuelve la conexión al pool"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn, self._generacion)
+
+    def __del__(self):
+        # Red de seguridad para rutas que olvidan llamar a close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones SQLite compartido entre hilos"""
+
+    def __init__(self, db_name: str, tamanio: int = 5, timeout: float = 10.0,
+                 pragmas: Optional[Dict[str, object]] = None, detect_types: int = 0,
+                 al_confirmar: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.db_name = db_name
+        self.tamanio = max(1, tamanio)
+        self.timeout = timeout
+        self.pragmas = dict(pragmas or {})
+        # Se pasa a sqlite3.connect (p. ej. PARSE_DECLTYPES para los conversores de tipos)
+        self.detect_types = detect_types
+        # Hace el commit de las conexiones prestadas (p. ej. ChangeMonitor.confirmar)
+        self.al_confirmar = al_confirmar
+        self._libres = queue.LifoQueue(maxsize=self.tamanio)
+        self._lock = threading.Lock()
+        self._abiertas = 0
+        self._generacion = 0
+        # Archivo al que apuntan las conexiones abiertas (ver _verificar_archivo)
+        self._archivo = self._identidad_archivo()
+        # Se limpia mientras el pool está reservado con exclusivo()
+        self._disponible = threading.Event()
+        self._disponible.set()
+
+    def _abrir(self) -> sqlite3.Connection:
+        """Abre una conexión nueva y le aplica los PRAGMAs una sola vez"""
+        conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False,
+                               detect_types=self.detect_types)
+        for nombre, valor in self.pragmas.items():
+            conn.execute(f'PRAGMA {nombre} = {valor}')
+        return conn
+
+    def _identidad_archivo(self) -> Optional[Tuple[int, int]]:
+        """(dispositivo, inodo) del archivo; None si no existe o es ':memory:'"""
+        try:
+            estado = os.stat(self.db_name)
+        except OSError:
+            return None
+        return estado.st_dev, estado.st_ino
+
+    def _verificar_archivo(self):
+        """Descarta las conexiones si el archivo fue reemplazado por otro
+
+        Una conexión abierta sigue ligada al archivo viejo aunque otro
+        proceso (o una restauración manual) haya puesto uno nuevo con el
+        mismo nombre: lo que se escribiera ahí se perdería.
+        """
+        actual = self._identidad_archivo()
+        with self._lock:
+            if actual == self._archivo:
+                return
+            self._archivo = actual
+        self.close_all()
+
+    @staticmethod
+    def _esta_sana(conn: sqlite3.Connection) -> bool:
+        """Verifica que la conexión siga utilizable"""
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _descartar(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._abiertas -= 1
+
+    def acquire(self) -> PooledConnection:
+        """Obtiene una conexión del pool, abriendo una nueva si hay cupo"""
+        limite = time.monotonic() + self.timeout
+        self._verificar_archivo()
+        while True:
+            if not self._disponible.is_set():
+                restante = limite - time.monotonic()
+                if restante <= 0 or not self._disponible.wait(restante):
+                    raise sqlite3.OperationalError('La base de datos está en mantenimiento, reintente')
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                conn = None
+                with self._lock:
+                    if self._abiertas < self.tamanio:
+                        self._abiertas += 1
+                        crear = True
+                    else:
+                        crear = False
+                if crear:
+                    try:
+                        conn = self._abrir()
+                    except Exception:
+                        with self._lock:
+                            self._abiertas -= 1
+                        raise
+                else:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise sqlite3.OperationalError(
+                            f'No hay conexiones disponibles en el pool (tamaño {self.tamanio})')
+                    try:
+                        # Espera en tramos cortos por si se libera cupo al descartar una conexión
+                        conn = self._libres.get(timeout=min(restante, 0.1))
+                    except queue.Empty:
+                        continue
+
+            if self._esta_sana(conn):
+                return PooledConnection(self, conn, self._generacion)
+            self._descartar(conn)
+
+    def release(self, conn: sqlite3.Connection, generacion: Optional[int] = None):
+        """Devuelve una conexión al pool descartando cambios sin confirmar"""
+        if generacion is not None and generacion != self._generacion:
+            # El pool se reinició mientras la conexión estaba en uso
+            self._descartar(conn)
+            return
+
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._descartar(conn)
+            return
+
+        try:
+            self._libres.put_nowait(conn)
+        except queue.Full:
+            self._descartar(conn)
+
+    def close_all(self):
+        """Cierra todas las conexiones libres e invalida las que estén en uso"""
+        with self._lock:
+            self._generacion += 1
+        while True:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(conn)
+
+    @contextmanager
+    def exclusivo(self, timeout: Optional[float] = None):
+        """Reserva el archivo: espera las conexiones prestadas y las cierra todas
+
+        Mientras dura el bloque ninguna conexión del pool está abierta y
+        acquire() espera, así el archivo se puede reemplazar sin que este
+        proceso lo lea a medias.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        self._disponible.clear()
+        try:
+            limite = time.monotonic() + timeout
+            while True:
+                self.close_all()
+                with self._lock:
+                    if self._abiertas == 0:
+                        break
+                if time.monotonic() >= limite:
+                    raise sqlite3.OperationalError('Hay conexiones en uso; no se pudo reservar la base de datos')
+                time.sleep(0.05)
+            yield
+        finally:
+            self.close_all()
+            self._disponible.set()
@@ -4,23 +4,206 @@ Incluye gestión de categorías personalizadas y campos adicionales
 """
 
 import sqlite3
-import shutil
+import json
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Union
+
+from config.settings import (DATABASE_POOL, DATABASE_PERFILES, DATABASE_PERFIL, DATABASE_CHECKPOINT,
+                             DATABASE_CACHE, DATABASE_BACKUP, BACKUPS, PRESUPUESTO)
+from .connection_pool import ConnectionPool
+from .change_monitor import ChangeMonitor
+from .checkpointer import WalCheckpointer
+from .backup_store import BackupStore
+from .federated_query import TABLAS_FEDERADAS, consultar_federado, en_centavos, leer_rangos, se_superpone
+from .migrations import aplicar_migraciones, reconstruir_resumenes
+from .partitions import cerrar_particion, insertar_en_particion, listar_particiones
+from .product_index import ProductIndex
+from .query_cache import QueryCache, cacheado, invalida_cache
+from .rows import COLUMNAS_PRODUCTO, Categoria, CategoriaResumen, Compra, Producto, Venta, columnas, fabrica
+from src.utils.helpers import codificar_cursor, decodificar_cursor
+from src.utils.money import Money
+
+# Los importes se guardan en centavos enteros en las columnas declaradas DINERO
+# y se leen como Money (las conexiones usan PARSE_DECLTYPES)
+sqlite3.register_adapter(Money, lambda importe: importe.centavos)
+sqlite3.register_converter('DINERO', Money.desde_sqlite)
+
+# Órdenes de los listados de productos: (expresión, descendente, clave de la fila para el cursor).
+# El id desempata, así la paginación por clave no salta ni repite productos
+ORDEN_PRODUCTOS = {
+    'orden_visualizacion': ('IFNULL(p.orden_visualizacion, 0)', False, lambda p: p.orden_visualizacion or 0),
+    'nombre': ('p.nombre', False, lambda p: p.nombre),
+    'precio': ('p.precio', True, lambda p: p.precio.centavos),
+    'cantidad': ('p.cantidad', False, lambda p: p.cantidad),
+    'categoria': ("IFNULL(c.nombre, '')", False, lambda p: p.categoria_nombre or ''),
+}
 
 class DatabaseManager:
-    def __init__(self, db_name='inventario_ventas.db'):
+    def __init__(self, db_name='inventario_ventas.db', tamanio_pool: Optional[int] = None,
+                 perfil: Optional[str] = None):
         self.db_name = db_name
+        self.perfil = perfil or DATABASE_PERFIL
+        if self.perfil not in DATABASE_PERFILES:
+            raise ValueError(f"Perfil de base de datos desconocido: {self.perfil}")
+        pragmas = DATABASE_PERFILES[self.perfil]
+        
+        self.pool = ConnectionPool(
+            db_name,
+            tamanio=tamanio_pool or DATABASE_POOL['tamanio'],
+            timeout=DATABASE_POOL['timeout'],
+            pragmas=pragmas,
+            detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self.cache = QueryCache(ttl=DATABASE_CACHE['ttl'], activo=DATABASE_CACHE['activo'])
+        self.indice = ProductIndex()
+        self.backups = BackupStore(
+            BACKUPS['directorio'],
+            paginas_por_bloque=BACKUPS['paginas_por_bloque'],
+            nivel_compresion=BACKUPS['nivel_compresion']
+        )
+        self._lock_rangos = threading.Lock()
         self.init_db()
+        
+        # Escrituras de otros procesos (p. ej. la versión web): invalidan la caché
+        self.monitor = ChangeMonitor(db_name, timeout=DATABASE_POOL['timeout'])
+        self.pool.al_confirmar = self.monitor.confirmar
+        self.cache.antes_de_leer = self.revisar_cambios_externos
+        
+        # En modo WAL el checkpoint corre en segundo plano, no dentro de los commits
+        self.checkpointer = None
+        if str(pragmas.get('journal_mode', '')).upper() == 'WAL':
+            self.checkpointer = WalCheckpointer(
+                self.pool,
+                intervalo=DATABASE_CHECKPOINT['intervalo'],
+                max_paginas_wal=DATABASE_CHECKPOINT['max_paginas_wal']
+            )
+            self.checkpointer.start()
+    
+    def cerrar(self):
+        """Detiene el checkpoint en segundo plano y cierra las conexiones"""
+        if self.checkpointer:
+            self.checkpointer.stop()
+            self.checkpointer.checkpoint('TRUNCATE')
+        self.monitor.cerrar()
+        self.pool.close_all()
+    
+    def estadisticas_cache(self) -> Dict:
+        """Contadores de aciertos y fallos de la caché de consultas"""
+        return self.cache.estadisticas()
+    
+    def version(self, *tablas: str) -> int:
+        """Contador que avanza con cada escritura de esta instancia en las tablas dadas
+        
+        Las vistas guardan el valor con el que se dibujaron y solo se recargan
+        cuando cambia. Tablas: categorias, productos, ventas, compras y presupuesto.
+        Solo lee memoria: si otro proceso escribió en la base, avanzan todas
+        cuando se detecta, en la próxima consulta cacheada o al llamar a
+        revisar_cambios_externos (ver ChangeMonitor).
+        """
+        return self.cache.version_de(*tablas)
+    
+    def revisar_cambios_externos(self) -> bool:
+        """Descarta lo guardado en memoria si otra conexión escribió en la base
+        
+        Consulta la base (PRAGMA data_version) y puede esperar a que termine
+        un commit: no llamar desde el hilo de la interfaz.
+        
+        Returns:
+            True si hubo cambios de otra conexión
+        """
+        if not self.monitor.hubo_cambios():
+            return False
+        self.cache.invalidar()
+        self.indice.invalidar()
+        return True
+    
+    def _sincronizar_archivo(self):
+        """Vuelca el WAL al archivo principal para poder copiarlo o eliminarlo"""
+        if self.checkpointer:
+            self.checkpointer.checkpoint('TRUNCATE')
+    
+    def respaldar_en_caliente(self, destino: str, paginas_por_paso: Optional[int] = None,
+                              pausa: Optional[float] = None) -> int:
+        """Copia la base de datos en uso con la API de backup de SQLite
+        
+        La copia avanza de a `paginas_por_paso` páginas con una pausa entre pasos,
+        así las ventas pueden seguir escribiendo mientras se respalda. Si otra
+        conexión modifica el archivo, SQLite reinicia la copia; tras
+        `max_reinicios` se termina en un solo paso, que en WAL solo toma una
+        instantánea de lectura y no bloquea a los escritores.
+        
+        El resultado se escribe en un archivo temporal, se verifica con
+        PRAGMA integrity_check y recién entonces se renombra a `destino`.
+        
+        Returns:
+            Número de páginas copiadas
+        
+        Raises:
+            sqlite3.DatabaseError: Si la copia no pasa la verificación de integridad
+        """
+        paginas_por_paso = paginas_por_paso or DATABASE_BACKUP['paginas_por_paso']
+        pausa = DATABASE_BACKUP['pausa'] if pausa is None else pausa
+        temporal = f'{destino}.tmp'
+        progreso = {'restantes': None, 'reinicios': 0, 'total': 0}
+        
+        class _DemasiadosReinicios(Exception):
+            pass
+        
+        def _avance(estado, restantes, total):
+            if progreso['restantes'] is not None and restantes > progreso['restantes']:
+                progreso['reinicios'] += 1
+                if progreso['reinicios'] > DATABASE_BACKUP['max_reinicios']:
+                    raise _DemasiadosReinicios()
+            progreso['restantes'] = restantes
+            progreso['total'] = total
+            if restantes and pausa:
+                time.sleep(pausa)
+        
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        # Conexión propia: la copia no ocupa un lugar del pool y puede correr
+        # mientras el pool está reservado por crear_nuevo_mes
+        origen = sqlite3.connect(self.db_name, timeout=DATABASE_POOL['timeout'])
+        copia = sqlite3.connect(temporal)
+        try:
+            try:
+                origen.backup(copia, pages=paginas_por_paso, progress=_avance)
+            except _DemasiadosReinicios:
+                origen.backup(copia, pages=-1)
+                progreso['total'] = copia.execute('PRAGMA page_count').fetchone()[0]
+            
+            resultado = copia.execute('PRAGMA integrity_check').fetchone()[0]
+            if resultado != 'ok':
+                raise sqlite3.DatabaseError(f'La copia no pasó la verificación de integridad: {resultado}')
+            # La copia queda como un único archivo autocontenido
+            copia.execute('PRAGMA journal_mode = DELETE')
+        except Exception:
+            copia.close()
+            os.remove(temporal)
+            raise
+        finally:
+            origen.close()
+        
+        copia.close()
+        os.replace(temporal, destino)
+        return progreso['total']
     
     def get_connection(self):
-        """Obtiene una conexión a la base de datos"""
-        return sqlite3.connect(self.db_name)
+        """Obtiene una conexión del pool (close() la devuelve al pool)"""
+        return self.pool.acquire()
     
     def init_db(self):
         """Inicializa las tablas de la base de datos con campos extendidos"""
         conn = self.get_connection()
+        self._crear_esquema(conn)
+        conn.close()
+    
+    def _crear_esquema(self, conn):
+        """Crea tablas, datos iniciales y migraciones sobre la conexión dada"""
         cursor = conn.cursor()
         
         # Tabla de categorías personalizadas
@@ -41,7 +224,7 @@ class DatabaseManager:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 nombre TEXT NOT NULL,
                 descripcion TEXT,
-                precio REAL NOT NULL,
+                precio DINERO NOT NULL,
                 cantidad INTEGER NOT NULL,
                 categoria_id INTEGER,
                 instrucciones_manejo TEXT,
@@ -60,8 +243,8 @@ class DatabaseManager:
                 producto_id INTEGER NOT NULL,
                 producto_nombre TEXT NOT NULL,
                 cantidad INTEGER NOT NULL,
-                precio_unitario REAL NOT NULL,
-                total REAL NOT NULL,
+                precio_unitario DINERO NOT NULL,
+                total DINERO NOT NULL,
                 fecha TEXT NOT NULL,
                 FOREIGN KEY (producto_id) REFERENCES productos(id)
             )
@@ -74,8 +257,8 @@ class DatabaseManager:
                 producto_id INTEGER NOT NULL,
                 producto_nombre TEXT NOT NULL,
                 cantidad INTEGER NOT NULL,
-                costo_unitario REAL NOT NULL,
-                total REAL NOT NULL,
+                costo_unitario DINERO NOT NULL,
+                total DINERO NOT NULL,
                 proveedor TEXT,
                 fecha TEXT NOT NULL,
                 FOREIGN KEY (producto_id) REFERENCES productos(id)
@@ -86,7 +269,7 @@ class DatabaseManager:
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS presupuesto (
                 id INTEGER PRIMARY KEY CHECK (id = 1),
-                capital REAL NOT NULL DEFAULT 50000.0,
+                capital DINERO NOT NULL DEFAULT 5000000,
                 ultima_actualizacion TEXT NOT NULL
             )
         ''')
@@ -95,7 +278,8 @@ class DatabaseManager:
         cursor.execute('SELECT COUNT(*) FROM presupuesto WHERE id = 1')
         if cursor.fetchone()[0] == 0:
             fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute('INSERT INTO presupuesto (id, capital, ultima_actualizacion) VALUES (1, 50000.0, ?)', (fecha,))
+            cursor.execute('INSERT INTO presupuesto (id, capital, ultima_actualizacion) VALUES (1, ?, ?)',
+                           (Money.desde(50000), fecha))
         
         # Agregar categorías por defecto si no existen
         categorias_default = [
@@ -123,10 +307,122 @@ class DatabaseManager:
                 ''', (nombre, desc, color, icono, fecha))
         
         conn.commit()
+        
+        # Actualizar archivos existentes a la última versión del esquema
+        aplicar_migraciones(conn)
+    
+    # ===== RESÚMENES PRECALCULADOS =====
+    
+    def _acumular_ventas(self, cursor, ventas: List[Tuple[str, int, str, int, Money]]):
+        """Suma ventas (fecha, producto_id, nombre, cantidad, total) a los resúmenes por día y por producto"""
+        cursor.executemany('''
+            INSERT INTO resumen_ventas_diario (dia, num_ventas, unidades, total)
+            VALUES (?, 1, ?, ?)
+            ON CONFLICT(dia) DO UPDATE SET
+                num_ventas = num_ventas + 1,
+                unidades = unidades + excluded.unidades,
+                total = total + excluded.total
+        ''', [(fecha[:10], cantidad, total) for fecha, _, _, cantidad, total in ventas])
+        cursor.executemany('''
+            INSERT INTO resumen_ventas_producto (producto_id, producto_nombre, unidades, total)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(producto_id) DO UPDATE SET
+                producto_nombre = excluded.producto_nombre,
+                unidades = unidades + excluded.unidades,
+                total = total + excluded.total
+        ''', [(producto_id, nombre, cantidad, total) for _, producto_id, nombre, cantidad, total in ventas])
+    
+    def _acumular_compras(self, cursor, compras: List[Tuple[str, int, Money, Optional[str]]]):
+        """Suma compras (fecha, cantidad, total, proveedor) a los resúmenes por día y por proveedor"""
+        cursor.executemany('''
+            INSERT INTO resumen_compras_diario (dia, num_compras, unidades, total)
+            VALUES (?, 1, ?, ?)
+            ON CONFLICT(dia) DO UPDATE SET
+                num_compras = num_compras + 1,
+                unidades = unidades + excluded.unidades,
+                total = total + excluded.total
+        ''', [(fecha[:10], cantidad, total) for fecha, cantidad, total, _ in compras])
+        cursor.executemany('''
+            INSERT INTO resumen_compras_proveedor (proveedor, num_compras, total)
+            VALUES (?, 1, ?)
+            ON CONFLICT(proveedor) DO UPDATE SET
+                num_compras = num_compras + 1,
+                total = total + excluded.total
+        ''', [(proveedor or '', total) for _, _, total, proveedor in compras])
+    
+    @invalida_cache('ventas', 'compras')
+    def reconstruir_resumenes(self) -> bool:
+        """Recalcula los resúmenes de ventas y compras desde el historial"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            reconstruir_resumenes(cursor)
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+    
+    # ===== PARTICIONES MENSUALES =====
+    
+    def obtener_particiones(self) -> List[Dict]:
+        """Particiones de ventas y compras con su cantidad de filas, de la más reciente a la más antigua"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        particiones = []
+        for tabla in ('ventas', 'compras'):
+            for mes, nombre, solo_lectura in listar_particiones(cursor, tabla):
+                cursor.execute(f'SELECT COUNT(*) FROM {nombre}')
+                particiones.append({
+                    'tabla': tabla,
+                    'mes': mes,
+                    'nombre': nombre,
+                    'filas': cursor.fetchone()[0],
+                    'solo_lectura': bool(solo_lectura)
+                })
         conn.close()
+        return particiones
+    
+    def cerrar_particiones(self, meses_abiertos: int = 2, compactar: bool = False) -> Tuple[int, str]:
+        """Deja de solo lectura las particiones anteriores a los últimos `meses_abiertos` meses
+        
+        Las ventas y compras siempre se escriben en el mes en curso; cerrar los
+        meses viejos evita modificarlos por error. Con `compactar` se ejecuta
+        VACUUM para devolver el espacio libre y reordenar las páginas.
+        
+        Returns:
+            Tupla (particiones_cerradas, mensaje)
+        """
+        limite = datetime.now().replace(day=1)
+        for _ in range(max(meses_abiertos, 1) - 1):
+            limite = (limite - timedelta(days=1)).replace(day=1)
+        mes_limite = limite.strftime('%Y-%m')
+        
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cerradas = 0
+            for tabla in ('ventas', 'compras'):
+                for mes, _, solo_lectura in listar_particiones(cursor, tabla, fin=f'{mes_limite}-01'):
+                    if not solo_lectura:
+                        cerrar_particion(cursor, tabla, mes)
+                        cerradas += 1
+            conn.commit()
+            
+            if compactar:
+                conn.execute('VACUUM')
+        finally:
+            conn.close()
+        
+        mensaje = f'{cerradas} partición(es) anteriores a {mes_limite} cerradas'
+        if compactar:
+            mensaje += ' y base de datos compactada'
+        return cerradas, mensaje
     
     # ===== GESTIÓN DE CATEGORÍAS =====
     
+    @invalida_cache('categorias')
     def crear_categoria(self, nombre: str, descripcion: str = '', color: str = '#3B82F6', icono: str = '📦') -> Tuple[Optional[int], str]:
         """Crea una nueva categoría personalizada"""
         conn = self.get_connection()
@@ -147,15 +443,41 @@ class DatabaseManager:
             conn.close()
             return None, "Ya existe una categoría con ese nombre"
     
-    def obtener_categorias(self) -> List[Tuple]:
+    @cacheado
+    def obtener_categorias(self) -> List[Categoria]:
         """Obtiene todas las categorías"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM categorias ORDER BY nombre')
+        cursor.row_factory = fabrica(Categoria)
+        cursor.execute(f'SELECT {columnas(Categoria)} FROM categorias ORDER BY nombre')
         categorias = cursor.fetchall()
         conn.close()
         return categorias
     
+    @cacheado
+    def obtener_categorias_con_totales(self) -> List[CategoriaResumen]:
+        """Categorías con cantidad de productos, unidades en stock y valor del inventario
+        
+        Una sola consulta agrupada (usa idx_productos_categoria), sin importar
+        cuántas categorías haya.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        # SUM no conserva el tipo DINERO: el valor llega en centavos enteros
+        cursor.row_factory = lambda _cursor, fila: CategoriaResumen(*fila[:-1], Money(fila[-1]))
+        cursor.execute(f'''
+            SELECT {columnas(Categoria, 'c')},
+                   COUNT(p.id), IFNULL(SUM(p.cantidad), 0), IFNULL(SUM(p.precio * p.cantidad), 0)
+            FROM categorias c
+            LEFT JOIN productos p ON p.categoria_id = c.id
+            GROUP BY c.id
+            ORDER BY c.nombre
+        ''')
+        categorias = cursor.fetchall()
+        conn.close()
+        return categorias
+    
+    @invalida_cache('categorias', 'productos')
     def actualizar_categoria(self, categoria_id: int, nombre: str, descripcion: str, color: str, icono: str) -> bool:
         """Actualiza una categoría existente"""
         conn = self.get_connection()
@@ -169,8 +491,11 @@ class DatabaseManager:
         
         conn.commit()
         conn.close()
+        # Cambia el nombre/ícono de categoría de todos sus productos
+        self.indice.invalidar()
         return True
     
+    @invalida_cache('categorias')
     def eliminar_categoria(self, categoria_id: int) -> Tuple[bool, str]:
         """Elimina una categoría (solo si no tiene productos)"""
         conn = self.get_connection()
@@ -191,21 +516,23 @@ class DatabaseManager:
     
     # ===== GESTIÓN DE PRODUCTOS =====
     
-    def agregar_producto(self, nombre: str, descripcion: str, precio: float, cantidad: int, 
-                        categoria_id: Optional[int], costo_compra: float,
+    @invalida_cache('productos', 'compras', 'presupuesto')
+    def agregar_producto(self, nombre: str, descripcion: str, precio: Union[Money, float], cantidad: int, 
+                        categoria_id: Optional[int], costo_compra: Union[Money, float],
                         instrucciones_manejo: str = '', uso_especifico: str = '', 
                         notas_adicionales: str = '') -> Tuple[Optional[int], str]:
         """Agrega un nuevo producto con campos extendidos"""
         conn = self.get_connection()
         cursor = conn.cursor()
         fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        precio = Money.desde(precio)
+        costo_compra = Money.desde(costo_compra)
         
         # Calcular costo total de compra
         costo_total = costo_compra * cantidad
         
         # Verificar presupuesto
-        cursor.execute('SELECT capital FROM presupuesto WHERE id = 1')
-        capital_actual = cursor.fetchone()[0]
+        capital_actual = self._saldo_presupuesto(cursor)[0]
         
         if capital_actual < costo_total:
             conn.close()
@@ -229,39 +556,30 @@ class DatabaseManager:
         producto_id = cursor.lastrowid
         
         # Registrar la compra en el historial
-        cursor.execute('''
-            INSERT INTO compras (producto_id, producto_nombre, cantidad, costo_unitario, total, proveedor, fecha)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (producto_id, nombre, cantidad, costo_compra, costo_total, 'Proveedor General', fecha))
+        compra_id = insertar_en_particion(cursor, 'compras', [
+            (producto_id, nombre, cantidad, costo_compra, costo_total, 'Proveedor General', fecha)
+        ])[0]
+        self._acumular_compras(cursor, [(fecha, cantidad, costo_total, 'Proveedor General')])
         
         # Descontar del presupuesto
-        cursor.execute('''
-            UPDATE presupuesto 
-            SET capital = capital - ?, ultima_actualizacion = ?
-            WHERE id = 1
-        ''', (costo_total, fecha))
+        self._registrar_movimientos(cursor, [(fecha, -costo_total, 'compra', compra_id)])
         
         conn.commit()
         conn.close()
+        self._refrescar_indice([producto_id])
         return producto_id, "Producto agregado exitosamente"
     
-    def obtener_productos(self, ordenar_por: str = 'orden_visualizacion') -> List[Tuple]:
+    def obtener_productos(self, ordenar_por: str = 'orden_visualizacion') -> List[Producto]:
         """Obtiene todos los productos con información de categoría"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        orden_valido = {
-            'orden_visualizacion': 'p.orden_visualizacion ASC',
-            'nombre': 'p.nombre ASC',
-            'precio': 'p.precio DESC',
-            'cantidad': 'p.cantidad ASC',
-            'categoria': 'c.nombre ASC'
-        }
-        
-        orden_sql = orden_valido.get(ordenar_por, 'p.orden_visualizacion ASC')
+        expresion, descendente, _ = ORDEN_PRODUCTOS.get(ordenar_por, ORDEN_PRODUCTOS['orden_visualizacion'])
+        orden_sql = f"{expresion} {'DESC' if descendente else 'ASC'}, p.id ASC"
         
+        cursor.row_factory = fabrica(Producto)
         cursor.execute(f'''
-            SELECT p.*, c.nombre as categoria_nombre, c.color, c.icono
+            SELECT {COLUMNAS_PRODUCTO}
             FROM productos p
             LEFT JOIN categorias c ON p.categoria_id = c.id
             ORDER BY {orden_sql}
@@ -271,13 +589,61 @@ class DatabaseManager:
         conn.close()
         return productos
     
-    def obtener_productos_por_categoria(self, categoria_id: int) -> List[Tuple]:
+    def obtener_productos_pagina(self, cursor: Optional[str] = None, limite: int = 50,
+                                 ordenar_por: Optional[str] = None) -> Tuple[List[Producto], Optional[str]]:
+        """Obtiene una página del catálogo (paginación por clave)
+        
+        Args:
+            cursor: Cursor devuelto por la página anterior, con el mismo orden
+            limite: Productos por página
+            ordenar_por: Uno de los órdenes de obtener_productos; None ordena por id
+        
+        Returns:
+            Tupla (productos, cursor_siguiente); cursor_siguiente es None en la última página
+        """
+        clave = decodificar_cursor(cursor)
+        if ordenar_por is None:
+            orden_sql = 'p.id ASC'
+            filtro, parametros = 'p.id > ?', [clave[0] if clave else 0]
+        else:
+            expresion, descendente, valor = ORDEN_PRODUCTOS.get(ordenar_por, ORDEN_PRODUCTOS['orden_visualizacion'])
+            orden_sql = f"{expresion} {'DESC' if descendente else 'ASC'}, p.id ASC"
+            if clave:
+                filtro = f"({expresion} {'<' if descendente else '>'} ? OR ({expresion} = ? AND p.id > ?))"
+                parametros = [clave[0], clave[0], clave[1]]
+            else:
+                filtro, parametros = '1', []
+        
+        conn = self.get_connection()
+        cur = conn.cursor()
+        
+        cur.row_factory = fabrica(Producto)
+        cur.execute(f'''
+            SELECT {COLUMNAS_PRODUCTO}
+            FROM productos p
+            LEFT JOIN categorias c ON p.categoria_id = c.id
+            WHERE {filtro}
+            ORDER BY {orden_sql}
+            LIMIT ?
+        ''', parametros + [limite + 1])
+        productos = cur.fetchall()
+        conn.close()
+        
+        siguiente = None
+        if len(productos) > limite:
+            productos = productos[:limite]
+            ultimo = productos[-1]
+            siguiente = codificar_cursor((ultimo.id,) if ordenar_por is None else (valor(ultimo), ultimo.id))
+        return productos, siguiente
+    
+    def obtener_productos_por_categoria(self, categoria_id: int) -> List[Producto]:
         """Obtiene productos de una categoría específica"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT p.*, c.nombre as categoria_nombre, c.color, c.icono
+        cursor.row_factory = fabrica(Producto)
+        cursor.execute(f'''
+            SELECT {COLUMNAS_PRODUCTO}
             FROM productos p
             LEFT JOIN categorias c ON p.categoria_id = c.id
             WHERE p.categoria_id = ?
@@ -288,13 +654,14 @@ class DatabaseManager:
         conn.close()
         return productos
     
-    def obtener_producto(self, producto_id: int) -> Optional[Tuple]:
+    def obtener_producto(self, producto_id: int) -> Optional[Producto]:
         """Obtiene un producto específico con su categoría"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT p.*, c.nombre as categoria_nombre, c.color, c.icono
+        cursor.row_factory = fabrica(Producto)
+        cursor.execute(f'''
+            SELECT {COLUMNAS_PRODUCTO}
             FROM productos p
             LEFT JOIN categorias c ON p.categoria_id = c.id
             WHERE p.id = ?
@@ -304,8 +671,9 @@ class DatabaseManager:
         conn.close()
         return producto
     
+    @invalida_cache('productos')
     def actualizar_producto(self, producto_id: int, nombre: str, descripcion: str, 
-                           precio: float, cantidad: int, categoria_id: Optional[int],
+                           precio: Union[Money, float], cantidad: int, categoria_id: Optional[int],
                            instrucciones_manejo: str = '', uso_especifico: str = '',
                            notas_adicionales: str = '') -> bool:
         """Actualiza un producto existente"""
@@ -317,13 +685,15 @@ class DatabaseManager:
             SET nombre = ?, descripcion = ?, precio = ?, cantidad = ?, categoria_id = ?,
                 instrucciones_manejo = ?, uso_especifico = ?, notas_adicionales = ?
             WHERE id = ?
-        ''', (nombre, descripcion, precio, cantidad, categoria_id,
+        ''', (nombre, descripcion, Money.desde(precio), cantidad, categoria_id,
               instrucciones_manejo, uso_especifico, notas_adicionales, producto_id))
         
         conn.commit()
         conn.close()
+        self._refrescar_indice([producto_id])
         return True
     
+    @invalida_cache('productos')
     def reordenar_producto(self, producto_id: int, nuevo_orden: int) -> bool:
         """Cambia el orden de visualización de un producto"""
         conn = self.get_connection()
@@ -337,8 +707,10 @@ class DatabaseManager:
         
         conn.commit()
         conn.close()
+        self._refrescar_indice([producto_id])
         return True
     
+    @invalida_cache('productos', 'categorias')
     def mover_producto_categoria(self, producto_id: int, nueva_categoria_id: Optional[int]) -> bool:
         """Mueve un producto a otra categoría"""
         conn = self.get_connection()
@@ -352,8 +724,10 @@ class DatabaseManager:
         
         conn.commit()
         conn.close()
+        self._refrescar_indice([producto_id])
         return True
     
+    @invalida_cache('productos', 'categorias')
     def eliminar_producto(self, producto_id: int) -> bool:
         """Elimina un producto del inventario"""
         conn = self.get_connection()
@@ -361,21 +735,105 @@ class DatabaseManager:
         cursor.execute('DELETE FROM productos WHERE id = ?', (producto_id,))
         conn.commit()
         conn.close()
+        self._refrescar_indice([producto_id])
         return True
     
-    def buscar_productos(self, termino: str) -> List[Tuple]:
-        """Busca productos por nombre, descripción o notas"""
+    # ===== ÍNDICE DE PRODUCTOS EN MEMORIA =====
+    
+    def cargar_indice_productos(self):
+        """Carga el índice si hace falta (para hacerlo fuera del hilo de la interfaz)
+
+        Si otro proceso escribió en la base (p. ej. una venta desde la versión
+        web), el índice se descarta y se vuelve a cargar completo.
+        """
+        self.revisar_cambios_externos()
+        self.indice.asegurar_cargado(self.obtener_productos)
+    
+    def producto_por_id(self, producto_id: int) -> Optional[Producto]:
+        """Producto desde el índice en memoria, sin consultar la base"""
+        self.cargar_indice_productos()
+        return self.indice.por_id(producto_id)
+    
+    def producto_por_nombre(self, nombre: str) -> Optional[Producto]:
+        """Producto por nombre sin distinguir mayúsculas ni espacios sobrantes"""
+        self.cargar_indice_productos()
+        return self.indice.por_nombre(nombre)
+    
+    def _leer_productos_por_id(self, producto_ids: List[int]) -> List[Producto]:
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = fabrica(Producto)
+            marcadores = ', '.join('?' * len(producto_ids))
+            cursor.execute(f'''
+                SELECT {COLUMNAS_PRODUCTO}
+                FROM productos p
+                LEFT JOIN categorias c ON p.categoria_id = c.id
+                WHERE p.id IN ({marcadores})
+            ''', tuple(producto_ids))
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    
+    def _refrescar_indice(self, producto_ids: Iterable[int]):
+        """Vuelve a leer para el índice solo los productos que tocó una escritura ya confirmada"""
+        self.indice.refrescar(producto_ids, self._leer_productos_por_id)
+    
+    @staticmethod
+    def _consulta_fts(termino: str) -> str:
+        """Convierte el texto del usuario en una consulta FTS5 de prefijos"""
+        # Cada palabra se cita para que no se interprete como operador de FTS5
+        palabras = re.findall(r'\w+', termino)
+        return ' '.join(f'"{palabra}"*' for palabra in palabras)
+    
+    def buscar_productos(self, termino: str, limite: Optional[int] = None) -> List[Producto]:
+        """Busca productos por nombre, descripción o notas
+        
+        Usa el índice FTS5 (sin distinguir mayúsculas ni acentos, por prefijo)
+        y ordena por relevancia bm25, con el nombre pesando más que el resto.
+        """
+        consulta = self._consulta_fts(termino)
+        if not consulta:
+            return self._buscar_productos_like(termino, limite)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.row_factory = fabrica(Producto)
+            cursor.execute(f'''
+                SELECT {COLUMNAS_PRODUCTO}
+                FROM productos_fts f
+                JOIN productos p ON p.id = f.rowid
+                LEFT JOIN categorias c ON p.categoria_id = c.id
+                WHERE productos_fts MATCH ?
+                ORDER BY bm25(productos_fts, 10.0, 2.0, 1.0), p.nombre ASC
+                LIMIT ?
+            ''', (consulta, limite if limite else -1))
+            productos = cursor.fetchall()
+        except sqlite3.OperationalError:
+            # SQLite sin FTS5 o consulta no válida: búsqueda tradicional
+            conn.close()
+            return self._buscar_productos_like(termino, limite)
+        
+        conn.close()
+        return productos
+    
+    def _buscar_productos_like(self, termino: str, limite: Optional[int] = None) -> List[Producto]:
+        """Búsqueda por subcadena con LIKE (recorre toda la tabla)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         termino_busqueda = f'%{termino}%'
-        cursor.execute('''
-            SELECT p.*, c.nombre as categoria_nombre, c.color, c.icono
+        cursor.row_factory = fabrica(Producto)
+        cursor.execute(f'''
+            SELECT {COLUMNAS_PRODUCTO}
             FROM productos p
             LEFT JOIN categorias c ON p.categoria_id = c.id
             WHERE p.nombre LIKE ? OR p.descripcion LIKE ? OR p.notas_adicionales LIKE ?
             ORDER BY p.nombre ASC
-        ''', (termino_busqueda, termino_busqueda, termino_busqueda))
+            LIMIT ?
+        ''', (termino_busqueda, termino_busqueda, termino_busqueda, limite if limite else -1))
         productos = cursor.fetchall()
         
         conn.close()
@@ -383,6 +841,7 @@ class DatabaseManager:
     
     # ===== GESTIÓN DE VENTAS =====
     
+    @invalida_cache('productos', 'ventas', 'presupuesto')
     def registrar_venta(self, producto_id: int, cantidad: int) -> Tuple[Optional[int], str]:
         """Registra una venta y actualiza el inventario"""
         conn = self.get_connection()
@@ -406,76 +865,654 @@ class DatabaseManager:
         total = precio * cantidad
         fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
-        cursor.execute('''
-            INSERT INTO ventas (producto_id, producto_nombre, cantidad, precio_unitario, total, fecha)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (producto_id, nombre, cantidad, precio, total, fecha))
+        venta_id = insertar_en_particion(cursor, 'ventas', [
+            (producto_id, nombre, cantidad, precio, total, fecha)
+        ])[0]
+        
+        # Actualizar resúmenes en la misma transacción
+        self._acumular_ventas(cursor, [(fecha, producto_id, nombre, cantidad, total)])
         
         # Actualizar stock
         cursor.execute('UPDATE productos SET cantidad = cantidad - ? WHERE id = ?', (cantidad, producto_id))
         
         # Sumar al presupuesto
-        cursor.execute('''
-            UPDATE presupuesto 
-            SET capital = capital + ?, ultima_actualizacion = ?
-            WHERE id = 1
-        ''', (total, fecha))
+        self._registrar_movimientos(cursor, [(fecha, total, 'venta', venta_id)])
         
         conn.commit()
-        venta_id = cursor.lastrowid
         conn.close()
+        self._refrescar_indice([producto_id])
         return venta_id, "Venta registrada exitosamente"
     
-    def obtener_ventas(self, limite: Optional[int] = None) -> List[Tuple]:
+    @invalida_cache('productos', 'ventas', 'presupuesto')
+    def registrar_venta_lote(self, lineas: List[Tuple[int, int]]) -> Tuple[Optional[List[int]], str]:
+        """Registra todas las líneas de un carrito en una sola transacción
+        
+        Args:
+            lineas: Lista de (producto_id, cantidad); un producto puede repetirse
+            
+        Returns:
+            Tupla (ids_de_venta, mensaje); ids_de_venta es None si no se registró nada
+        """
+        if not lineas:
+            return None, "El carrito está vacío"
+        
+        # Cantidad total pedida por producto para validar el stock una sola vez
+        requerido = {}
+        for producto_id, cantidad in lineas:
+            if cantidad <= 0:
+                return None, "Cantidad inválida"
+            requerido[producto_id] = requerido.get(producto_id, 0) + cantidad
+        
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            # Reservar la escritura desde el inicio para que el stock leído no cambie
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            marcadores = ', '.join('?' * len(requerido))
+            cursor.execute(f'SELECT id, nombre, precio, cantidad FROM productos WHERE id IN ({marcadores})',
+                           tuple(requerido))
+            productos = {fila[0]: fila[1:] for fila in cursor.fetchall()}
+            
+            for producto_id, cantidad in requerido.items():
+                if producto_id not in productos:
+                    return None, f"Producto no encontrado (ID {producto_id})"
+                nombre, _, stock_actual = productos[producto_id]
+                if stock_actual < cantidad:
+                    return None, f"Stock insuficiente para {nombre}. Disponible: {stock_actual}"
+            
+            fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            filas = []
+            for producto_id, cantidad in lineas:
+                nombre, precio, _ = productos[producto_id]
+                filas.append((producto_id, nombre, cantidad, precio, precio * cantidad, fecha))
+            
+            venta_ids = insertar_en_particion(cursor, 'ventas', filas)
+            
+            self._acumular_ventas(cursor, [(fecha, producto_id, nombre, cantidad, total)
+                                           for producto_id, nombre, cantidad, _, total, _ in filas])
+            
+            cursor.executemany('UPDATE productos SET cantidad = cantidad - ? WHERE id = ?',
+                               [(cantidad, producto_id) for producto_id, cantidad in requerido.items()])
+            
+            # Un movimiento de capital por línea, con el id de su venta
+            self._registrar_movimientos(cursor, [(fecha, fila[4], 'venta', venta_id)
+                                                 for venta_id, fila in zip(venta_ids, filas)])
+            total_lote = sum((fila[4] for fila in filas), Money())
+            
+            conn.commit()
+        finally:
+            conn.close()
+        self._refrescar_indice(requerido)
+        return venta_ids, f"Venta registrada: {len(filas)} línea(s) por ${total_lote:.2f}"
+    
+    def _leer_particiones(self, cursor, tabla: str, consulta: str, parametros: Tuple = (),
+                          limite: Optional[int] = None, inicio: Optional[str] = None,
+                          fin: Optional[str] = None) -> Iterator[Tuple]:
+        """Ejecuta `consulta` solo en las particiones que tocan [inicio, fin)
+        
+        La consulta usa {particion} como tabla y se ejecuta de la partición más
+        reciente a la más antigua; con `limite` se agrega LIMIT ? y se deja de
+        leer particiones en cuanto se juntan suficientes filas.
+        """
+        restantes = limite
+        for _, particion, _ in listar_particiones(cursor, tabla, inicio, fin):
+            if restantes is None:
+                cursor.execute(consulta.format(particion=particion), parametros)
+            else:
+                cursor.execute(consulta.format(particion=particion) + ' LIMIT ?', parametros + (restantes,))
+            for fila in cursor.fetchall():
+                yield fila
+                if restantes is not None:
+                    restantes -= 1
+            if restantes is not None and restantes <= 0:
+                return
+    
+    def obtener_ventas(self, limite: Optional[int] = None) -> List[Venta]:
         """Obtiene el historial de ventas"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.row_factory = fabrica(Venta)
         
-        if limite:
-            cursor.execute('SELECT * FROM ventas ORDER BY fecha DESC LIMIT ?', (limite,))
-        else:
-            cursor.execute('SELECT * FROM ventas ORDER BY fecha DESC')
-        
-        ventas = cursor.fetchall()
+        ventas = list(self._leer_particiones(
+            cursor, 'ventas', f'SELECT {columnas(Venta)} FROM {{particion}} ORDER BY fecha DESC, id DESC',
+            limite=limite or None
+        ))
         conn.close()
         return ventas
+
+    @staticmethod
+    def _rango_fechas(desde: Optional[str], hasta: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+        """Convierte fechas 'YYYY-MM-DD' inclusivas en límites [inicio, fin) comparables con fecha"""
+        inicio = fin = None
+        if desde:
+            inicio = datetime.strptime(desde, '%Y-%m-%d').strftime('%Y-%m-%d')
+        if hasta:
+            fin = (datetime.strptime(hasta, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        return inicio, fin
     
-    # ===== PRESUPUESTO Y ESTADÍSTICAS =====
+    def iterar_ventas(self, desde: Optional[str] = None, hasta: Optional[str] = None,
+                      producto_id: Optional[int] = None, tamanio_bloque: int = 1000) -> Iterator[Tuple]:
+        """Recorre el historial de ventas sin cargarlo completo en memoria
+        
+        Las filas (id, producto, cantidad, precio_unitario, total, fecha) se leen del
+        cursor en bloques con fetchmany, de la más reciente a la más antigua.
+        
+        Args:
+            desde: Fecha inicial 'YYYY-MM-DD' (inclusive)
+            hasta: Fecha final 'YYYY-MM-DD' (inclusive)
+            producto_id: Solo ventas de este producto
+            tamanio_bloque: Filas leídas por cada fetchmany
+        
+        Raises:
+            ValueError: Si una fecha no tiene el formato 'YYYY-MM-DD' (al llamar,
+                no al empezar a recorrer)
+        """
+        inicio, fin = self._rango_fechas(desde, hasta)
+        return self._recorrer_ventas(inicio, fin, producto_id, tamanio_bloque)
     
-    def obtener_presupuesto(self) -> Tuple[float, str]:
-        """Obtiene el presupuesto actual"""
+    def _recorrer_ventas(self, inicio: Optional[str], fin: Optional[str],
+                         producto_id: Optional[int], tamanio_bloque: int) -> Iterator[Tuple]:
+        """Generador de iterar_ventas, con el rango ya validado"""
+        condiciones = []
+        parametros = []
+        if inicio:
+            condiciones.append('fecha >= ?')
+            parametros.append(inicio)
+        if fin:
+            condiciones.append('fecha < ?')
+            parametros.append(fin)
+        if producto_id is not None:
+            condiciones.append('producto_id = ?')
+            parametros.append(producto_id)
+        filtro = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
+            # Solo los meses del rango; cada partición ya viene ordenada por su índice
+            for _, particion, _ in listar_particiones(cursor, 'ventas', inicio, fin):
+                cursor.execute(f'''
+                    SELECT id, producto_nombre, cantidad, precio_unitario, total, fecha
+                    FROM {particion}
+                    {filtro}
+                    ORDER BY fecha DESC, id DESC
+                ''', parametros)
+                while True:
+                    bloque = cursor.fetchmany(tamanio_bloque)
+                    if not bloque:
+                        break
+                    yield from bloque
+        finally:
+            conn.close()
+    
+    def _pagina_por_fecha(self, tabla: str, tipo: type, consulta: str, cursor: Optional[str],
+                          limite: int) -> Tuple[List[Tuple], Optional[str]]:
+        """Pagina de más reciente a más antiguo por (fecha, id)
+        
+        La consulta devuelve filas del tipo dado, que debe tener campos id y fecha.
+        Se usa la clave de la última fila en lugar de OFFSET, así cada página
+        cuesta lo mismo sin importar cuán atrás esté en el historial; además
+        solo se leen las particiones desde el mes de esa clave hacia atrás.
+        """
+        clave = decodificar_cursor(cursor)
+        conn = self.get_connection()
+        cur = conn.cursor()
+        cur.row_factory = fabrica(tipo)
+        
+        if clave:
+            fecha, ultimo_id = clave
+            filas = list(self._leer_particiones(
+                cur, tabla, consulta.format(particion='{particion}', filtro='WHERE (fecha, id) < (?, ?)'),
+                (fecha, ultimo_id), limite=limite + 1, fin=fecha
+            ))
+        else:
+            filas = list(self._leer_particiones(
+                cur, tabla, consulta.format(particion='{particion}', filtro=''), limite=limite + 1
+            ))
+        conn.close()
         
-        cursor.execute('SELECT capital, ultima_actualizacion FROM presupuesto WHERE id = 1')
-        result = cursor.fetchone()
+        siguiente = None
+        if len(filas) > limite:
+            filas = filas[:limite]
+            siguiente = codificar_cursor((filas[-1].fecha, filas[-1].id))
+        return filas, siguiente
+    
+    def obtener_ventas_pagina(self, cursor: Optional[str] = None,
+                              limite: int = 50) -> Tuple[List[Venta], Optional[str]]:
+        """Obtiene una página del historial de ventas
         
+        Returns:
+            Tupla (ventas, cursor_siguiente); cursor_siguiente es None en la última página
+        """
+        return self._pagina_por_fecha('ventas', Venta, f'''
+            SELECT {columnas(Venta)} FROM {{particion}}
+            {{filtro}}
+            ORDER BY fecha DESC, id DESC
+        ''', cursor, limite)
+    
+    # ===== GESTIÓN DE COMPRAS =====
+
+    @invalida_cache('productos', 'compras', 'presupuesto')
+    def registrar_compra(self, nombre_producto: str, categoria_id: Optional[int], precio_venta: Union[Money, float],
+                         cantidad: int, costo_unitario: Union[Money, float],
+                         proveedor: str = 'Proveedor General') -> Tuple[Optional[int], str, Optional[int], Optional[str]]:
+        """Registra una compra: crea o repone el producto, guarda el historial y descuenta el presupuesto
+
+        Returns:
+            Tupla (compra_id, mensaje, producto_id, accion)
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            precio_venta = Money.desde(precio_venta)
+            costo_unitario = Money.desde(costo_unitario)
+            total = costo_unitario * cantidad
+
+            # Verificar presupuesto
+            capital_actual = self._saldo_presupuesto(cursor)[0]
+
+            if capital_actual < total:
+                return None, f"Presupuesto insuficiente. Disponible: ${capital_actual:.2f}, Necesario: ${total:.2f}", None, None
+
+            # Verificar si el producto ya existe
+            cursor.execute('SELECT id, cantidad FROM productos WHERE nombre = ? COLLATE NOCASE', (nombre_producto,))
+            producto_existente = cursor.fetchone()
+
+            if producto_existente:
+                # Actualizar stock y precio del producto existente
+                producto_id = producto_existente[0]
+                cursor.execute('''
+                    UPDATE productos
+                    SET cantidad = cantidad + ?, precio = ?, categoria_id = ?
+                    WHERE id = ?
+                ''', (cantidad, precio_venta, categoria_id, producto_id))
+                accion = "actualizado"
+            else:
+                # Crear nuevo producto
+                cursor.execute('''
+                    INSERT INTO productos (nombre, descripcion, precio, cantidad, categoria_id, fecha_agregado)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (nombre_producto, "Producto agregado por compra", precio_venta, cantidad, categoria_id, fecha))
+                producto_id = cursor.lastrowid
+                accion = "creado"
+
+            # Registrar la compra en el historial
+            compra_id = insertar_en_particion(cursor, 'compras', [
+                (producto_id, nombre_producto, cantidad, costo_unitario, total, proveedor, fecha)
+            ])[0]
+            self._acumular_compras(cursor, [(fecha, cantidad, total, proveedor)])
+
+            # Descontar del presupuesto
+            self._registrar_movimientos(cursor, [(fecha, -total, 'compra', compra_id)])
+
+            conn.commit()
+        finally:
+            conn.close()
+        self._refrescar_indice([producto_id])
+        return compra_id, f"Producto {accion}: {cantidad} unidades de {nombre_producto}", producto_id, accion
+
+    def obtener_compras(self, limite: Optional[int] = 100) -> List[Compra]:
+        """Obtiene el historial de compras"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.row_factory = fabrica(Compra)
+
+        compras = list(self._leer_particiones(cursor, 'compras', f'''
+            SELECT {columnas(Compra)}
+            FROM {{particion}}
+            ORDER BY fecha DESC, id DESC
+        ''', limite=limite or None))
         conn.close()
-        return result if result else (0, '')
+        return compras
+
+    def obtener_compras_pagina(self, cursor: Optional[str] = None,
+                               limite: int = 50) -> Tuple[List[Compra], Optional[str]]:
+        """Obtiene una página del historial de compras
+        
+        Returns:
+            Tupla (compras, cursor_siguiente); cursor_siguiente es None en la última página
+        """
+        return self._pagina_por_fecha('compras', Compra, f'''
+            SELECT {columnas(Compra)}
+            FROM {{particion}}
+            {{filtro}}
+            ORDER BY fecha DESC, id DESC
+        ''', cursor, limite)
     
-    def actualizar_presupuesto(self, nuevo_capital: float) -> bool:
-        """Actualiza el presupuesto manualmente"""
+    @cacheado
+    def obtener_estadisticas_compras(self) -> Dict:
+        """Obtiene estadísticas de compras"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        # Total invertido y número de compras
+        cursor.execute('SELECT IFNULL(SUM(total), 0), IFNULL(SUM(num_compras), 0) FROM resumen_compras_diario')
+        total_invertido, total_compras = cursor.fetchone()
+        total_invertido = Money(total_invertido)
+
+        # Compra más grande: la mayor de cada partición (por su índice de total)
+        candidatas = list(self._leer_particiones(cursor, 'compras', '''
+            SELECT producto_nombre, total, fecha
+            FROM (SELECT producto_nombre, total, fecha FROM {particion} ORDER BY total DESC LIMIT 1)
+        '''))
+        compra_mayor = max(candidatas, key=lambda compra: compra[1]) if candidatas else None
+
+        # Proveedor más frecuente
+        cursor.execute('''
+            SELECT proveedor, num_compras
+            FROM resumen_compras_proveedor
+            ORDER BY num_compras DESC
+            LIMIT 1
+        ''')
+        proveedor_top = cursor.fetchone()
+
+        conn.close()
+
+        return {
+            'total_invertido': total_invertido,
+            'total_compras': total_compras,
+            'compra_mayor': compra_mayor,
+            'proveedor_frecuente': proveedor_top
+        }
+
+    # ===== IMPORTACIÓN MASIVA =====
+    
+    @staticmethod
+    def _normalizar_registro_importacion(registro: Dict) -> Tuple[str, str, Money, int, Optional[str], Money, str]:
+        """Valida una fila del archivo y devuelve
+        (nombre, descripcion, precio, cantidad, categoria, costo_unitario, proveedor)"""
+        nombre = (registro.get('nombre') or '').strip()
+        if not nombre:
+            raise ValueError("el nombre es obligatorio")
+        precio = Money.desde(registro.get('precio') or registro.get('precio_venta') or 0)
+        cantidad = int(registro.get('cantidad') or 0)
+        costo = registro.get('costo_unitario') or registro.get('costo_compra')
+        costo_unitario = Money.desde(costo) if costo not in (None, '') else precio
+        if precio <= 0:
+            raise ValueError("el precio debe ser mayor a 0")
+        if cantidad < 0 or costo_unitario < 0:
+            raise ValueError("cantidad y costo no pueden ser negativos")
+        categoria = (registro.get('categoria') or '').strip() or None
+        proveedor = (registro.get('proveedor') or '').strip() or 'Proveedor General'
+        descripcion = (registro.get('descripcion') or '').strip()
+        return nombre, descripcion, precio, cantidad, categoria, costo_unitario, proveedor
+    
+    @invalida_cache('productos', 'categorias', 'compras', 'presupuesto')
+    def importar_productos(self, registros: Iterable[Dict], tamanio_lote: int = 5000,
+                           registrar_compras: bool = True) -> Dict:
+        """Importa productos en lote desde un iterable de filas (p. ej. leer_registros)
+        
+        Cada fila trae nombre, precio, cantidad y opcionalmente categoria (por nombre),
+        costo_unitario, proveedor y descripcion. Si el producto ya existe (mismo nombre
+        sin distinguir mayúsculas) se repone su stock y se actualiza el precio.
+        
+        Las filas se procesan en lotes: cada lote es una transacción con inserciones
+        por executemany, y productos y categorías se resuelven con índices en memoria.
         
+        Args:
+            registros: Filas como diccionarios
+            tamanio_lote: Filas por transacción
+            registrar_compras: Si True, cada fila queda como compra y se descuenta del
+                presupuesto; si False solo se carga el catálogo
+            
+        Returns:
+            Diccionario con filas, creados, actualizados, errores, segundos y
+            filas_por_segundo; 'detenido' explica por qué se interrumpió (o None)
+        """
+        inicio = time.perf_counter()
+        resultado = {'filas': 0, 'creados': 0, 'actualizados': 0, 'errores': 0,
+                     'mensajes_error': [], 'lotes': 0, 'detenido': None}
+        
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            
+            # Índices en memoria: nombre normalizado -> id
+            cursor.execute('SELECT id, nombre FROM productos')
+            indice_productos = {nombre.casefold(): producto_id for producto_id, nombre in cursor.fetchall()}
+            cursor.execute('SELECT id, nombre FROM categorias')
+            indice_categorias = {nombre.casefold(): categoria_id for categoria_id, nombre in cursor.fetchall()}
+            cursor.execute('SELECT MAX(orden_visualizacion) FROM productos')
+            siguiente_orden = (cursor.fetchone()[0] or 0) + 1
+            
+            lote = []
+            numero_fila = 0
+            
+            def procesar_lote() -> bool:
+                """Escribe el lote pendiente en una transacción; False si hay que detenerse"""
+                nonlocal siguiente_orden
+                if not lote:
+                    return True
+                cursor.execute('BEGIN IMMEDIATE')
+                fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                
+                # Categorías nuevas
+                for _, _, _, _, categoria, _, _ in lote:
+                    if categoria and categoria.casefold() not in indice_categorias:
+                        cursor.execute('''
+                            INSERT INTO categorias (nombre, descripcion, fecha_creacion)
+                            VALUES (?, ?, ?)
+                        ''', (categoria, 'Creada por importación', fecha))
+                        indice_categorias[categoria.casefold()] = cursor.lastrowid
+                
+                # Separar productos nuevos de reposiciones (la primera aparición crea el producto)
+                nuevos = []
+                nuevos_vistos = set()
+                for nombre, descripcion, precio, cantidad, categoria, _, _ in lote:
+                    clave = nombre.casefold()
+                    if clave not in indice_productos and clave not in nuevos_vistos:
+                        nuevos_vistos.add(clave)
+                        categoria_id = indice_categorias.get(categoria.casefold()) if categoria else None
+                        nuevos.append((nombre, descripcion or 'Producto importado', precio, 0, categoria_id,
+                                       siguiente_orden, fecha))
+                        siguiente_orden += 1
+                
+                if nuevos:
+                    cursor.executemany('''
+                        INSERT INTO productos (nombre, descripcion, precio, cantidad, categoria_id,
+                                               orden_visualizacion, fecha_agregado)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', nuevos)
+                    # Con el bloqueo de escritura los ids del lote son consecutivos
+                    ultimo_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+                    for desplazamiento, fila in enumerate(nuevos):
+                        indice_productos[fila[0].casefold()] = ultimo_id - len(nuevos) + 1 + desplazamiento
+                
+                # Stock (se crean con 0 y todas las filas suman), precio y categoría
+                actualizaciones = []
+                compras = []
+                for nombre, _, precio, cantidad, categoria, costo_unitario, proveedor in lote:
+                    producto_id = indice_productos[nombre.casefold()]
+                    categoria_id = indice_categorias.get(categoria.casefold()) if categoria else None
+                    actualizaciones.append((cantidad, precio, categoria_id, producto_id))
+                    if registrar_compras and cantidad > 0:
+                        compras.append((producto_id, nombre, cantidad, costo_unitario,
+                                        costo_unitario * cantidad, proveedor, fecha))
+                
+                if compras:
+                    total_lote = sum((compra[4] for compra in compras), Money())
+                    capital_actual = self._saldo_presupuesto(cursor)[0]
+                    if capital_actual < total_lote:
+                        conn.rollback()
+                        resultado['detenido'] = (f"Presupuesto insuficiente para el lote que termina en la "
+                                                 f"fila {numero_fila}. Disponible: ${capital_actual:.2f}, "
+                                                 f"Necesario: ${total_lote:.2f}")
+                        return False
+                
+                cursor.executemany('''
+                    UPDATE productos
+                    SET cantidad = cantidad + ?, precio = ?, categoria_id = IFNULL(?, categoria_id)
+                    WHERE id = ?
+                ''', actualizaciones)
+                
+                if compras:
+                    compra_ids = insertar_en_particion(cursor, 'compras', compras)
+                    self._acumular_compras(cursor, [(fecha, cantidad, total, proveedor)
+                                                    for _, _, cantidad, _, total, proveedor, _ in compras])
+                    self._registrar_movimientos(cursor, [(fecha, -compra[4], 'compra', compra_id)
+                                                         for compra_id, compra in zip(compra_ids, compras)])
+                
+                conn.commit()
+                resultado['creados'] += len(nuevos)
+                resultado['actualizados'] += len(lote) - len(nuevos)
+                resultado['filas'] += len(lote)
+                resultado['lotes'] += 1
+                lote.clear()
+                return True
+            
+            for registro in registros:
+                numero_fila += 1
+                try:
+                    lote.append(self._normalizar_registro_importacion(registro))
+                except (ValueError, TypeError, AttributeError) as e:
+                    resultado['errores'] += 1
+                    if len(resultado['mensajes_error']) < 20:
+                        resultado['mensajes_error'].append(f"Fila {numero_fila}: {e}")
+                    continue
+                if len(lote) >= tamanio_lote and not procesar_lote():
+                    break
+            else:
+                procesar_lote()
+        finally:
+            conn.close()
+            self.indice.invalidar()
+            segundos = time.perf_counter() - inicio
+            resultado['segundos'] = round(segundos, 3)
+            resultado['filas_por_segundo'] = round(resultado['filas'] / segundos, 1) if segundos > 0 else 0.0
+        
+        return resultado
+    
+    # ===== PRESUPUESTO Y ESTADÍSTICAS =====
+    
+    def _registrar_movimientos(self, cursor, movimientos: List[Tuple[str, Money, str, Optional[int]]]):
+        """Agrega movimientos de capital (fecha, monto, concepto, referencia) a la transacción en curso
+        
+        El monto es positivo para los ingresos (ventas) y negativo para los
+        egresos (compras); referencia es el id de la venta o compra. Si ya hay
+        PRESUPUESTO['movimientos_por_snapshot'] pendientes, el snapshot se
+        adelanta en la misma transacción.
+        """
+        cursor.executemany('''
+            INSERT INTO movimientos_capital (fecha, monto, concepto, referencia)
+            VALUES (?, ?, ?, ?)
+        ''', movimientos)
         cursor.execute('''
-            UPDATE presupuesto 
-            SET capital = ?, ultima_actualizacion = ?
-            WHERE id = 1
-        ''', (nuevo_capital, fecha))
+            SELECT COUNT(*) FROM movimientos_capital
+            WHERE id > (SELECT ultimo_movimiento FROM presupuesto WHERE id = 1)
+        ''')
+        if cursor.fetchone()[0] >= PRESUPUESTO['movimientos_por_snapshot']:
+            self._adelantar_snapshot(cursor)
+    
+    @staticmethod
+    def _saldo_presupuesto(cursor, esquema: str = 'main') -> Tuple[Money, str, int]:
+        """Capital actual, fecha del último cambio y movimientos posteriores al snapshot
         
-        conn.commit()
+        El saldo es el capital del snapshot (tabla presupuesto) más los
+        movimientos agregados desde ultimo_movimiento.
+        """
+        cursor.execute(f'''
+            SELECT p.capital, p.ultima_actualizacion, IFNULL(SUM(m.monto), 0), MAX(m.fecha), COUNT(m.id)
+            FROM {esquema}.presupuesto p
+            LEFT JOIN {esquema}.movimientos_capital m ON m.id > p.ultimo_movimiento
+            WHERE p.id = 1
+            GROUP BY p.id
+        ''')
+        fila = cursor.fetchone()
+        if not fila:
+            return Money(), '', 0
+        capital, fecha_snapshot, delta, fecha_movimiento, pendientes = fila
+        return capital + Money(delta), fecha_movimiento or fecha_snapshot, pendientes
+    
+    @cacheado
+    def obtener_presupuesto(self) -> Tuple[Money, str]:
+        """Obtiene el presupuesto actual (capital, fecha de la última actualización)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        capital, fecha, _ = self._saldo_presupuesto(cursor)
         conn.close()
-        return True
+        return capital, fecha
+    
+    def compactar_presupuesto(self) -> int:
+        """Lleva el snapshot de presupuesto hasta el último movimiento
+        
+        El saldo no cambia; solo se acorta la suma que hace cada lectura. Los
+        movimientos no se borran y quedan como historial de auditoría. Las
+        escrituras ya lo hacen solas al llegar al umbral; esto es para
+        mantenimiento.
+        
+        Returns:
+            Movimientos incorporados al snapshot
+        """
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            incorporados = self._adelantar_snapshot(cursor)
+            conn.commit()
+            return incorporados
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _adelantar_snapshot(cursor) -> int:
+        """Suma al snapshot los movimientos pendientes, dentro de la transacción en curso"""
+        cursor.execute('''
+            SELECT IFNULL(SUM(m.monto), 0), MAX(m.id), MAX(m.fecha), COUNT(m.id)
+            FROM presupuesto p
+            JOIN movimientos_capital m ON m.id > p.ultimo_movimiento
+            WHERE p.id = 1
+        ''')
+        delta, ultimo_id, fecha, incorporados = cursor.fetchone()
+        if incorporados:
+            cursor.execute('''
+                UPDATE presupuesto
+                SET capital = capital + ?, ultimo_movimiento = ?, ultima_actualizacion = ?
+                WHERE id = 1
+            ''', (delta, ultimo_id, fecha))
+        return incorporados
+    
+    @invalida_cache('presupuesto')
+    def actualizar_presupuesto(self, nuevo_capital: Union[Money, float]) -> bool:
+        """Actualiza el presupuesto manualmente (queda como movimiento de ajuste)"""
+        nuevo_capital = Money.desde(nuevo_capital)
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            diferencia = nuevo_capital - self._saldo_presupuesto(cursor)[0]
+            if diferencia:
+                self._registrar_movimientos(cursor, [(fecha, diferencia, 'ajuste', None)])
+            conn.commit()
+            return True
+        finally:
+            conn.close()
     
-    def obtener_productos_bajo_stock(self, limite: int = 10) -> List[Tuple]:
+    def obtener_movimientos_capital(self, limite: Optional[int] = 100) -> List[Tuple]:
+        """Historial de movimientos de capital (id, fecha, monto, concepto, referencia), del más reciente al más antiguo"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, fecha, monto, concepto, referencia
+            FROM movimientos_capital
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (limite or -1,))
+        movimientos = cursor.fetchall()
+        conn.close()
+        return movimientos
+    
+    @cacheado
+    def obtener_productos_bajo_stock(self, limite: int = 10) -> List[Producto]:
         """Obtiene productos con stock bajo"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT p.*, c.nombre as categoria_nombre, c.color, c.icono
+        cursor.row_factory = fabrica(Producto)
+        cursor.execute(f'''
+            SELECT {COLUMNAS_PRODUCTO}
             FROM productos p
             LEFT JOIN categorias c ON p.categoria_id = c.id
             WHERE p.cantidad < 10 
@@ -487,16 +1524,16 @@ class DatabaseManager:
         conn.close()
         return productos
     
+    @cacheado
     def obtener_producto_mas_vendido(self) -> Tuple[str, int]:
         """Obtiene el producto más vendido"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT producto_nombre, SUM(cantidad) as total_vendido
-            FROM ventas
-            GROUP BY producto_nombre
-            ORDER BY total_vendido DESC
+            SELECT producto_nombre, unidades
+            FROM resumen_ventas_producto
+            ORDER BY unidades DESC
             LIMIT 1
         ''')
         resultado = cursor.fetchone()
@@ -504,35 +1541,32 @@ class DatabaseManager:
         conn.close()
         return resultado if resultado else ("Ninguno", 0)
     
+    @cacheado
     def obtener_estadisticas(self) -> Dict:
         """Obtiene estadísticas generales del sistema"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Total de productos
-        cursor.execute('SELECT COUNT(*) FROM productos')
-        total_productos = cursor.fetchone()[0]
-        
-        # Total de categorías
-        cursor.execute('SELECT COUNT(*) FROM categorias')
-        total_categorias = cursor.fetchone()[0]
+        # Rango del día como predicado de rango sobre la clave del resumen
+        hoy = datetime.now().date()
+        inicio_dia = hoy.strftime('%Y-%m-%d')
+        fin_dia = (hoy + timedelta(days=1)).strftime('%Y-%m-%d')
         
-        # Total de ventas
-        cursor.execute('SELECT COUNT(*) FROM ventas')
-        total_ventas = cursor.fetchone()[0]
-        
-        # Ventas del día
-        hoy = datetime.now().strftime('%Y-%m-%d')
-        cursor.execute('SELECT SUM(total) FROM ventas WHERE DATE(fecha) = ?', (hoy,))
-        ventas_dia = cursor.fetchone()[0] or 0
-        
-        # Ganancia total
-        cursor.execute('SELECT SUM(total) FROM ventas')
-        ganancia_total = cursor.fetchone()[0] or 0
-        
-        # Productos con bajo stock
-        cursor.execute('SELECT COUNT(*) FROM productos WHERE cantidad < 10')
-        productos_bajo_stock = cursor.fetchone()[0]
+        # Todos los indicadores en una sola consulta: los conteos de productos
+        # se resuelven por índice y las ventas salen del resumen diario
+        cursor.execute('''
+            SELECT
+                (SELECT COUNT(*) FROM productos),
+                (SELECT COUNT(*) FROM categorias),
+                (SELECT COUNT(*) FROM productos WHERE cantidad < 10),
+                v.total_ventas,
+                v.ganancia_total,
+                (SELECT IFNULL(SUM(total), 0) FROM resumen_ventas_diario WHERE dia >= ? AND dia < ?)
+            FROM (SELECT IFNULL(SUM(num_ventas), 0) AS total_ventas, IFNULL(SUM(total), 0) AS ganancia_total
+                  FROM resumen_ventas_diario) v
+        ''', (inicio_dia, fin_dia))
+        (total_productos, total_categorias, productos_bajo_stock,
+         total_ventas, ganancia_total, ventas_dia) = cursor.fetchone()
         
         conn.close()
         
@@ -540,57 +1574,93 @@ class DatabaseManager:
             'total_productos': total_productos,
             'total_categorias': total_categorias,
             'total_ventas': total_ventas,
-            'ventas_dia': ventas_dia,
-            'ganancia_total': ganancia_total,
+            'ventas_dia': Money(ventas_dia),
+            'ganancia_total': Money(ganancia_total),
             'productos_bajo_stock': productos_bajo_stock
         }
     
     # ===== GESTIÓN DE ARCHIVOS MENSUALES =====
     
     def guardar_mes_actual(self, nombre_archivo: Optional[str] = None) -> Tuple[bool, str, str]:
-        """Guarda una copia de la base de datos actual con la fecha del mes
+        """Guarda un snapshot de la base de datos actual con la fecha del mes
+        
+        El snapshot va al almacén deduplicado de backups: solo se escriben
+        (comprimidos) los bloques que cambiaron desde el snapshot anterior.
         
         Args:
-            nombre_archivo: Nombre personalizado para el archivo (opcional)
+            nombre_archivo: Nombre personalizado para el backup (opcional)
             
         Returns:
-            Tupla (éxito, mensaje, ruta_archivo)
+            Tupla (éxito, mensaje, nombre_backup)
         """
         try:
-            # Crear carpeta de backups si no existe
-            backup_dir = 'backups_mensuales'
-            if not os.path.exists(backup_dir):
-                os.makedirs(backup_dir)
+            os.makedirs(self.backups.directorio, exist_ok=True)
             
-            # Generar nombre del archivo con fecha
+            # Generar nombre del backup con fecha
             fecha_actual = datetime.now()
             if nombre_archivo:
-                archivo_backup = os.path.join(backup_dir, nombre_archivo)
-                if not archivo_backup.endswith('.db'):
-                    archivo_backup += '.db'
+                nombre = nombre_archivo[:-3] if nombre_archivo.endswith('.db') else nombre_archivo
             else:
-                mes_anio = fecha_actual.strftime('%Y_%m_%B')
-                archivo_backup = os.path.join(backup_dir, f'inventario_{mes_anio}.db')
+                nombre = f"inventario_{fecha_actual.strftime('%Y_%m_%B')}"
             
             # Verificar si ya existe
-            if os.path.exists(archivo_backup):
-                # Agregar timestamp para evitar sobrescribir
-                timestamp = fecha_actual.strftime('%Y%m%d_%H%M%S')
-                base_name = archivo_backup.replace('.db', '')
-                archivo_backup = f'{base_name}_{timestamp}.db'
+            if self.backups.existe(nombre):
+                # Agregar timestamp (y un contador si hace falta) para evitar sobrescribir
+                base = f"{nombre}_{fecha_actual.strftime('%Y%m%d_%H%M%S')}"
+                nombre, numero = base, 2
+                while self.backups.existe(nombre):
+                    nombre, numero = f'{base}_{numero}', numero + 1
             
-            # Copiar el archivo de base de datos
-            shutil.copy2(self.db_name, archivo_backup)
+            # Copia en caliente, verificada, sin detener las ventas en curso
+            copia = os.path.join(self.backups.directorio, f'.{nombre}.db')
+            try:
+                self.respaldar_en_caliente(copia)
+                rangos = leer_rangos(copia)
+                snapshot = self.backups.guardar(copia, nombre)
+                # Rango de fechas para las consultas federadas, sin restaurar el snapshot
+                self._registrar_rangos(nombre, snapshot['sha256'], rangos)
+            finally:
+                if os.path.exists(copia):
+                    os.remove(copia)
             
-            mensaje = f'Base de datos guardada exitosamente en: {archivo_backup}'
-            return True, mensaje, archivo_backup
+            mensaje = (f'Base de datos guardada exitosamente como: {nombre} '
+                       f'({snapshot["bloques_nuevos"]} de {len(snapshot["bloques"])} bloques nuevos, '
+                       f'{snapshot["bytes_escritos"] / 1024:.1f} KB escritos)')
+            return True, mensaje, nombre
             
         except Exception as e:
             return False, f'Error al guardar la base de datos: {str(e)}', ''
     
+    def restaurar_backup(self, nombre: str, destino: str) -> Tuple[bool, str]:
+        """Reconstruye un backup como archivo .db independiente
+        
+        No reemplaza la base de datos en uso: el archivo restaurado se puede
+        revisar o abrir aparte antes de decidir qué hacer con él.
+        
+        Returns:
+            Tupla (éxito, mensaje)
+        """
+        try:
+            if os.path.exists(destino):
+                return False, f'El archivo {destino} ya existe'
+            self.backups.restaurar(nombre, destino)
+            return True, f'Backup {nombre} restaurado en: {destino}'
+        except Exception as e:
+            return False, f'Error al restaurar el backup: {str(e)}'
+    
+    @invalida_cache
     def crear_nuevo_mes(self, mantener_productos: bool = True, mantener_presupuesto: bool = True) -> Tuple[bool, str]:
         """Crea una nueva base de datos para el siguiente mes
         
+        El mes nuevo se arma en un archivo aparte y se copia sobre el actual
+        dentro de una sola transacción de escritura, que se toma antes del
+        snapshot y se confirma al final: ninguna escritura (de este u otro
+        proceso) cae entre el snapshot y el reemplazo, y nadie ve una base vacía
+        o a medio copiar. El archivo no se renombra ni se borran sus -wal/-shm,
+        así las conexiones abiertas en otros procesos siguen siendo válidas y
+        ven el mes nuevo. Si algo falla, la transacción se descarta y el archivo
+        actual queda intacto.
+        
         Args:
             mantener_productos: Si True, copia los productos actuales (sin ventas/compras)
             mantener_presupuesto: Si True, mantiene el presupuesto actual
@@ -598,111 +1668,198 @@ class DatabaseManager:
         Returns:
             Tupla (éxito, mensaje)
         """
+        nuevo = f'{self.db_name}.nuevo'
         try:
-            # Primero guardar el mes actual
-            exito, mensaje, archivo_backup = self.guardar_mes_actual()
-            if not exito:
-                return False, mensaje
-            
-            # Obtener datos a preservar si es necesario
-            productos_actuales = []
-            categorias_actuales = []
-            presupuesto_actual = None
-            
-            if mantener_productos or mantener_presupuesto:
-                conn = self.get_connection()
-                cursor = conn.cursor()
-                
-                if mantener_productos:
-                    # Obtener categorías
-                    cursor.execute('SELECT * FROM categorias')
-                    categorias_actuales = cursor.fetchall()
+            with self.pool.exclusivo():
+                conn = sqlite3.connect(self.db_name, timeout=DATABASE_POOL['timeout'])
+                try:
+                    # El bloqueo de escritura se mantiene hasta el commit del reemplazo
+                    conn.execute('BEGIN IMMEDIATE')
                     
-                    # Obtener productos
-                    cursor.execute('SELECT * FROM productos')
-                    productos_actuales = cursor.fetchall()
-                
-                if mantener_presupuesto:
-                    # Obtener presupuesto actual
-                    cursor.execute('SELECT capital FROM presupuesto WHERE id = 1')
-                    resultado = cursor.fetchone()
-                    if resultado:
-                        presupuesto_actual = resultado[0]
+                    # Primero guardar el mes actual
+                    exito, mensaje, archivo_backup = self.guardar_mes_actual()
+                    if not exito:
+                        return False, mensaje
+                    
+                    presupuesto_actual = self._construir_mes(nuevo, mantener_productos, mantener_presupuesto)
+                    self._reemplazar_contenido(conn, nuevo)
+                    conn.commit()
+                finally:
+                    # Sin commit, cerrar descarta la transacción
+                    conn.close()
                 
-                conn.close()
+                os.remove(nuevo)
+                self.indice.invalidar()
             
-            # Eliminar la base de datos actual
-            if os.path.exists(self.db_name):
-                os.remove(self.db_name)
+            mensaje_final = f'Nuevo mes creado exitosamente. Backup guardado como: {archivo_backup}'
+            if mantener_productos:
+                mensaje_final += '\nProductos y categorías preservados.'
+            if mantener_presupuesto and presupuesto_actual is not None:
+                mensaje_final += f'\nPresupuesto preservado: ${presupuesto_actual:.2f}'
             
-            # Crear nueva base de datos con estructura limpia
-            self.init_db()
+            return True, mensaje_final
             
-            # Restaurar datos si se solicitó
-            if mantener_productos and (categorias_actuales or productos_actuales):
-                conn = self.get_connection()
-                cursor = conn.cursor()
-                
-                # Restaurar categorías
-                for cat in categorias_actuales:
-                    cursor.execute('''
-                        INSERT INTO categorias (id, nombre, descripcion, color, icono, fecha_creacion)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', cat)
-                
-                # Restaurar productos
-                for prod in productos_actuales:
-                    cursor.execute('''
-                        INSERT INTO productos (id, nombre, descripcion, precio, cantidad, categoria_id,
-                                              instrucciones_manejo, uso_especifico, notas_adicionales,
-                                              orden_visualizacion, fecha_agregado)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', prod)
-                
-                conn.commit()
-                conn.close()
+        except Exception as e:
+            if os.path.exists(nuevo):
+                os.remove(nuevo)
+            return False, f'Error al crear nuevo mes: {str(e)}'
+    
+    def _construir_mes(self, destino: str, mantener_productos: bool,
+                       mantener_presupuesto: bool) -> Optional[Money]:
+        """Arma en `destino` la base del mes nuevo copiando desde la actual con ATTACH
+        
+        Returns:
+            Capital copiado del mes actual (None si no se preservó)
+        """
+        if os.path.exists(destino):
+            os.remove(destino)
+        
+        conn = sqlite3.connect(destino, timeout=DATABASE_POOL['timeout'],
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+        try:
+            self._crear_esquema(conn)
+            conn.execute('ATTACH DATABASE ? AS actual', (self.db_name,))
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
             
-            if mantener_presupuesto and presupuesto_actual is not None:
-                conn = self.get_connection()
-                cursor = conn.cursor()
+            if mantener_productos:
+                # Las categorías del mes actual reemplazan a las creadas por defecto
+                cursor.execute('DELETE FROM categorias')
+                cursor.execute('''
+                    INSERT INTO categorias (id, nombre, descripcion, color, icono, fecha_creacion)
+                    SELECT id, nombre, descripcion, color, icono, fecha_creacion
+                    FROM actual.categorias
+                ''')
+                cursor.execute('''
+                    INSERT INTO productos (id, nombre, descripcion, precio, cantidad, categoria_id,
+                                          instrucciones_manejo, uso_especifico, notas_adicionales,
+                                          orden_visualizacion, fecha_agregado)
+                    SELECT id, nombre, descripcion, precio, cantidad, categoria_id,
+                           instrucciones_manejo, uso_especifico, notas_adicionales,
+                           orden_visualizacion, fecha_agregado
+                    FROM actual.productos
+                ''')
+            
+            presupuesto_actual = None
+            if mantener_presupuesto:
+                # El saldo final del mes actual es la apertura del nuevo
+                presupuesto_actual = self._saldo_presupuesto(cursor, 'actual')[0]
                 fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                cursor.execute('DELETE FROM movimientos_capital')
+                self._registrar_movimientos(cursor, [(fecha, presupuesto_actual, 'apertura', None)])
                 cursor.execute('''
                     UPDATE presupuesto 
-                    SET capital = ?, ultima_actualizacion = ?
+                    SET capital = ?, ultima_actualizacion = ?,
+                        ultimo_movimiento = (SELECT MAX(id) FROM movimientos_capital)
                     WHERE id = 1
                 ''', (presupuesto_actual, fecha))
-                conn.commit()
-                conn.close()
             
-            mensaje_final = f'Nuevo mes creado exitosamente. Backup guardado en: {archivo_backup}'
-            if mantener_productos:
-                mensaje_final += f'\nProductos y categorías preservados.'
-            if mantener_presupuesto:
-                mensaje_final += f'\nPresupuesto preservado: ${presupuesto_actual:.2f}'
-            
-            return True, mensaje_final
+            conn.commit()
+            conn.execute('DETACH DATABASE actual')
             
-        except Exception as e:
-            return False, f'Error al crear nuevo mes: {str(e)}'
+            resultado = conn.execute('PRAGMA quick_check').fetchone()[0]
+            if resultado != 'ok':
+                raise sqlite3.DatabaseError(f'La base del mes nuevo no pasó la verificación: {resultado}')
+        finally:
+            conn.close()
+        
+        return presupuesto_actual
+    
+    @staticmethod
+    def _reemplazar_contenido(conn, origen: str):
+        """Deja la base de `conn` igual al archivo `origen`, en la transacción abierta de `conn`
+        
+        Borra todos los objetos y los vuelve a crear desde el esquema de
+        `origen` copiando sus filas; las tablas internas de FTS5 se copian
+        tal cual, así el índice de búsqueda no se reconstruye.
+        """
+        cursor = conn.cursor()
+        cursor.execute('ATTACH DATABASE ? AS nuevo', (origen,))
+        
+        def objetos(esquema: str) -> List[Tuple[str, str, str]]:
+            cursor.execute(f"""
+                SELECT type, name, sql FROM {esquema}.sqlite_master
+                WHERE name NOT LIKE 'sqlite_%' AND sql IS NOT NULL
+                ORDER BY rowid
+            """)
+            return cursor.fetchall()
+        
+        def es_virtual(sql: str) -> bool:
+            return sql.lstrip().upper().startswith('CREATE VIRTUAL')
+        
+        def orden_borrado(objeto) -> int:
+            # Triggers y vistas, luego las tablas virtuales (se llevan sus tablas
+            # internas) y al final el resto; los índices caen con su tabla
+            tipo, _, sql = objeto
+            return {'trigger': 0, 'view': 1}.get(tipo, 2 if es_virtual(sql) else 3)
+        
+        for tipo, nombre, _ in sorted(objetos('main'), key=orden_borrado):
+            if tipo != 'index':
+                cursor.execute(f'DROP {tipo.upper()} IF EXISTS main."{nombre}"')
+        
+        nuevos = objetos('nuevo')
+        tablas = [(nombre, sql) for tipo, nombre, sql in nuevos if tipo == 'table']
+        for nombre, sql in sorted(tablas, key=lambda t: not es_virtual(t[1])):
+            # Las tablas internas de FTS5 ya las crea su tabla virtual
+            cursor.execute('SELECT 1 FROM main.sqlite_master WHERE name = ?', (nombre,))
+            if cursor.fetchone() is None:
+                cursor.execute(sql)
+        
+        for nombre, sql in tablas:
+            if es_virtual(sql):
+                continue
+            cursor.execute(f'PRAGMA nuevo.table_info("{nombre}")')
+            lista = ', '.join(f'"{fila[1]}"' for fila in cursor.fetchall())
+            cursor.execute(f'DELETE FROM main."{nombre}"')
+            cursor.execute(f'INSERT INTO main."{nombre}" ({lista}) SELECT {lista} FROM nuevo."{nombre}"')
+        
+        cursor.execute("SELECT 1 FROM nuevo.sqlite_master WHERE name = 'sqlite_sequence'")
+        if cursor.fetchone():
+            cursor.execute('DELETE FROM main.sqlite_sequence')
+            cursor.execute('INSERT INTO main.sqlite_sequence SELECT * FROM nuevo.sqlite_sequence')
+        
+        for tipo, _, sql in nuevos:
+            if tipo in ('index', 'view', 'trigger'):
+                cursor.execute(sql)
+        
+        version = cursor.execute('PRAGMA nuevo.user_version').fetchone()[0]
+        cursor.execute(f'PRAGMA main.user_version = {int(version)}')
     
     def listar_backups(self) -> List[Dict[str, any]]:
-        """Lista todos los backups mensuales disponibles"""
-        backup_dir = 'backups_mensuales'
+        """Lista todos los backups mensuales disponibles
+        
+        Incluye los snapshots del manifiesto y las copias .db completas que
+        hayan quedado de versiones anteriores en la misma carpeta.
+        """
+        backup_dir = self.backups.directorio
         backups = []
         
         if not os.path.exists(backup_dir):
             return backups
         
         try:
-            archivos = os.listdir(backup_dir)
-            for archivo in archivos:
-                if archivo.endswith('.db'):
+            for snapshot in self.backups.listar():
+                backups.append({
+                    'nombre': snapshot['nombre'],
+                    'ruta': None,
+                    'tipo': 'snapshot',
+                    'huella': snapshot['sha256'],
+                    'tamanio': snapshot['tamanio'],
+                    'bytes_escritos': snapshot['bytes_escritos'],
+                    'fecha_modificacion': snapshot['fecha']
+                })
+            
+            for archivo in os.listdir(backup_dir):
+                if archivo.endswith('.db') and not archivo.startswith('.'):
                     ruta_completa = os.path.join(backup_dir, archivo)
                     stat = os.stat(ruta_completa)
                     backups.append({
                         'nombre': archivo,
                         'ruta': ruta_completa,
+                        'tipo': 'archivo',
+                        'huella': f'{stat.st_size}-{stat.st_mtime_ns}',
                         'tamanio': stat.st_size,
+                        'bytes_escritos': stat.st_size,
                         'fecha_modificacion': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
                     })
             
@@ -713,3 +1870,179 @@ class DatabaseManager:
             print(f'Error al listar backups: {e}')
         
         return backups
+    
+    # ===== REPORTES FEDERADOS (mes actual + meses archivados) =====
+    
+    def _ruta_rangos(self) -> str:
+        return os.path.join(self.backups.directorio, 'rangos.json')
+    
+    def _leer_manifiesto_rangos(self) -> Dict[str, Dict]:
+        """Rango de fechas conocido de cada backup (nombre -> {huella, rangos})"""
+        try:
+            with open(self._ruta_rangos(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    def _registrar_rangos(self, nombre: str, huella: str, rangos: Dict):
+        """Guarda el rango de fechas de un backup en el manifiesto"""
+        with self._lock_rangos:
+            manifiesto = self._leer_manifiesto_rangos()
+            manifiesto[nombre] = {'huella': huella, 'rangos': rangos}
+            os.makedirs(self.backups.directorio, exist_ok=True)
+            temporal = self._ruta_rangos() + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(manifiesto, f, indent=1, ensure_ascii=False)
+            os.replace(temporal, self._ruta_rangos())
+    
+    def _materializar_backup(self, backup: Dict) -> str:
+        """Ruta a un .db consultable del backup (los snapshots se restauran una vez)"""
+        if backup['tipo'] == 'archivo':
+            return backup['ruta']
+        ruta = os.path.join(self.backups.directorio, '.consultas', f"{backup['huella'][:16]}.db")
+        if not os.path.exists(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            self.backups.restaurar(backup['nombre'], ruta)
+        return ruta
+    
+    def archivo_actual(self) -> Optional[str]:
+        """Identificador del archivo mensual en uso (cambia con crear_nuevo_mes)"""
+        conn = self.get_connection()
+        fila = conn.execute("SELECT valor FROM metadatos WHERE clave = 'archivo_id'").fetchone()
+        conn.close()
+        return fila[0] if fila else None
+    
+    def _ultimos_archivados(self, archivo_actual: Optional[str]) -> Dict[str, Tuple[Dict, Dict]]:
+        """Snapshot más reciente y rangos de cada archivo mensual archivado
+        
+        Los snapshots anteriores de un mismo archivo son prefijos de su
+        historial, así que solo se usa el último; se descartan los del archivo
+        en uso.
+        
+        Returns:
+            {linaje: (backup, rangos)}; linaje es el archivo_id, o la primera
+            fila en las copias anteriores a los identificadores
+        """
+        manifiesto = self._leer_manifiesto_rangos()
+        ultimos = {}
+        for backup in self.listar_backups():  # Del más reciente al más antiguo
+            entrada = manifiesto.get(backup['nombre'])
+            if entrada and entrada['huella'] == backup['huella']:
+                rangos = entrada['rangos']
+            else:
+                rangos = leer_rangos(self._materializar_backup(backup))
+                self._registrar_rangos(backup['nombre'], backup['huella'], rangos)
+            
+            # Copias anteriores a los identificadores: se reconocen por su primera fila
+            linaje = rangos['archivo_id'] or f"{rangos['ventas']}|{rangos['compras']}"
+            if linaje != archivo_actual and linaje not in ultimos:
+                ultimos[linaje] = (backup, rangos)
+        return ultimos
+    
+    def _archivos_en_rango(self, tabla: str, inicio: Optional[str], fin: Optional[str]) -> List[str]:
+        """Archivos con filas de `tabla` en [inicio, fin), empezando por el actual
+        
+        Se podan los archivados que no tienen fechas dentro de la ventana,
+        según el manifiesto de rangos.
+        """
+        rutas = [self.db_name]
+        for backup, rangos in self._ultimos_archivados(self.archivo_actual()).values():
+            if se_superpone(rangos[tabla], inicio, fin):
+                rutas.append(self._materializar_backup(backup))
+        return rutas
+    
+    def archivos_desde(self, tabla: str, archivo_id: Optional[str],
+                       fecha: Optional[str]) -> List[Tuple[Optional[str], str]]:
+        """Archivos con filas de `tabla` desde el archivo `archivo_id`, en orden cronológico
+        
+        Sirve para leer de forma incremental a través de crear_nuevo_mes: el
+        snapshot más reciente de `archivo_id`, los meses archivados que le
+        siguieron y al final el archivo en uso. Si `archivo_id` es el actual
+        (o None) solo se devuelve el archivo en uso; si ya no está entre los
+        backups, se toman los archivados con filas posteriores a `fecha`.
+        
+        Returns:
+            Lista de (archivo_id, ruta)
+        """
+        archivo_actual = self.archivo_actual()
+        if archivo_id is None or archivo_id == archivo_actual:
+            return [(archivo_actual, self.db_name)]
+        
+        # Del más reciente al más antiguo: el último snapshot de cada mes es el de su cierre
+        archivados = [
+            (rangos[tabla][0], linaje, backup)
+            for linaje, (backup, rangos) in self._ultimos_archivados(archivo_actual).items()
+            if rangos[tabla]
+        ][::-1]
+        posicion = next((i for i, (_, linaje, _) in enumerate(archivados) if linaje == archivo_id), None)
+        if posicion is not None:
+            elegidos = archivados[posicion:]
+        else:
+            elegidos = [archivado for archivado in archivados if fecha is None or archivado[0] > fecha]
+        return ([(linaje, self._materializar_backup(backup)) for _, linaje, backup in elegidos]
+                + [(archivo_actual, self.db_name)])
+    
+    def reporte_anual(self, anio: int, tabla: str = 'ventas') -> List[Dict]:
+        """Totales por mes de un año, sumando el mes actual y los archivados
+        
+        Args:
+            anio: Año a consultar
+            tabla: 'ventas' o 'compras'
+            
+        Returns:
+            Lista de {'mes', 'operaciones', 'unidades', 'total'} ordenada por mes
+        """
+        if tabla not in TABLAS_FEDERADAS:
+            raise ValueError(f'Tabla no disponible para reportes: {tabla}')
+        inicio, fin = f'{anio:04d}-01-01', f'{anio + 1:04d}-01-01'
+        
+        filas = consultar_federado(
+            self._archivos_en_rango(tabla, inicio, fin),
+            f'SELECT substr(fecha, 1, 7) AS mes, cantidad, {en_centavos("total")} AS total '
+            f'FROM {{esquema}}.{tabla} WHERE fecha >= ? AND fecha < ?',
+            (inicio, fin),
+            'SELECT mes, COUNT(*), SUM(cantidad), SUM(total) FROM ({union}) GROUP BY mes'
+        )
+        
+        # Totales en centavos enteros: sumar los lotes no acumula error
+        meses: Dict[str, List] = {}
+        for mes, operaciones, unidades, total in filas:
+            acumulado = meses.setdefault(mes, [0, 0, 0])
+            acumulado[0] += operaciones
+            acumulado[1] += unidades
+            acumulado[2] += total
+        return [
+            {'mes': mes, 'operaciones': operaciones, 'unidades': unidades, 'total': Money(total)}
+            for mes, (operaciones, unidades, total) in sorted(meses.items())
+        ]
+    
+    def reporte_productos(self, desde: Optional[str] = None, hasta: Optional[str] = None,
+                          limite: int = 10) -> List[Dict]:
+        """Productos más vendidos en un período que puede abarcar meses archivados
+        
+        Args:
+            desde: Fecha inicial 'YYYY-MM-DD' (inclusive)
+            hasta: Fecha final 'YYYY-MM-DD' (inclusive)
+            limite: Cantidad de productos a devolver
+        """
+        inicio, fin = self._rango_fechas(desde, hasta)
+        
+        filas = consultar_federado(
+            self._archivos_en_rango('ventas', inicio, fin),
+            f'SELECT producto_id, producto_nombre, cantidad, {en_centavos("total")} AS total '
+            f'FROM {{esquema}}.ventas WHERE fecha >= ? AND fecha < ?',
+            (inicio or '', fin or '9999'),
+            'SELECT producto_id, MAX(producto_nombre), SUM(cantidad), SUM(total) '
+            'FROM ({union}) GROUP BY producto_id'
+        )
+        
+        productos: Dict[int, List] = {}
+        for producto_id, nombre, unidades, total in filas:
+            acumulado = productos.setdefault(producto_id, [nombre, 0, 0])
+            acumulado[1] += unidades
+            acumulado[2] += total
+        ranking = sorted(productos.items(), key=lambda item: item[1][1], reverse=True)[:limite]
+        return [
+            {'producto_id': producto_id, 'producto': nombre, 'unidades': unidades, 'total': Money(total)}
+            for producto_id, (nombre, unidades, total) in ranking
+        ]
@@ -0,0 +1,82 @@
+"""
+Consultas federadas - Sistema de Inventario y Ventas
+Agrega ventas y compras de varios archivos mensuales adjuntándolos con ATTACH
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# SQLite admite 10 bases adjuntas por conexión; se deja margen
+MAX_ADJUNTOS = 9
+
+TABLAS_FEDERADAS = ('ventas', 'compras')
+
+
+def leer_rangos(ruta: str) -> Dict:
+    """Identificador del archivo y rango de fechas de ventas y compras
+
+    Returns:
+        {'archivo_id': str | None, 'ventas': [min, max] | None, 'compras': [min, max] | None}
+    """
+    conn = sqlite3.connect(ruta)
+    try:
+        cursor = conn.cursor()
+        tablas = {fila[0] for fila in cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+        rangos = {'archivo_id': None}
+        if 'metadatos' in tablas:
+            fila = cursor.execute("SELECT valor FROM metadatos WHERE clave = 'archivo_id'").fetchone()
+            rangos['archivo_id'] = fila[0] if fila else None
+        for tabla in TABLAS_FEDERADAS:
+            rangos[tabla] = None
+            if tabla in tablas:
+                minimo, maximo = cursor.execute(f'SELECT MIN(fecha), MAX(fecha) FROM {tabla}').fetchone()
+                if minimo is not None:
+                    rangos[tabla] = [minimo, maximo]
+        return rangos
+    finally:
+        conn.close()
+
+
+def en_centavos(columna: str) -> str:
+    """Expresión SQL con el importe en centavos enteros de cualquier archivo
+
+    Los archivos actuales guardan centavos (INTEGER); los backups anteriores
+    a la migración guardan pesos en columnas REAL, que siempre dan typeof 'real'.
+    """
+    return f"(CASE typeof({columna}) WHEN 'real' THEN CAST(round({columna} * 100) AS INTEGER) ELSE {columna} END)"
+
+
+def se_superpone(rango: Optional[Sequence[str]], inicio: Optional[str], fin: Optional[str]) -> bool:
+    """Indica si [min, max] de un archivo toca la ventana [inicio, fin)"""
+    if not rango:
+        return False
+    minimo, maximo = rango
+    return (inicio is None or maximo >= inicio) and (fin is None or minimo < fin)
+
+
+def consultar_federado(rutas: Iterable[str], consulta_por_archivo: str,
+                       parametros_por_archivo: Sequence, consulta_externa: str) -> List[tuple]:
+    """Ejecuta una agregación sobre varios archivos, de a MAX_ADJUNTOS por conexión
+
+    `consulta_por_archivo` se repite por cada archivo con {esquema} reemplazado
+    por su alias y se une con UNION ALL; `consulta_externa` la envuelve
+    mediante {union}. Devuelve las filas de todos los lotes: quien llama
+    combina los parciales (sumas y conteos se pueden sumar entre lotes).
+    """
+    rutas = list(rutas)
+    filas: List[tuple] = []
+    for inicio in range(0, len(rutas), MAX_ADJUNTOS):
+        lote = rutas[inicio:inicio + MAX_ADJUNTOS]
+        conn = sqlite3.connect(':memory:')
+        try:
+            partes = []
+            parametros: List = []
+            for indice, ruta in enumerate(lote):
+                conn.execute(f'ATTACH DATABASE ? AS a{indice}', (ruta,))
+                partes.append(consulta_por_archivo.format(esquema=f'a{indice}'))
+                parametros.extend(parametros_por_archivo)
+            union = '\nUNION ALL\n'.join(partes)
+            filas.extend(conn.execute(consulta_externa.format(union=union), parametros).fetchall())
+        finally:
+            conn.close()
+    return filas
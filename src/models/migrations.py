@@ -0,0 +1,263 @@
+"""
+Migraciones de esquema - Sistema de Inventario y Ventas
+La versión aplicada se guarda en PRAGMA user_version del propio archivo
+"""
+
+import re
+import sqlite3
+from typing import Callable, Dict, List, Tuple, Union
+
+from .partitions import (ESQUEMAS, columna_en_centavos, listar_particiones, particionar_historial,
+                         recrear_vista, tipos_declarados)
+from src.utils.money import Money
+
+# Cada paso es una sentencia SQL o una función que recibe el cursor
+Paso = Union[str, Callable[[sqlite3.Cursor], None]]
+
+
+def reconstruir_resumenes(cursor: sqlite3.Cursor):
+    """Recalcula las tablas de resumen a partir del historial completo"""
+    cursor.execute('DELETE FROM resumen_ventas_diario')
+    cursor.execute('''
+        INSERT INTO resumen_ventas_diario (dia, num_ventas, unidades, total)
+        SELECT substr(fecha, 1, 10), COUNT(*), SUM(cantidad), SUM(total)
+        FROM ventas
+        GROUP BY substr(fecha, 1, 10)
+    ''')
+
+    cursor.execute('DELETE FROM resumen_ventas_producto')
+    cursor.execute('''
+        INSERT INTO resumen_ventas_producto (producto_id, producto_nombre, unidades, total)
+        SELECT producto_id, MAX(producto_nombre), SUM(cantidad), SUM(total)
+        FROM ventas
+        GROUP BY producto_id
+    ''')
+
+    cursor.execute('DELETE FROM resumen_compras_diario')
+    cursor.execute('''
+        INSERT INTO resumen_compras_diario (dia, num_compras, unidades, total)
+        SELECT substr(fecha, 1, 10), COUNT(*), SUM(cantidad), SUM(total)
+        FROM compras
+        GROUP BY substr(fecha, 1, 10)
+    ''')
+
+    cursor.execute('DELETE FROM resumen_compras_proveedor')
+    cursor.execute('''
+        INSERT INTO resumen_compras_proveedor (proveedor, num_compras, total)
+        SELECT IFNULL(proveedor, ''), COUNT(*), SUM(total)
+        FROM compras
+        GROUP BY IFNULL(proveedor, '')
+    ''')
+
+
+# Columnas con importes de las tablas fijas (las particiones las toman de ESQUEMAS)
+COLUMNAS_DINERO: Dict[str, Tuple[str, ...]] = {
+    'productos': ('precio',),
+    'presupuesto': ('capital',),
+    'resumen_ventas_diario': ('total',),
+    'resumen_ventas_producto': ('total',),
+    'resumen_compras_diario': ('total',),
+    'resumen_compras_proveedor': ('total',),
+}
+
+
+def _tabla_a_centavos(cursor: sqlite3.Cursor, tabla: str, columnas_dinero: Tuple[str, ...]):
+    """Reconstruye una tabla con sus importes declarados DINERO y guardados en centavos
+
+    SQLite no permite cambiar el tipo de una columna: se crea la tabla nueva,
+    se copian las filas convirtiendo los importes y se reemplaza a la vieja,
+    conservando índices, triggers y la secuencia de AUTOINCREMENT.
+    """
+    tipos = tipos_declarados(cursor, tabla)
+    pendientes = [columna for columna in columnas_dinero if tipos.get(columna) != 'DINERO']
+    if not pendientes:
+        return
+
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,))
+    definicion = cursor.fetchone()[0]
+    for columna in pendientes:
+        definicion = re.sub(
+            rf'\b({columna}\s+)REAL\b((?:\s+NOT\s+NULL)?)(?:(\s+DEFAULT\s+)([-+0-9.]+))?',
+            lambda m: (f'{m.group(1)}DINERO{m.group(2)}' +
+                       (f'{m.group(3)}{Money.desde(m.group(4)).centavos}' if m.group(4) else '')),
+            definicion, count=1, flags=re.IGNORECASE
+        )
+    temporal = f'{tabla}__centavos'
+    cursor.execute(f"CREATE TABLE {temporal} {definicion[definicion.index('('):]}")
+
+    cursor.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (tabla,))
+    dependientes = [fila[0] for fila in cursor.fetchall()]
+    cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (tabla,))
+    fila = cursor.fetchone()
+    secuencia = fila[0] if fila else None
+
+    columnas = ', '.join(tipos)
+    origen = ', '.join(columna_en_centavos(columna, tipos[columna]) if columna in pendientes else columna
+                       for columna in tipos)
+    cursor.execute(f'INSERT INTO {temporal} ({columnas}) SELECT {origen} FROM {tabla}')
+    cursor.execute(f'DROP TABLE {tabla}')
+    cursor.execute(f'ALTER TABLE {temporal} RENAME TO {tabla}')
+    for sql in dependientes:
+        cursor.execute(sql)
+    if secuencia is not None:
+        # AUTOINCREMENT no debe reutilizar los ids de filas ya borradas
+        cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?', (secuencia, tabla))
+
+
+def montos_en_centavos(cursor: sqlite3.Cursor):
+    """Pasa precios, costos, totales y capital de pesos (REAL) a centavos enteros (DINERO)"""
+    # Las vistas se rehacen al final: renombrar tablas con vistas rotas falla
+    for tabla in ESQUEMAS:
+        cursor.execute(f'DROP VIEW IF EXISTS {tabla}')
+
+    for tabla, columnas_dinero in COLUMNAS_DINERO.items():
+        _tabla_a_centavos(cursor, tabla, columnas_dinero)
+    for tabla, esquema in ESQUEMAS.items():
+        for _, particion, _ in listar_particiones(cursor, tabla):
+            _tabla_a_centavos(cursor, particion, esquema['dinero'])
+        recrear_vista(cursor, tabla)
+
+
+MIGRACIONES: List[Tuple[int, str, List[Paso]]] = [
+    (1, 'Índices para las columnas de consulta frecuente', [
+        'CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas(fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_ventas_producto ON ventas(producto_id)',
+        'CREATE INDEX IF NOT EXISTS idx_compras_fecha ON compras(fecha)',
+        'CREATE INDEX IF NOT EXISTS idx_compras_proveedor ON compras(proveedor)',
+        'CREATE INDEX IF NOT EXISTS idx_productos_categoria ON productos(categoria_id)',
+        'CREATE INDEX IF NOT EXISTS idx_productos_cantidad ON productos(cantidad)',
+        'CREATE INDEX IF NOT EXISTS idx_productos_nombre_nocase ON productos(nombre COLLATE NOCASE)',
+    ]),
+    (2, 'Tablas de resumen para los indicadores del dashboard', [
+        '''CREATE TABLE IF NOT EXISTS resumen_ventas_diario (
+            dia TEXT PRIMARY KEY,
+            num_ventas INTEGER NOT NULL DEFAULT 0,
+            unidades INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS resumen_ventas_producto (
+            producto_id INTEGER PRIMARY KEY,
+            producto_nombre TEXT NOT NULL,
+            unidades INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS resumen_compras_diario (
+            dia TEXT PRIMARY KEY,
+            num_compras INTEGER NOT NULL DEFAULT 0,
+            unidades INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0
+        )''',
+        '''CREATE TABLE IF NOT EXISTS resumen_compras_proveedor (
+            proveedor TEXT PRIMARY KEY,
+            num_compras INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_resumen_producto_unidades ON resumen_ventas_producto(unidades)',
+        'CREATE INDEX IF NOT EXISTS idx_resumen_proveedor_compras ON resumen_compras_proveedor(num_compras)',
+        'CREATE INDEX IF NOT EXISTS idx_compras_total ON compras(total)',
+        reconstruir_resumenes,
+    ]),
+    (3, 'Búsqueda de texto completo (FTS5) sobre productos', [
+        # Tabla de contenido externo: el texto vive en productos, FTS solo guarda el índice
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+            nombre, descripcion, notas_adicionales,
+            content='productos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+            INSERT INTO productos_fts (rowid, nombre, descripcion, notas_adicionales)
+            VALUES (new.id, new.nombre, new.descripcion, new.notas_adicionales);
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion, notas_adicionales)
+            VALUES ('delete', old.id, old.nombre, old.descripcion, old.notas_adicionales);
+        END''',
+        # Solo los cambios de texto tocan el índice; las ventas actualizan cantidad
+        '''CREATE TRIGGER IF NOT EXISTS productos_fts_au
+        AFTER UPDATE OF nombre, descripcion, notas_adicionales ON productos BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, nombre, descripcion, notas_adicionales)
+            VALUES ('delete', old.id, old.nombre, old.descripcion, old.notas_adicionales);
+            INSERT INTO productos_fts (rowid, nombre, descripcion, notas_adicionales)
+            VALUES (new.id, new.nombre, new.descripcion, new.notas_adicionales);
+        END''',
+        "INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')",
+    ]),
+    (4, 'Identificador de cada archivo mensual', [
+        # Los snapshots de un mismo mes comparten el id; las consultas federadas
+        # lo usan para no sumar dos veces las mismas ventas
+        '''CREATE TABLE IF NOT EXISTS metadatos (
+            clave TEXT PRIMARY KEY,
+            valor TEXT NOT NULL
+        )''',
+        "INSERT OR IGNORE INTO metadatos (clave, valor) VALUES ('archivo_id', lower(hex(randomblob(16))))",
+        "INSERT OR IGNORE INTO metadatos (clave, valor) VALUES ('creado', datetime('now', 'localtime'))",
+    ]),
+    (5, 'Ventas y compras particionadas por mes', [
+        particionar_historial,
+    ]),
+    (6, 'Importes en centavos enteros', [
+        montos_en_centavos,
+    ]),
+    (7, 'Movimientos de capital en lugar de actualizar el presupuesto', [
+        # Cada venta, compra o ajuste agrega una fila; presupuesto pasa a ser el
+        # snapshot con el saldo hasta ultimo_movimiento
+        '''CREATE TABLE IF NOT EXISTS movimientos_capital (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha TEXT NOT NULL,
+            monto DINERO NOT NULL,
+            concepto TEXT NOT NULL,
+            referencia INTEGER
+        )''',
+        'ALTER TABLE presupuesto ADD COLUMN ultimo_movimiento INTEGER NOT NULL DEFAULT 0',
+        # El saldo existente queda como movimiento de apertura del historial
+        '''INSERT INTO movimientos_capital (fecha, monto, concepto)
+           SELECT ultima_actualizacion, capital, 'apertura' FROM presupuesto WHERE id = 1''',
+        'UPDATE presupuesto SET ultimo_movimiento = (SELECT IFNULL(MAX(id), 0) FROM movimientos_capital) WHERE id = 1',
+    ]),
+]
+
+
+def obtener_version(conn) -> int:
+    """Obtiene la versión de esquema del archivo"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def aplicar_migraciones(conn) -> int:
+    """Aplica en orden las migraciones pendientes y devuelve la versión final
+
+    Cada migración corre en su propia transacción junto con el cambio de
+    user_version, así un fallo deja el archivo en la última versión completa.
+    """
+    version_actual = obtener_version(conn)
+    aplicadas = 0
+
+    for version, descripcion, pasos in MIGRACIONES:
+        if version <= version_actual:
+            continue
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN')
+            for paso in pasos:
+                if callable(paso):
+                    paso(cursor)
+                else:
+                    cursor.execute(paso)
+            cursor.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise sqlite3.DatabaseError(f'Error en la migración {version} ({descripcion}): {e}') from e
+
+        version_actual = version
+        aplicadas += 1
+
+    if aplicadas:
+        # Actualiza las estadísticas del planificador para los índices nuevos
+        conn.execute('PRAGMA optimize')
+
+    return version_actual
@@ -0,0 +1,225 @@
+"""
+Particiones mensuales - Sistema de Inventario y Ventas
+Ventas y compras se guardan en una tabla por mes (ventas_2025_01, ...) y una
+vista con el nombre original las une para las lecturas que recorren todo
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Los importes se declaran DINERO: centavos enteros que sqlite3 devuelve como Money
+ESQUEMAS: Dict[str, Dict] = {
+    'ventas': {
+        'columnas': ('id', 'producto_id', 'producto_nombre', 'cantidad',
+                     'precio_unitario', 'total', 'fecha'),
+        'definicion': '''
+            id INTEGER PRIMARY KEY,
+            producto_id INTEGER NOT NULL,
+            producto_nombre TEXT NOT NULL,
+            cantidad INTEGER NOT NULL,
+            precio_unitario DINERO NOT NULL,
+            total DINERO NOT NULL,
+            fecha TEXT NOT NULL,
+            FOREIGN KEY (producto_id) REFERENCES productos(id)
+        ''',
+        'indices': ('fecha', 'producto_id'),
+        'dinero': ('precio_unitario', 'total'),
+    },
+    'compras': {
+        'columnas': ('id', 'producto_id', 'producto_nombre', 'cantidad',
+                     'costo_unitario', 'total', 'proveedor', 'fecha'),
+        'definicion': '''
+            id INTEGER PRIMARY KEY,
+            producto_id INTEGER NOT NULL,
+            producto_nombre TEXT NOT NULL,
+            cantidad INTEGER NOT NULL,
+            costo_unitario DINERO NOT NULL,
+            total DINERO NOT NULL,
+            proveedor TEXT,
+            fecha TEXT NOT NULL,
+            FOREIGN KEY (producto_id) REFERENCES productos(id)
+        ''',
+        'indices': ('fecha', 'proveedor', 'total'),
+        'dinero': ('costo_unitario', 'total'),
+    },
+}
+
+
+def tipos_declarados(cursor: sqlite3.Cursor, tabla: str) -> Dict[str, str]:
+    """Tipo declarado de cada columna de una tabla (en mayúsculas)"""
+    cursor.execute(f'PRAGMA table_info({tabla})')
+    return {fila[1]: (fila[2] or '').upper() for fila in cursor.fetchall()}
+
+
+def columna_en_centavos(columna: str, tipo_declarado: str) -> str:
+    """Expresión SQL con el importe de la columna en centavos enteros
+
+    Las columnas REAL de los archivos anteriores guardan pesos; las DINERO ya
+    están en centavos y se copian tal cual.
+    """
+    if tipo_declarado == 'DINERO':
+        return columna
+    return f'CAST(round({columna} * 100) AS INTEGER)'
+
+
+def limites_mes(mes: str) -> Tuple[str, str]:
+    """Fechas [inicio, fin) de un mes 'AAAA-MM'"""
+    anio, numero = int(mes[:4]), int(mes[5:7])
+    siguiente = f'{anio + 1:04d}-01' if numero == 12 else f'{anio:04d}-{numero + 1:02d}'
+    return f'{mes}-01', f'{siguiente}-01'
+
+
+def nombre_particion(tabla: str, mes: str) -> str:
+    """Nombre de la tabla de un mes 'AAAA-MM' (p. ej. ventas_2025_01)"""
+    return f'{tabla}_{mes[:4]}_{mes[5:7]}'
+
+
+def listar_particiones(cursor: sqlite3.Cursor, tabla: str, inicio: Optional[str] = None,
+                       fin: Optional[str] = None) -> List[Tuple[str, str, int]]:
+    """Particiones (mes, nombre, solo_lectura) que tocan [inicio, fin), de la más reciente a la más antigua
+
+    Args:
+        inicio: Fecha 'AAAA-MM-DD...' inicial (inclusive) o None
+        fin: Fecha 'AAAA-MM-DD...' final (exclusiva) o None
+    """
+    cursor.execute('''
+        SELECT mes, nombre, solo_lectura FROM particiones
+        WHERE tabla = ?
+          AND (? IS NULL OR mes >= substr(?, 1, 7))
+          AND (? IS NULL OR mes || '-01' < ?)
+        ORDER BY mes DESC
+    ''', (tabla, inicio, inicio, fin, fin))
+    return cursor.fetchall()
+
+
+def recrear_vista(cursor: sqlite3.Cursor, tabla: str):
+    """Rehace la vista `tabla` como UNION ALL de todas sus particiones"""
+    columnas = ', '.join(ESQUEMAS[tabla]['columnas'])
+    nombres = [nombre for _, nombre, _ in reversed(listar_particiones(cursor, tabla))]
+    cursor.execute(f'DROP VIEW IF EXISTS {tabla}')
+    cursor.execute(f'CREATE VIEW {tabla} AS ' +
+                   ' UNION ALL '.join(f'SELECT {columnas} FROM {nombre}' for nombre in nombres))
+
+
+def asegurar_particion(cursor: sqlite3.Cursor, tabla: str, mes: str) -> str:
+    """Devuelve la partición del mes, creándola (con índices y vista) si no existe
+
+    Todos los pasos son idempotentes: si se cortan a mitad de camino, la
+    próxima llamada los completa.
+    """
+    cursor.execute('SELECT nombre FROM particiones WHERE tabla = ? AND mes = ?', (tabla, mes))
+    fila = cursor.fetchone()
+    if fila:
+        return fila[0]
+
+    nombre = nombre_particion(tabla, mes)
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {nombre} ({ESQUEMAS[tabla]['definicion']})")
+    for columna in ESQUEMAS[tabla]['indices']:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{nombre}_{columna} ON {nombre}({columna})')
+    cursor.execute('INSERT OR IGNORE INTO particiones (tabla, mes, nombre) VALUES (?, ?, ?)',
+                   (tabla, mes, nombre))
+    recrear_vista(cursor, tabla)
+    return nombre
+
+
+def reservar_ids(cursor: sqlite3.Cursor, tabla: str, cantidad: int) -> int:
+    """Reserva `cantidad` ids consecutivos de la secuencia global y devuelve el primero
+
+    Los ids son únicos entre todas las particiones de la tabla (la paginación
+    y las exportaciones usan (fecha, id) como clave).
+    """
+    cursor.execute('UPDATE secuencias SET ultimo_id = ultimo_id + ? WHERE tabla = ?', (cantidad, tabla))
+    cursor.execute('SELECT ultimo_id FROM secuencias WHERE tabla = ?', (tabla,))
+    return cursor.fetchone()[0] - cantidad + 1
+
+
+def insertar_en_particion(cursor: sqlite3.Cursor, tabla: str, filas: Sequence[Tuple]) -> List[int]:
+    """Inserta filas (sin id, con fecha en la última columna) en la partición de su mes
+
+    Returns:
+        Ids asignados, en el mismo orden que las filas
+    """
+    if not filas:
+        return []
+    columnas = ESQUEMAS[tabla]['columnas']
+    marcadores = ', '.join('?' * len(columnas))
+
+    # La reserva de ids abre la transacción: la creación de particiones queda dentro
+    primer_id = reservar_ids(cursor, tabla, len(filas))
+    ids = list(range(primer_id, primer_id + len(filas)))
+
+    por_mes: Dict[str, List[Tuple]] = {}
+    for nuevo_id, fila in zip(ids, filas):
+        por_mes.setdefault(fila[-1][:7], []).append((nuevo_id,) + tuple(fila))
+    for mes, filas_mes in por_mes.items():
+        particion = asegurar_particion(cursor, tabla, mes)
+        cursor.executemany(f"INSERT INTO {particion} ({', '.join(columnas)}) VALUES ({marcadores})",
+                           filas_mes)
+    return ids
+
+
+def cerrar_particion(cursor: sqlite3.Cursor, tabla: str, mes: str):
+    """Marca una partición como de solo lectura (los cambios se rechazan con un error)"""
+    nombre = nombre_particion(tabla, mes)
+    for operacion in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {nombre}_solo_lectura_{operacion.lower()}
+            BEFORE {operacion} ON {nombre}
+            BEGIN
+                SELECT RAISE(ABORT, 'La partición {mes} de {tabla} está cerrada');
+            END
+        ''')
+    cursor.execute('UPDATE particiones SET solo_lectura = 1 WHERE tabla = ? AND mes = ?', (tabla, mes))
+
+
+def particionar_historial(cursor: sqlite3.Cursor):
+    """Migra las tablas ventas y compras a particiones mensuales detrás de una vista"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS particiones (
+            tabla TEXT NOT NULL,
+            mes TEXT NOT NULL,
+            nombre TEXT NOT NULL UNIQUE,
+            solo_lectura INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tabla, mes)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS secuencias (
+            tabla TEXT PRIMARY KEY,
+            ultimo_id INTEGER NOT NULL
+        )
+    ''')
+    mes_actual = datetime.now().strftime('%Y-%m')
+
+    for tabla, esquema in ESQUEMAS.items():
+        columnas = ', '.join(esquema['columnas'])
+        # Los importes pasan a centavos si el archivo todavía los guardaba en pesos
+        tipos = tipos_declarados(cursor, tabla)
+        origen = ', '.join(columna_en_centavos(columna, tipos[columna]) if columna in esquema['dinero'] else columna
+                           for columna in esquema['columnas'])
+        cursor.execute(f'SELECT DISTINCT substr(fecha, 1, 7) FROM {tabla}')
+        meses = {fila[0] for fila in cursor.fetchall()} | {mes_actual}
+
+        # AUTOINCREMENT no reutilizaba ids: la secuencia sigue desde el mayor usado
+        cursor.execute(f'''
+            SELECT MAX(IFNULL((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+                       IFNULL((SELECT MAX(id) FROM {tabla}), 0))
+        ''', (tabla,))
+        cursor.execute('INSERT OR REPLACE INTO secuencias (tabla, ultimo_id) VALUES (?, ?)',
+                       (tabla, cursor.fetchone()[0]))
+
+        for mes in sorted(meses):
+            nombre = nombre_particion(tabla, mes)
+            cursor.execute(f"CREATE TABLE {nombre} ({esquema['definicion']})")
+            cursor.execute(f'''
+                INSERT INTO {nombre} ({columnas})
+                SELECT {origen} FROM {tabla} WHERE fecha >= ? AND fecha < ?
+            ''', limites_mes(mes))
+            for columna in esquema['indices']:
+                cursor.execute(f'CREATE INDEX idx_{nombre}_{columna} ON {nombre}({columna})')
+            cursor.execute('INSERT INTO particiones (tabla, mes, nombre) VALUES (?, ?, ?)',
+                           (tabla, mes, nombre))
+
+        cursor.execute(f'DROP TABLE {tabla}')
+        recrear_vista(cursor, tabla)
@@ -0,0 +1,97 @@
+"""
+Índice de productos en memoria - Sistema de Inventario y Ventas
+Resuelve productos por id o por nombre sin consultar la base ni recorrer el catálogo
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from .rows import Producto
+
+
+def clave_nombre(nombre: str) -> str:
+    """Nombre normalizado para comparar sin mayúsculas ni espacios sobrantes"""
+    return ' '.join(nombre.split()).casefold()
+
+
+class ProductIndex:
+    """Productos por id y por nombre (casefold), actualizado fila a fila tras cada escritura
+
+    No se carga hasta que alguien lo usa. Las escrituras que tocan pocos
+    productos llaman a `refrescar` con sus ids; las masivas llaman a
+    `invalidar` y el índice se vuelve a cargar completo en el próximo uso.
+    Las lecturas de la base se hacen con el lock tomado, así una carga
+    completa no pisa un refresco posterior con datos más viejos.
+    """
+
+    def __init__(self):
+        self.cargado = False
+        self._por_id: Dict[int, Producto] = {}
+        self._por_nombre: Dict[str, Set[int]] = {}
+        self._lock = threading.RLock()
+
+    def asegurar_cargado(self, leer_todos: Callable[[], Iterable[Producto]]):
+        """Carga el catálogo completo si todavía no está cargado"""
+        with self._lock:
+            if not self.cargado:
+                self._por_id.clear()
+                self._por_nombre.clear()
+                for producto in leer_todos():
+                    self._agregar(producto)
+                self.cargado = True
+
+    def invalidar(self):
+        """Descarta el contenido; se recarga en el próximo uso"""
+        with self._lock:
+            self.cargado = False
+            self._por_id.clear()
+            self._por_nombre.clear()
+
+    def refrescar(self, producto_ids: Iterable[int], leer: Callable[[List[int]], Iterable[Producto]]):
+        """Vuelve a leer esos productos después de una escritura
+
+        Los ids que `leer` ya no devuelve (productos eliminados) salen del índice.
+        """
+        with self._lock:
+            if not self.cargado:
+                return
+            ids = sorted(set(producto_ids))
+            if not ids:
+                return
+            filas = list(leer(ids))
+            for producto_id in ids:
+                self._quitar(producto_id)
+            for producto in filas:
+                self._agregar(producto)
+
+    def por_id(self, producto_id: int) -> Optional[Producto]:
+        with self._lock:
+            return self._por_id.get(producto_id)
+
+    def por_nombre(self, nombre: str) -> Optional[Producto]:
+        """Producto con ese nombre; si hay varios iguales, el de menor id (como registrar_compra)"""
+        with self._lock:
+            ids = self._por_nombre.get(clave_nombre(nombre))
+            return self._por_id[min(ids)] if ids else None
+
+    def productos(self) -> List[Producto]:
+        with self._lock:
+            return list(self._por_id.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._por_id)
+
+    def _agregar(self, producto: Producto):
+        self._por_id[producto.id] = producto
+        self._por_nombre.setdefault(clave_nombre(producto.nombre), set()).add(producto.id)
+
+    def _quitar(self, producto_id: int):
+        anterior = self._por_id.pop(producto_id, None)
+        if anterior is not None:
+            clave = clave_nombre(anterior.nombre)
+            ids = self._por_nombre.get(clave)
+            if ids:
+                ids.discard(producto_id)
+                if not ids:
+                    del self._por_nombre[clave]
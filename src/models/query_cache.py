@@ -0,0 +1,134 @@
+"""
+Caché de consultas - Sistema de Inventario y Ventas
+Guarda resultados de lecturas frecuentes hasta que una escritura los invalida
+"""
+
+import copy
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+
+class QueryCache:
+    """Caché de lectura con invalidación explícita y TTL opcional"""
+
+    def __init__(self, ttl: Optional[float] = None, activo: bool = True,
+                 antes_de_leer: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            ttl: Segundos de validez de cada resultado (None = sin vencimiento)
+            activo: Si False no se guarda nada
+            antes_de_leer: Se llama antes de cada consulta (p. ej. para invalidar
+                si otro proceso escribió en la base); version_de no la llama
+        """
+        self.ttl = ttl
+        self.activo = activo
+        self.antes_de_leer = antes_de_leer
+        self.hits = 0
+        self.misses = 0
+        self.version = 0
+        # Versión global de la última escritura que tocó cada tabla
+        self.versiones: Dict[str, int] = {}
+        self._version_todas = 0
+        self._datos: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: Hashable) -> Tuple[bool, Any, int]:
+        """Devuelve (encontrado, valor, version) para la clave
+
+        La versión se lee con el lock tomado, igual que en `invalidar`: si no
+        se encontró, es la que hay que pasarle a `guardar` con el resultado.
+        """
+        if self.antes_de_leer is not None:
+            self.antes_de_leer()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                guardado, valor = entrada
+                if self.ttl is None or time.monotonic() - guardado < self.ttl:
+                    self.hits += 1
+                    return True, valor, self.version
+                del self._datos[clave]
+            self.misses += 1
+            return False, None, self.version
+
+    def guardar(self, clave: Hashable, valor: Any, version: int):
+        """Guarda un valor si no hubo escrituras desde que se empezó a calcular"""
+        with self._lock:
+            if version == self.version:
+                self._datos[clave] = (time.monotonic(), valor)
+
+    def invalidar(self, tablas: Optional[Iterable[str]] = None):
+        """Descarta todos los resultados guardados
+
+        Args:
+            tablas: Tablas modificadas; None si la escritura pudo tocar cualquiera
+        """
+        with self._lock:
+            self._datos.clear()
+            self.version += 1
+            if tablas is None:
+                self._version_todas = self.version
+            else:
+                for tabla in tablas:
+                    self.versiones[tabla] = self.version
+
+    def version_de(self, *tablas: str) -> int:
+        """Versión de las tablas dadas: cambia solo cuando se escribe en alguna de ellas
+
+        Solo lee contadores en memoria, sin tocar la base: se puede llamar
+        desde el hilo de la interfaz.
+        """
+        with self._lock:
+            return max([self._version_todas] + [self.versiones.get(tabla, 0) for tabla in tablas])
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """Contadores de aciertos y fallos de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entradas': len(self._datos),
+                'tasa_aciertos': self.hits / total if total else 0.0,
+                'version': self.version
+            }
+
+
+def cacheado(metodo):
+    """Decorador para métodos de lectura de DatabaseManager (usa self.cache)"""
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        cache: QueryCache = self.cache
+        if not cache.activo:
+            return metodo(self, *args, **kwargs)
+
+        clave = (metodo.__name__, args, tuple(sorted(kwargs.items())))
+        encontrado, valor, version = cache.obtener(clave)
+        if not encontrado:
+            valor = metodo(self, *args, **kwargs)
+            cache.guardar(clave, valor, version)
+        # Copia superficial para que quien llama no altere lo guardado
+        return copy.copy(valor)
+    return envoltura
+
+
+def invalida_cache(*tablas):
+    """Decorador para métodos que modifican datos (usa self.cache)
+
+    Con nombres de tabla, @invalida_cache('productos', 'ventas'), solo avanza
+    la versión de esas tablas; usado sin argumentos avanza la de todas.
+    """
+    if len(tablas) == 1 and callable(tablas[0]):
+        return invalida_cache()(tablas[0])
+
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            try:
+                return metodo(self, *args, **kwargs)
+            finally:
+                self.cache.invalidar(tablas or None)
+        return envoltura
+    return decorador
@@ -0,0 +1,110 @@
+"""
+Filas tipadas - Sistema de Inventario y Ventas
+Productos, ventas, compras y categorías como tuplas con nombre: se accede por
+atributo (p.precio) en lugar de por posición (p[3]) y siguen siendo tuplas
+"""
+
+from typing import Callable, Dict, NamedTuple, Optional, Type
+
+from src.utils.money import Money
+
+
+class Producto(NamedTuple):
+    id: int
+    nombre: str
+    descripcion: Optional[str]
+    precio: Money
+    cantidad: int
+    categoria_id: Optional[int]
+    instrucciones_manejo: Optional[str]
+    uso_especifico: Optional[str]
+    notas_adicionales: Optional[str]
+    orden_visualizacion: int
+    fecha_agregado: str
+    categoria_nombre: Optional[str]
+    categoria_color: Optional[str]
+    categoria_icono: Optional[str]
+
+    def a_json(self) -> Dict:
+        """Campos que expone la API para un producto"""
+        return {
+            'id': self.id,
+            'nombre': self.nombre,
+            'descripcion': self.descripcion,
+            'precio': self.precio,
+            'cantidad': self.cantidad,
+            'categoria_id': self.categoria_id,
+            'categoria': self.categoria_nombre,
+            'fecha_agregado': self.fecha_agregado,
+        }
+
+
+class Venta(NamedTuple):
+    id: int
+    producto_id: int
+    producto_nombre: str
+    cantidad: int
+    precio_unitario: Money
+    total: Money
+    fecha: str
+
+    def a_json(self) -> Dict:
+        return self._asdict()
+
+
+class Compra(NamedTuple):
+    id: int
+    producto_nombre: str
+    cantidad: int
+    costo_unitario: Money
+    total: Money
+    proveedor: Optional[str]
+    fecha: str
+
+    def a_json(self) -> Dict:
+        return self._asdict()
+
+
+class Categoria(NamedTuple):
+    id: int
+    nombre: str
+    descripcion: Optional[str]
+    color: str
+    icono: str
+    fecha_creacion: str
+
+    def a_json(self) -> Dict:
+        return self._asdict()
+
+
+class CategoriaResumen(NamedTuple):
+    """Categoría con sus productos: cuántos son, unidades en stock y valor a precio de venta"""
+    id: int
+    nombre: str
+    descripcion: Optional[str]
+    color: str
+    icono: str
+    fecha_creacion: str
+    productos: int
+    unidades: int
+    valor_inventario: Money
+
+    def a_json(self) -> Dict:
+        return self._asdict()
+
+
+def fabrica(tipo: Type[tuple]) -> Callable:
+    """row_factory de sqlite3 que arma filas del tipo dado sin pasar por tuple()"""
+    nueva = tuple.__new__
+    return lambda _cursor, fila: nueva(tipo, fila)
+
+
+def columnas(tipo: Type[tuple], alias: str = '') -> str:
+    """Lista de columnas para el SELECT en el orden de los campos del tipo"""
+    prefijo = f'{alias}.' if alias else ''
+    return ', '.join(f'{prefijo}{campo}' for campo in tipo._fields)
+
+
+# Los tres últimos campos de Producto vienen de la categoría (LEFT JOIN categorias c)
+COLUMNAS_PRODUCTO = (', '.join(f'p.{campo}' for campo in Producto._fields[:-3]) +
+                     ', c.nombre, c.color, c.icono')
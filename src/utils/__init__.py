@@ -1,17 +1,23 @@
 """Paquete de utilidades del sistema"""
 from .helpers import *
+from .money import Money
 
 __all__ = [
+    'Money',
     'formatear_moneda',
     'formatear_fecha',
     'validar_numero_positivo',
     'validar_entero_no_negativo',
     'limpiar_texto',
     'exportar_a_csv',
+    'generar_csv',
+    'leer_registros',
     'generar_reporte_texto',
     'validar_color_hex',
     'truncar_texto',
     'calcular_porcentaje_cambio',
     'obtener_fecha_actual',
-    'es_fecha_hoy'
+    'es_fecha_hoy',
+    'codificar_cursor',
+    'decodificar_cursor'
 ]
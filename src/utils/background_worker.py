@@ -0,0 +1,124 @@
+"""
+Trabajo en segundo plano - Sistema de Inventario y Ventas
+Ejecuta consultas a la base fuera del hilo de Tk y devuelve los resultados a
+ese hilo con ``root.after`` (los widgets solo se tocan desde el hilo de Tk)
+"""
+
+import itertools
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+
+class BackgroundWorker:
+    """Ejecutor de tareas con canales que se reemplazan
+
+    Cada tarea pertenece a un canal (p. ej. 'historial'). Una tarea nueva en
+    un canal reemplaza a la anterior: si todavía no empezó se cancela y si ya
+    está corriendo su resultado se descarta al llegar. Así, navegar rápido
+    entre pantallas solo dibuja la última carga pedida.
+    """
+
+    def __init__(self, root, hilos: int = 2, intervalo_ms: int = 30,
+                 al_cambiar_ocupado: Optional[Callable[[bool], None]] = None):
+        """
+        Args:
+            root: Ventana de Tk (se usan after y after_cancel)
+            hilos: Hilos del ejecutor
+            intervalo_ms: Cada cuánto se revisan los resultados terminados
+            al_cambiar_ocupado: Se llama con True/False al empezar y terminar de haber tareas
+        """
+        self.root = root
+        self.intervalo_ms = intervalo_ms
+        self.al_cambiar_ocupado = al_cambiar_ocupado
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='db-worker')
+        self._resultados: 'queue.Queue[Tuple]' = queue.Queue()
+        self._vigentes: Dict[str, Tuple[int, Future, bool]] = {}
+        self._secuencia = itertools.count(1)
+        self._ocupado = False
+        self._programado = self.root.after(self.intervalo_ms, self._revisar)
+
+    def submit(self, canal: str, funcion: Callable[[], Any],
+               al_terminar: Optional[Callable[[Any], None]] = None,
+               al_fallar: Optional[Callable[[Exception], None]] = None,
+               silencioso: bool = False) -> int:
+        """Ejecuta `funcion` en un hilo; `al_terminar(resultado)` corre luego en el hilo de Tk
+
+        Args:
+            silencioso: No enciende el indicador de ocupado (revisiones periódicas)
+
+        Returns:
+            Número de la tarea
+        """
+        self._descartar(canal)
+        tarea = next(self._secuencia)
+        futuro = self._executor.submit(self._ejecutar, canal, tarea, funcion, al_terminar, al_fallar)
+        self._vigentes[canal] = (tarea, futuro, silencioso)
+        self._avisar_ocupado()
+        return tarea
+
+    def cancel(self, *canales: str):
+        """Descarta las tareas pendientes de los canales dados"""
+        for canal in canales:
+            self._descartar(canal)
+        self._avisar_ocupado()
+
+    def pendientes(self) -> Set[str]:
+        """Canales con una tarea cuyo resultado todavía no se entregó"""
+        return set(self._vigentes)
+
+    def shutdown(self, esperar: bool = True):
+        """Deja de revisar resultados y descarta lo que no empezó
+
+        Args:
+            esperar: Esperar a que terminen las tareas que ya están corriendo
+                (antes de cerrar la base que usan)
+        """
+        if self._programado is not None:
+            self.root.after_cancel(self._programado)
+            self._programado = None
+        self._vigentes.clear()
+        self._executor.shutdown(wait=esperar, cancel_futures=True)
+
+    def _descartar(self, canal: str):
+        vigente = self._vigentes.pop(canal, None)
+        if vigente:
+            vigente[1].cancel()
+
+    def _ejecutar(self, canal, tarea, funcion, al_terminar, al_fallar):
+        # Corre en un hilo del ejecutor: solo se encola, nunca se toca Tk
+        try:
+            self._resultados.put((canal, tarea, al_terminar, funcion(), None))
+        except Exception as e:
+            self._resultados.put((canal, tarea, al_fallar, None, e))
+
+    def _revisar(self):
+        """Entrega en el hilo de Tk los resultados vigentes que terminaron"""
+        while True:
+            try:
+                canal, tarea, callback, resultado, error = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            vigente = self._vigentes.get(canal)
+            if vigente is None or vigente[0] != tarea:
+                continue  # Reemplazada por una tarea más nueva del mismo canal
+            del self._vigentes[canal]
+            try:
+                if error is None:
+                    if callback:
+                        callback(resultado)
+                elif callback:
+                    callback(error)
+                else:
+                    print(f"Error en tarea '{canal}': {error}")
+            except Exception as e:
+                print(f"Error al mostrar resultado de '{canal}': {e}")
+        self._avisar_ocupado()
+        self._programado = self.root.after(self.intervalo_ms, self._revisar)
+
+    def _avisar_ocupado(self):
+        ocupado = any(not silencioso for _, _, silencioso in self._vigentes.values())
+        if ocupado != self._ocupado:
+            self._ocupado = ocupado
+            if self.al_cambiar_ocupado:
+                self.al_cambiar_ocupado(ocupado)
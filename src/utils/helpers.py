@@ -3,14 +3,20 @@ Utilidades y funciones auxiliares
 """
 
 from datetime import datetime
+import base64
 import csv
-from typing import List, Tuple
+import json
+import os
+import io
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 import re
 
+from .money import Money
 
-def formatear_moneda(valor: float) -> str:
-    """Formatea un valor numérico como moneda"""
-    return f"${valor:,.2f}"
+
+def formatear_moneda(valor: Union[Money, float]) -> str:
+    """Formatea un importe (Money o número en pesos) como moneda"""
+    return f"${Money.desde(valor):,.2f}"
 
 
 def formatear_fecha(fecha_str: str, formato_salida: str = '%d/%m/%Y %H:%M') -> str:
@@ -45,8 +51,8 @@ def limpiar_texto(texto: str) -> str:
     return ' '.join(texto.split())
 
 
-def exportar_a_csv(datos: List[Tuple], columnas: List[str], archivo: str) -> bool:
-    """Exporta datos a un archivo CSV"""
+def exportar_a_csv(datos: Iterable[Tuple], columnas: List[str], archivo: str) -> bool:
+    """Exporta datos a un archivo CSV (acepta listas o generadores, fila por fila)"""
     try:
         with open(archivo, 'w', newline='', encoding='utf-8') as f:
             writer = csv.writer(f)
@@ -58,6 +64,48 @@ def exportar_a_csv(datos: List[Tuple], columnas: List[str], archivo: str) -> boo
         return False
 
 
+def generar_csv(datos: Iterable[Tuple], columnas: List[str], filas_por_bloque: int = 500) -> Iterator[str]:
+    """Genera el contenido CSV en bloques de texto, para respuestas en streaming"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columnas)
+    pendientes = 0
+    for fila in datos:
+        writer.writerow(fila)
+        pendientes += 1
+        if pendientes >= filas_por_bloque:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pendientes = 0
+    yield buffer.getvalue()
+
+
+def leer_registros(origen: Union[str, TextIO], formato: Optional[str] = None) -> Iterator[Dict]:
+    """Lee un archivo CSV o JSONL fila por fila sin cargarlo completo en memoria
+    
+    Args:
+        origen: Ruta del archivo o archivo de texto ya abierto
+        formato: 'csv' o 'jsonl'; si se omite se deduce de la extensión
+    """
+    if isinstance(origen, str):
+        formato = formato or os.path.splitext(origen)[1].lstrip('.').lower()
+        with open(origen, 'r', newline='', encoding='utf-8-sig') as f:
+            yield from leer_registros(f, formato)
+        return
+    
+    formato = (formato or 'csv').lower()
+    if formato == 'csv':
+        yield from csv.DictReader(origen)
+    elif formato in ('jsonl', 'ndjson', 'json'):
+        for linea in origen:
+            linea = linea.strip()
+            if linea:
+                yield json.loads(linea)
+    else:
+        raise ValueError(f"Formato de importación no soportado: {formato}")
+
+
 def generar_reporte_texto(titulo: str, datos: dict) -> str:
     """Genera un reporte en formato texto"""
     lineas = []
@@ -107,3 +155,23 @@ def es_fecha_hoy(fecha_str: str) -> bool:
         return fecha.date() == hoy
     except:
         return False
+
+
+def codificar_cursor(valores: Tuple) -> str:
+    """Codifica la clave de la última fila de una página como cursor opaco"""
+    texto = json.dumps(list(valores), separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor: Optional[str]) -> Optional[Tuple]:
+    """Decodifica un cursor de paginación; lanza ValueError si no es válido"""
+    if not cursor:
+        return None
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode('utf-8'))
+    except Exception:
+        raise ValueError('Cursor de paginación inválido')
+    if not isinstance(valores, list):
+        raise ValueError('Cursor de paginación inválido')
+    return tuple(valores)
@@ -0,0 +1,141 @@
+"""
+Importes de dinero - Sistema de Inventario y Ventas
+Valor exacto en centavos enteros para precios, totales y presupuesto
+"""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+from typing import Union
+
+CENTAVO = Decimal('0.01')
+
+
+@total_ordering
+class Money:
+    """Importe en centavos enteros (inmutable)
+
+    Sumas, restas y productos por una cantidad entera son exactos: no hay
+    deriva de punto flotante al acumular ventas o descontar compras. Se crea
+    desde pesos con ``Money.desde(19.99)`` o ``Money.desde('19.99')``, o
+    desde centavos con ``Money(1999)``.
+    """
+
+    __slots__ = ('_centavos',)
+
+    def __init__(self, centavos: int = 0):
+        if isinstance(centavos, bool) or not isinstance(centavos, int):
+            raise TypeError(f'Money espera centavos enteros, no {type(centavos).__name__}')
+        object.__setattr__(self, '_centavos', centavos)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError('Money es inmutable')
+
+    @classmethod
+    def desde(cls, valor: Union['Money', int, float, str, Decimal]) -> 'Money':
+        """Convierte un importe en pesos, redondeando al centavo (mitad hacia arriba)
+
+        Raises:
+            ValueError: Si el valor no es un número finito
+        """
+        if isinstance(valor, Money):
+            return valor
+        if isinstance(valor, bool):
+            raise ValueError(f'Importe inválido: {valor!r}')
+        try:
+            # str() evita arrastrar el error binario del float (19.99 -> 19.989999...)
+            pesos = valor if isinstance(valor, Decimal) else Decimal(str(valor).strip())
+            if not pesos.is_finite():
+                raise ValueError(f'Importe inválido: {valor!r}')
+            return cls(int(pesos.quantize(CENTAVO, rounding=ROUND_HALF_UP).scaleb(2)))
+        except InvalidOperation:
+            raise ValueError(f'Importe inválido: {valor!r}') from None
+
+    @classmethod
+    def desde_sqlite(cls, valor: bytes) -> 'Money':
+        """Conversor de sqlite3 para las columnas declaradas DINERO"""
+        return cls(int(Decimal(valor.decode('ascii'))))
+
+    @property
+    def centavos(self) -> int:
+        return self._centavos
+
+    def a_decimal(self) -> Decimal:
+        """Importe en pesos como Decimal exacto"""
+        return Decimal(self._centavos).scaleb(-2)
+
+    # ===== ARITMÉTICA =====
+
+    def __add__(self, otro):
+        if isinstance(otro, Money):
+            return Money(self._centavos + otro._centavos)
+        if otro == 0 and not isinstance(otro, bool):
+            return self
+        return NotImplemented
+
+    # Permite sum() sobre importes (arranca en 0)
+    __radd__ = __add__
+
+    def __sub__(self, otro):
+        if isinstance(otro, Money):
+            return Money(self._centavos - otro._centavos)
+        return NotImplemented
+
+    def __mul__(self, cantidad):
+        if isinstance(cantidad, int) and not isinstance(cantidad, bool):
+            return Money(self._centavos * cantidad)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-self._centavos)
+
+    def __abs__(self):
+        return Money(abs(self._centavos))
+
+    def __bool__(self):
+        return self._centavos != 0
+
+    # ===== COMPARACIÓN =====
+
+    @staticmethod
+    def _comparable(otro):
+        """Otro importe, o un número en pesos, como Decimal exacto; None si no aplica"""
+        if isinstance(otro, Money):
+            return otro.a_decimal()
+        if isinstance(otro, (int, float, Decimal)) and not isinstance(otro, bool):
+            valor = Decimal(otro)
+            return valor if valor.is_finite() else None
+        return None
+
+    def __eq__(self, otro):
+        valor = self._comparable(otro)
+        return NotImplemented if valor is None else self.a_decimal() == valor
+
+    def __lt__(self, otro):
+        valor = self._comparable(otro)
+        return NotImplemented if valor is None else self.a_decimal() < valor
+
+    def __hash__(self):
+        # Igual que el hash del número en pesos con el que compara igual
+        return hash(self.a_decimal())
+
+    # ===== CONVERSIÓN =====
+
+    def __float__(self):
+        return self._centavos / 100
+
+    def __str__(self):
+        return str(self.a_decimal())
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __format__(self, especificacion: str) -> str:
+        """Acepta los mismos formatos que un número: f'{importe:,.2f}'"""
+        if not especificacion:
+            return str(self)
+        return format(self.a_decimal(), especificacion)
+
+    def __reduce__(self):
+        return (Money, (self._centavos,))
@@ -0,0 +1,270 @@
+"""
+Exportación columnar (Parquet) - Sistema de Inventario y Ventas
+Escribe ventas y compras particionadas por mes para reportes y análisis
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Dependencia opcional: pip install pyarrow
+    pa = pc = ds = pq = None
+
+from src.utils.money import Money
+
+
+# Columnas exportadas por tabla, en el orden de la consulta (fecha siempre al final)
+COLUMNAS = {
+    'ventas': ('id', 'producto_id', 'producto_nombre', 'cantidad',
+               'precio_unitario', 'total', 'fecha'),
+    'compras': ('id', 'producto_id', 'producto_nombre', 'cantidad',
+                'costo_unitario', 'total', 'proveedor', 'fecha'),
+}
+
+# Importes (Money en la base) que se exportan como decimal exacto en pesos
+COLUMNAS_DINERO = {'precio_unitario', 'costo_unitario', 'total'}
+
+ARCHIVO_ESTADO = '_estado.json'
+
+# Versión del esquema de los archivos; se guarda en el estado de cada tabla.
+# 1: importes en float64. 2: importes en decimal128(18, 2)
+VERSION_ESQUEMA = 2
+
+
+def pyarrow_disponible() -> bool:
+    """Indica si está instalada la dependencia opcional pyarrow"""
+    return pa is not None
+
+
+def _esquema(tabla: str) -> 'pa.Schema':
+    """Esquema tipado de cada tabla exportada"""
+    tipos = {
+        'id': pa.int64(),
+        'producto_id': pa.int64(),
+        'producto_nombre': pa.string(),
+        'cantidad': pa.int64(),
+        'precio_unitario': pa.decimal128(18, 2),
+        'costo_unitario': pa.decimal128(18, 2),
+        'total': pa.decimal128(18, 2),
+        'proveedor': pa.string(),
+        'fecha': pa.timestamp('s'),
+    }
+    return pa.schema([(columna, tipos[columna]) for columna in COLUMNAS[tabla]])
+
+
+class ParquetExporter:
+    """Exportación incremental a Parquet, un directorio por tabla y mes
+
+    La estructura es destino/<tabla>/mes=AAAA-MM/part-*.parquet, que pyarrow,
+    pandas, DuckDB o Spark leen como un dataset particionado: una consulta sobre
+    un mes y unas pocas columnas solo abre esos archivos y esas columnas.
+
+    En destino/_estado.json se guarda la última (fecha, id) exportada de cada
+    tabla y el archivo_id del archivo mensual del que salió; cada ejecución
+    solo lee y escribe las filas posteriores. crear_nuevo_mes empieza un
+    archivo nuevo donde los ids vuelven a empezar: si el archivo cambió, se
+    termina el anterior desde su backup, se siguen los meses archivados
+    intermedios y el archivo en uso se exporta desde el principio. También se
+    guarda la versión del esquema: un destino exportado con otra versión no se
+    sigue completando, para no mezclar archivos con tipos distintos en el
+    mismo dataset.
+    """
+
+    def __init__(self, db, destino: str, compresion: str = 'zstd',
+                 filas_por_bloque: int = 50000):
+        """
+        Args:
+            db: DatabaseManager
+            destino: Directorio raíz de la exportación
+            compresion: Códec de Parquet ('zstd', 'snappy', 'gzip', 'none')
+            filas_por_bloque: Filas leídas con fetchmany y escritas por grupo
+        """
+        if pa is None:
+            raise RuntimeError("La exportación a Parquet requiere pyarrow (pip install pyarrow)")
+        self.db = db
+        self.destino = destino
+        self.compresion = compresion
+        self.filas_por_bloque = filas_por_bloque
+
+    # ===== ESTADO =====
+
+    def _ruta_estado(self) -> str:
+        return os.path.join(self.destino, ARCHIVO_ESTADO)
+
+    def obtener_estado(self) -> Dict[str, Dict]:
+        """Última fila exportada de cada tabla"""
+        try:
+            with open(self._ruta_estado(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _guardar_estado(self, estado: Dict[str, Dict]):
+        """Escribe el estado de forma atómica (archivo temporal + rename)"""
+        temporal = self._ruta_estado() + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=2, ensure_ascii=False)
+        os.replace(temporal, self._ruta_estado())
+
+    # ===== EXPORTACIÓN =====
+
+    def exportar(self, tablas: Iterable[str] = ('ventas', 'compras')) -> Dict[str, Dict]:
+        """Exporta las filas nuevas de cada tabla
+
+        Returns:
+            Diccionario por tabla con filas, meses y archivos escritos
+        """
+        os.makedirs(self.destino, exist_ok=True)
+        estado = self.obtener_estado()
+        resultados = {}
+
+        for tabla in tablas:
+            if tabla not in COLUMNAS:
+                raise ValueError(f"Tabla no exportable: {tabla}")
+            desde = estado.get(tabla)
+            if desde and desde.get('esquema', 1) != VERSION_ESQUEMA:
+                raise RuntimeError(
+                    f"{tabla} en {self.destino} tiene el esquema {desde.get('esquema', 1)} "
+                    f"(importes en float); exporta a un destino nuevo para usar el esquema {VERSION_ESQUEMA}")
+
+            resultado = {'filas': 0, 'meses': [], 'archivos': []}
+            # Un estado sin archivo_id (versiones anteriores) se toma como del archivo en uso
+            fuentes = self.db.archivos_desde(tabla, desde.get('archivo_id') if desde else None,
+                                             desde['fecha'] if desde else None)
+            for archivo_id, ruta in fuentes:
+                if not desde or desde.get('archivo_id', archivo_id) != archivo_id:
+                    # Otro archivo mensual: sus ids vuelven a empezar, se lee completo
+                    desde = {'fecha': None, 'id': None}
+                parcial, ultima = self._exportar_tabla(tabla, desde, archivo_id, ruta)
+                resultado['filas'] += parcial['filas']
+                resultado['meses'] = sorted(set(resultado['meses']) | set(parcial['meses']))
+                resultado['archivos'].extend(parcial['archivos'])
+                if ultima:
+                    desde = {'fecha': ultima[0], 'id': ultima[1]}
+                desde = dict(desde, archivo_id=archivo_id, esquema=VERSION_ESQUEMA)
+                if desde != estado.get(tabla):
+                    estado[tabla] = desde
+                    # Se guarda tras cada archivo: si el siguiente falla, este no se repite
+                    self._guardar_estado(estado)
+            resultados[tabla] = resultado
+
+        return resultados
+
+    def _conectar(self, ruta: str) -> sqlite3.Connection:
+        """Conexión al archivo en uso (del pool) o a la copia de un mes archivado"""
+        if ruta == self.db.db_name:
+            return self.db.get_connection()
+        return sqlite3.connect(ruta, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def _exportar_tabla(self, tabla: str, desde: Dict, archivo_id: Optional[str],
+                        ruta: str) -> Tuple[Dict, Optional[Tuple[str, int]]]:
+        """Escribe las filas de `ruta` posteriores a `desde` en un archivo nuevo por mes"""
+        columnas = COLUMNAS[tabla]
+        esquema = _esquema(tabla)
+        consulta = f"SELECT {', '.join(columnas)} FROM {tabla} {{filtro}} ORDER BY fecha, id"
+
+        # mes -> (ruta temporal, ruta final, ParquetWriter)
+        escritores: Dict[str, Tuple[str, str, 'pq.ParquetWriter']] = {}
+        filas = 0
+        ultima = None
+
+        conn = self._conectar(ruta)
+        try:
+            cursor = conn.cursor()
+            if desde['fecha'] is not None:
+                cursor.execute(consulta.format(filtro='WHERE (fecha, id) > (?, ?)'),
+                               (desde['fecha'], desde['id']))
+            else:
+                cursor.execute(consulta.format(filtro=''))
+
+            while True:
+                bloque = cursor.fetchmany(self.filas_por_bloque)
+                if not bloque:
+                    break
+                # Las filas vienen ordenadas por fecha: cada mes es un tramo contiguo
+                for mes, grupo in itertools.groupby(bloque, key=lambda fila: fila[-1][:7]):
+                    grupo = list(grupo)
+                    if mes not in escritores:
+                        escritores[mes] = self._abrir_escritor(tabla, mes, archivo_id, grupo[0], esquema)
+                    escritores[mes][2].write_table(self._a_tabla_arrow(grupo, columnas, esquema))
+                filas += len(bloque)
+                ultima = (bloque[-1][-1], bloque[-1][0])
+        except Exception:
+            for temporal, _, escritor in escritores.values():
+                escritor.close()
+                os.remove(temporal)
+            raise
+        finally:
+            conn.close()
+
+        archivos = []
+        for temporal, final, escritor in escritores.values():
+            escritor.close()
+            os.replace(temporal, final)
+            archivos.append(final)
+
+        return {'filas': filas, 'meses': sorted(escritores), 'archivos': archivos}, ultima
+
+    def _abrir_escritor(self, tabla: str, mes: str, archivo_id: Optional[str], primera: Tuple,
+                        esquema: 'pa.Schema') -> Tuple[str, str, 'pq.ParquetWriter']:
+        """Crea el archivo de la partición; el nombre sale del archivo de origen y la primera fila
+
+        Así, si se repite una exportación que no llegó a guardar su estado,
+        se sobrescribe el mismo archivo en lugar de duplicar filas. El origen
+        va en el nombre porque los ids vuelven a empezar en cada archivo mensual.
+        """
+        directorio = os.path.join(self.destino, tabla, f'mes={mes}')
+        os.makedirs(directorio, exist_ok=True)
+        marca = ''.join(c for c in primera[-1] if c.isdigit())
+        origen = hashlib.sha1(str(archivo_id).encode('utf-8')).hexdigest()[:8]
+        nombre = f'part-{marca}-{origen}-{primera[0]}.parquet'
+        final = os.path.join(directorio, nombre)
+        # Prefijo '.' para que los lectores del dataset ignoren el archivo a medio escribir
+        temporal = os.path.join(directorio, f'.{nombre}.tmp')
+        escritor = pq.ParquetWriter(temporal, esquema, compression=self.compresion)
+        return temporal, final, escritor
+
+    @staticmethod
+    def _a_tabla_arrow(filas: List[Tuple], columnas: Tuple[str, ...],
+                       esquema: 'pa.Schema') -> 'pa.Table':
+        """Convierte filas de SQLite a una tabla de Arrow con el esquema tipado"""
+        datos = list(zip(*filas))
+        arreglos = []
+        for indice, columna in enumerate(columnas):
+            if columna == 'fecha':
+                arreglos.append(pc.strptime(pa.array(datos[indice], pa.string()),
+                                            format='%Y-%m-%d %H:%M:%S', unit='s',
+                                            error_is_null=True))
+            elif columna in COLUMNAS_DINERO:
+                # Desde los centavos enteros, sin pasar por float
+                arreglos.append(pa.array([None if importe is None else Money.desde(importe).a_decimal()
+                                          for importe in datos[indice]], esquema.field(columna).type))
+            else:
+                arreglos.append(pa.array(datos[indice], esquema.field(columna).type))
+        return pa.Table.from_arrays(arreglos, schema=esquema)
+
+    # ===== LECTURA =====
+
+    def leer(self, tabla: str, columnas: Optional[List[str]] = None,
+             meses: Optional[List[str]] = None) -> 'pa.Table':
+        """Lee lo exportado leyendo solo las columnas y los meses pedidos
+
+        Args:
+            tabla: 'ventas' o 'compras'
+            columnas: Columnas a cargar (None = todas)
+            meses: Meses 'AAAA-MM' a incluir (None = todos)
+        """
+        if tabla not in COLUMNAS:
+            raise ValueError(f"Tabla no exportable: {tabla}")
+        dataset = ds.dataset(os.path.join(self.destino, tabla), format='parquet',
+                             partitioning='hive', schema=_esquema(tabla).append(pa.field('mes', pa.string())))
+        filtro = ds.field('mes').isin(meses) if meses else None
+        return dataset.to_table(columns=columnas, filter=filtro)
@@ -4,14 +4,17 @@ Script de diagnóstico para verificar la funcionalidad de compras
 
 import sqlite3
 
-# Conectar a la base de datos
-conn = sqlite3.connect('inventario_ventas.db')
+from src.utils.money import Money
+
+# Conectar a la base de datos (los importes DINERO se leen como Money)
+sqlite3.register_converter('DINERO', Money.desde_sqlite)
+conn = sqlite3.connect('inventario_ventas.db', detect_types=sqlite3.PARSE_DECLTYPES)
 cursor = conn.cursor()
 
 print("=== DIAGNÓSTICO DE COMPRAS ===\n")
 
 # Verificar tabla de compras
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='compras'")
+cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name='compras'")
 tabla_existe = cursor.fetchone()
 print(f"✓ Tabla 'compras' existe: {tabla_existe is not None}")
 